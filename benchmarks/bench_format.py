@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - File format size and decode benchmark
+
+Saves example_macro.json and synthetic macros in every format and reports
+the file size, the compression ratio against the indented JSON that
+save_to_file writes, and the decode throughput: loading the whole file for
+JSON, streaming every row for the binary and compressed formats (what
+playback does).  Every file is first checked to decode back to the events
+it was saved from, including an edge-case macro that sets the pressed flag
+on every event type; a mismatch stops the benchmark with an error.
+
+Usage: python benchmarks/bench_format.py [--sizes 1000,100000,1000000]
+       [--scenarios mouse,keys,idle]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import macro_format
+from compressed_format import save_compressed
+from event_store import (EventStore, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL,
+                         KEY_PRESS, KEY_RELEASE)
+from synthetic import SCENARIOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = [
+    ('json', '.json', macro_format.save_json),
+    ('gmac', '.gmac', macro_format.save_binary),
+    ('gmz zlib', '.gmz', lambda store, name: save_compressed(store, name, 'zlib')),
+    ('gmz lzma', '.gmz', lambda store, name: save_compressed(store, name, 'lzma')),
+]
+
+
+def decode_rate(filename):
+    """Return events/sec of decoding every event of a macro file"""
+    start = time.perf_counter()
+    macro = macro_format.load_events(filename)
+    count = sum(1 for _ in macro.rows())
+    elapsed = time.perf_counter() - start
+    if hasattr(macro, 'close'):
+        macro.close()
+    return count / elapsed if elapsed else float('inf')
+
+
+def edge_cases():
+    """Every event type with the pressed flag set, which only clicks use"""
+    store = EventStore()
+    store.append(0.0, MOUSE_MOVE, 10, 20, pressed=True)
+    store.append(0.01, MOUSE_CLICK, 10, 20, name='left', pressed=True)
+    store.append(0.02, MOUSE_SCROLL, 10, 20, 1, -2, pressed=True)
+    store.append(0.03, KEY_PRESS, name='a', pressed=True)
+    store.append(0.04, KEY_RELEASE, name='a', pressed=True)
+    store.append(0.05, MOUSE_CLICK, 10, 20, name='left', pressed=False)
+    return store
+
+
+def check_round_trip(store, filename):
+    """Raise ValueError unless a saved file decodes back to ``store``
+    
+    Timestamps may differ by the compressed format's microsecond rounding,
+    and the pressed flag is only compared for clicks (JSON only keeps it
+    there).
+    """
+    macro = macro_format.load_events(filename)
+    try:
+        rows = list(macro.rows())
+        names = macro.name_table
+    finally:
+        if hasattr(macro, 'close'):
+            macro.close()
+    if len(rows) != len(store):
+        raise ValueError(f"{filename}: {len(rows)} events, expected {len(store)}")
+    for i, (saved, loaded) in enumerate(zip(store.rows(), rows)):
+        if (abs(saved[0] - loaded[0]) > 1e-6 or saved[1:6] != loaded[1:6]
+                or (saved[1] == MOUSE_CLICK and saved[7] != loaded[7])
+                or store.name_table[saved[6]] != names[loaded[6]]):
+            raise ValueError(f"{filename}: event {i} is {loaded}, expected {saved}")
+
+
+def report(label, store, directory):
+    json_size = None
+    for name, extension, save in FORMATS:
+        filename = os.path.join(directory, 'macro' + extension)
+        start = time.perf_counter()
+        save(store, filename)
+        encode = time.perf_counter() - start
+        check_round_trip(store, filename)
+        size = os.path.getsize(filename)
+        if json_size is None:
+            json_size = size
+        rate = decode_rate(filename)
+        print(f"{label:<14} {len(store):>9} {name:<9} {size:>12,} "
+              f"{json_size / size:>7.1f}x {len(store) / encode:>12,.0f} "
+              f"{rate:>12,.0f}")
+        os.remove(filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    args = parser.parse_args(argv)
+    
+    print(f"{'macro':<14} {'events':>9} {'format':<9} {'bytes':>12} "
+          f"{'ratio':>8} {'encode/s':>12} {'decode/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        example = macro_format.load_json(os.path.join(ROOT, 'example_macro.json'))
+        report('example', example, directory)
+        report('edge cases', edge_cases(), directory)
+        for name in args.scenarios.split(','):
+            for size in (int(size) for size in args.sizes.split(',')):
+                report(name, SCENARIOS[name](size), directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - Memory benchmark: list of event dicts vs EventStore
+
+Usage: python benchmarks/bench_memory.py [event_count ...]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_store import EventStore, MOUSE_MOVE, KEY_PRESS, KEY_RELEASE
+
+
+def synthetic_rows(count):
+    """Mostly mouse moves with a key tap every 100 events, at 1000 Hz"""
+    for i in range(count):
+        timestamp = i / 1000.0
+        if i % 100 == 98:
+            yield timestamp, KEY_PRESS, 0, 0, 'w'
+        elif i % 100 == 99:
+            yield timestamp, KEY_RELEASE, 0, 0, 'w'
+        else:
+            yield timestamp, MOUSE_MOVE, 500 + i % 300, 300 + i % 200, ''
+
+
+def build_dicts(count):
+    """Build events the way the old MacroRecorder._record_event did"""
+    events = []
+    for timestamp, type_code, x, y, name in synthetic_rows(count):
+        if type_code == MOUSE_MOVE:
+            events.append({'timestamp': timestamp, 'type': 'mouse_move',
+                           'data': {'x': x, 'y': y}})
+        else:
+            event_type = 'key_press' if type_code == KEY_PRESS else 'key_release'
+            events.append({'timestamp': timestamp, 'type': event_type,
+                           'data': {'key': name}})
+    return events
+
+
+def build_store(count):
+    """Build events through EventStore.append"""
+    store = EventStore()
+    for timestamp, type_code, x, y, name in synthetic_rows(count):
+        store.append(timestamp, type_code, x, y, name=name)
+    return store
+
+
+def measure(builder, count):
+    """Return the bytes still allocated after building count events"""
+    tracemalloc.start()
+    result = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 600_000]
+    print(f"{'events':>10} {'dicts (MB)':>12} {'store (MB)':>12} {'ratio':>8}")
+    for count in counts:
+        dict_bytes = measure(build_dicts, count)
+        store_bytes = measure(build_store, count)
+        print(f"{count:>10} {dict_bytes / 1e6:>12.2f} {store_bytes / 1e6:>12.2f} "
+              f"{dict_bytes / store_bytes:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
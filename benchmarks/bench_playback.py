@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - Headless playback benchmark
+
+Plays synthetic macros through MacroRecorder.playback into a non-recording
+RecordingBackend from input_backend, so it runs without a display or
+pynput.  For every scenario and size it reports:
+
+  * throughput - events/sec with all deadlines already due (speed is huge),
+    i.e. the pure cost of the playback loop
+  * lateness   - p50/p99/max scheduling lateness of a real-time run, with
+    the speed raised so the run takes at most --max-seconds
+  * peak memory - tracemalloc peak while compiling and playing the macro
+
+Usage: python benchmarks/bench_playback.py [--sizes 1000,100000,1000000]
+       [--scenarios mouse,keys,idle] [--max-seconds 2] [--precise]
+       [--batching]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from macro_recorder import MacroRecorder
+from input_backend import RecordingBackend
+from synthetic import SCENARIOS
+
+# Large enough that every deadline has passed before it is checked
+UNTIMED_SPEED = 1e12
+
+
+def run_throughput(recorder, store, batching):
+    """Return events/sec of the playback loop with no waiting"""
+    backend = RecordingBackend(record=False, batching=batching)
+    plan = recorder.compile(store, UNTIMED_SPEED)
+    plan.batches()
+    start = time.perf_counter()
+    recorder.playback(plan, backend=backend)
+    elapsed = time.perf_counter() - start
+    return len(plan) / elapsed if elapsed else float('inf')
+
+
+def run_timed(recorder, store, max_seconds, precise, batching):
+    """Play in real time (sped up to fit max_seconds); return LatenessStats"""
+    speed = max(1.0, store.duration / max_seconds)
+    backend = RecordingBackend(record=False, batching=batching)
+    return recorder.playback(store, speed, precise=precise, backend=backend)
+
+
+def run_memory(store, batching):
+    """Return peak bytes allocated while compiling and playing the macro"""
+    recorder = MacroRecorder()
+    backend = RecordingBackend(record=False, batching=batching)
+    tracemalloc.start()
+    recorder.playback(store, UNTIMED_SPEED, backend=backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--max-seconds', type=float, default=2.0,
+                        help='wall-clock cap for each timed run')
+    parser.add_argument('--precise', action='store_true',
+                        help='use the sleep + spin-wait scheduler')
+    parser.add_argument('--batching', action='store_true',
+                        help='submit same-deadline events as batches')
+    args = parser.parse_args(argv)
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'scenario':<8} {'events':>9} {'events/s':>12} {'p50 us':>8} "
+          f"{'p99 us':>8} {'max us':>9} {'peak MB':>8}")
+    
+    for name in args.scenarios.split(','):
+        for size in sizes:
+            store = SCENARIOS[name](size)
+            recorder = MacroRecorder()
+            rate = run_throughput(recorder, store, args.batching)
+            stats = run_timed(recorder, store, args.max_seconds, args.precise,
+                              args.batching)
+            peak = run_memory(store, args.batching)
+            summary = stats.summary()
+            print(f"{name:<8} {size:>9} {rate:>12,.0f} {summary['p50_us']:>8.0f} "
+                  f"{summary['p99_us']:>8.0f} {summary['max_us']:>9.0f} "
+                  f"{peak / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
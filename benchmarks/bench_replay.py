@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - Instant replay overhead benchmark
+
+Calls MacroRecorder's instant replay listener callbacks directly (no display
+or pynput needed) with synthetic mouse and keyboard input and reports:
+
+  * callback cost - p50/p99/max time per callback, next to the recording
+    callbacks that push into capture_buffer.RingBuffer, i.e. the latency
+    instant replay adds to every input event while it runs
+  * memory - size of the rings, and how much more memory is held after
+    --events further events (constant memory means about zero)
+  * snapshot - time to turn a full --seconds window of 1000 Hz mouse input
+    into a macro
+
+Usage: python benchmarks/bench_replay.py [--events 1000000] [--seconds 30]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_buffer import RingBuffer
+from event_store import MOUSE_MOVE
+from macro_recorder import MacroRecorder
+from scheduler import LatenessStats
+
+
+class FakeKey:
+    """Stands in for a pynput KeyCode"""
+    
+    def __init__(self, char):
+        self.char = char
+
+
+def callback_costs(callbacks, count):
+    """Return {name: LatenessStats of ns per call} for (name, call) pairs"""
+    clock = time.perf_counter_ns
+    results = {}
+    for name, call in callbacks:
+        stats = LatenessStats()
+        for i in range(count):
+            start = clock()
+            call(i)
+            stats.add(clock() - start)
+        results[name] = stats
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--events', type=int, default=1000000,
+                        help='events fed in for the memory measurement')
+    parser.add_argument('--seconds', type=float, default=30.0,
+                        help='instant replay window')
+    args = parser.parse_args(argv)
+    
+    recorder = MacroRecorder()
+    recorder._reset_replay(args.seconds, 65536, 4096)
+    recorder.recording = True
+    recorder._ring = RingBuffer(65536)
+    key = FakeKey('w')
+    
+    count = 100000
+    costs = callback_costs([
+        ('replay move', lambda i: recorder._replay_move(i & 1023, 500)),
+        ('replay key', lambda i: recorder._replay_key_press(key)),
+        ('record move', lambda i: recorder._on_mouse_move(i & 1023, 500)),
+        ('record key', lambda i: recorder._on_key_press(key)),
+    ], count)
+    print(f"{'callback':<12} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for name, stats in costs.items():
+        summary = stats.summary()
+        print(f"{name:<12} {summary['p50_us']:>8.2f} {summary['p99_us']:>8.2f} "
+              f"{summary['max_us']:>8.1f}")
+    
+    # Memory: one lap to settle, then measure what further events keep
+    move = recorder._replay_move
+    for i in range(recorder.replay.mouse.capacity):
+        move(i & 1023, 500)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(args.events):
+        move(i & 1023, 500)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"\nring memory: {recorder.replay.nbytes() / 1e6:.2f} MB, "
+          f"held after {args.events:,} more events: {after - before:+,} bytes")
+    
+    # Snapshot of a full window of 1000 Hz mouse input
+    recorder._reset_replay(args.seconds, 65536, 4096)
+    ring = recorder.replay.mouse
+    now_ns = time.perf_counter_ns()
+    samples = int(args.seconds * 1000)
+    for i in range(samples):
+        ring.put(now_ns - (samples - i) * 1000000, MOUSE_MOVE, i & 1023, 500,
+                 0, 0, 0, 0)
+    recorder.replay.snapshot(now_ns, 0.001)  # Import the repair code first
+    start = time.perf_counter()
+    store = recorder.replay.snapshot(now_ns)
+    elapsed = time.perf_counter() - start
+    print(f"snapshot of {args.seconds:g} s ({len(store):,} events): "
+          f"{elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
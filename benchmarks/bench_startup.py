@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - Startup time benchmark
+
+Runs each command in a fresh interpreter several times and reports the
+median wall-clock time, plus the time of a bare interpreter for reference.
+Commands whose modules cannot load here (e.g. the GUI on a box without a
+display) are reported as failed rather than aborting the run.
+
+Usage: python benchmarks/bench_startup.py [--runs 7] [--importtime]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE = os.path.join(ROOT, 'example_macro.json')
+
+CASES = [
+    ('python (baseline)', ['-c', 'pass']),
+    ('cli.py --help', [os.path.join(ROOT, 'cli.py'), '--help']),
+    ('cli.py inspect', [os.path.join(ROOT, 'cli.py'), 'inspect', EXAMPLE]),
+    ('import macro_format', ['-c', 'import macro_format']),
+    ('import macro_recorder', ['-c', 'import macro_recorder']),
+    ('import macro_gui', ['-c', 'import macro_gui']),
+]
+
+
+def time_command(argv, runs):
+    """Return the median seconds of running python argv, or None if it fails"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + argv, cwd=ROOT,
+                                stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            return None
+        times.append(elapsed)
+    return statistics.median(times)
+
+
+def top_imports(argv, count=8):
+    """Return the slowest (cumulative us, module) pairs from -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + argv,
+                            cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--importtime', action='store_true',
+                        help='also list the slowest imports of cli.py inspect')
+    args = parser.parse_args(argv)
+    
+    print(f"{'command':<24} {'median ms':>10}")
+    for name, command in CASES:
+        elapsed = time_command(command, args.runs)
+        shown = f"{elapsed * 1000:>10.1f}" if elapsed is not None else f"{'failed':>10}"
+        print(f"{name:<24} {shown}")
+    
+    if args.importtime:
+        print("\nslowest imports of cli.py inspect (cumulative us):")
+        for micros, module in top_imports(CASES[2][1]):
+            print(f"{micros:>10}  {module}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Game Macro Recorder - Synthetic macros for benchmarks
+"""
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_store import (EventStore, MOUSE_MOVE, MOUSE_CLICK, KEY_PRESS,
+                         KEY_RELEASE)
+
+
+def dense_mouse(count):
+    """A 1000 Hz mouse path circling the screen, with a click every 500 moves"""
+    store = EventStore()
+    for i in range(count):
+        timestamp = i / 1000.0
+        if i % 500 == 498:
+            store.append(timestamp, MOUSE_CLICK, 960, 540, name='left', pressed=True)
+        elif i % 500 == 499:
+            store.append(timestamp, MOUSE_CLICK, 960, 540, name='left', pressed=False)
+        else:
+            angle = i / 200.0
+            store.append(timestamp, MOUSE_MOVE,
+                         960 + 400 * math.cos(angle), 540 + 300 * math.sin(angle))
+    return store
+
+
+def key_spam(count):
+    """Key taps cycling through a few keys, one press or release every 5 ms"""
+    store = EventStore()
+    keys = ('q', 'w', 'e', 'r', 'shift', 'space')
+    for i in range(count):
+        key = keys[(i // 2) % len(keys)]
+        store.append(i * 0.005, KEY_PRESS if i % 2 == 0 else KEY_RELEASE, name=key)
+    return store
+
+
+def idle_gaps(count):
+    """Bursts of 20 quick events separated by 2 second idle gaps"""
+    store = EventStore()
+    for i in range(count):
+        burst, offset = divmod(i, 20)
+        timestamp = burst * 2.0 + offset * 0.002
+        if offset % 4 == 0:
+            store.append(timestamp, KEY_PRESS, name='e')
+        elif offset % 4 == 1:
+            store.append(timestamp, KEY_RELEASE, name='e')
+        else:
+            store.append(timestamp, MOUSE_MOVE, 100 + offset, 100 + burst % 500)
+    return store
+
+
+def jittery_mouse(count, seed=0):
+    """A hand-made-looking path: uneven ~1 ms sampling, wandering velocity,
+    a click or key tap now and then (seeded, so runs are repeatable)"""
+    rng = random.Random(seed)
+    store = EventStore()
+    timestamp = 0.0
+    x, y = 960.0, 540.0
+    vx = vy = 0.0
+    i = 0
+    while i < count:
+        timestamp += rng.uniform(0.0006, 0.0016)
+        vx = vx * 0.95 + rng.gauss(0, 0.8)
+        vy = vy * 0.95 + rng.gauss(0, 0.8)
+        x = min(max(x + vx, 0), 1919)
+        y = min(max(y + vy, 0), 1079)
+        roll = rng.random()
+        if roll < 0.002 and i + 1 < count:
+            store.append(timestamp, MOUSE_CLICK, x, y, name='left', pressed=True)
+            timestamp += rng.uniform(0.05, 0.12)
+            store.append(timestamp, MOUSE_CLICK, x, y, name='left', pressed=False)
+            i += 2
+        elif roll < 0.004 and i + 1 < count:
+            key = rng.choice('wasd')
+            store.append(timestamp, KEY_PRESS, name=key)
+            timestamp += rng.uniform(0.05, 0.2)
+            store.append(timestamp, KEY_RELEASE, name=key)
+            i += 2
+        else:
+            store.append(timestamp, MOUSE_MOVE, x, y)
+            i += 1
+    return store
+
+
+SCENARIOS = {
+    'mouse': dense_mouse,
+    'keys': key_spam,
+    'idle': idle_gaps,
+    'jitter': jittery_mouse,
+}
@@ -0,0 +1,354 @@
+"""
+Game Macro Recorder - Parallel bulk import of macro files
+
+Every file in a directory is parsed, checked and repaired in a pool of
+worker processes; clean macros are written straight into the library's
+directory by the workers, and the library index is updated once at the end.
+
+Checks, per file:
+  * JSON shape: every event needs a known type, a numeric timestamp and the
+    data fields of its type; malformed events are dropped
+  * events are sorted by timestamp (stable, so same-time events keep order)
+  * key names are normalized with the rules playback uses (key_names);
+    events with keys that cannot be typed are dropped
+  * unknown mouse buttons are mapped to 'left', as playback does
+  * press/release pairs: releases of keys or buttons that are not held are
+    dropped, and anything still held at the end is released there
+"""
+from array import array
+import concurrent.futures
+from itertools import islice
+import json
+import multiprocessing
+from operator import gt
+import os
+import time
+
+from event_store import (EventStore, TYPE_CODES, MOUSE_CLICK, MOUSE_SCROLL,
+                         KEY_PRESS, KEY_RELEASE)
+from key_names import normalize_key_name
+import macro_format
+from macro_library import atomic_write, new_event_file
+
+
+MACRO_EXTENSIONS = ('.json', '.gmac', '.gmz')
+BUTTONS = ('left', 'right', 'middle')
+
+# EventStore columns in rows() order, with their array type codes
+COLUMNS = ('timestamps', 'types', 'xs', 'ys', 'dxs', 'dys', 'name_ids', 'pressed')
+COLUMN_TYPES = ('d', 'B', 'i', 'i', 'i', 'i', 'H', 'B')
+
+# Files per task sent to a worker; large enough to amortize the round trip
+CHUNK_SIZE = 16
+
+
+class ImportReport:
+    """Outcome of a bulk import: one result dict per file
+    
+    Each result has 'file', 'name' (None if the file failed), 'events',
+    'issues' (list of strings), 'error' (None or a string) and 'entry'
+    (the library index entry, None on failure or in a dry run).
+    """
+    
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+    
+    @property
+    def imported(self):
+        return [result for result in self.results if result['error'] is None]
+    
+    @property
+    def repaired(self):
+        return [result for result in self.imported if result['issues']]
+    
+    @property
+    def failed(self):
+        return [result for result in self.results if result['error'] is not None]
+    
+    def entries(self):
+        """Return {name: library index entry} of the macros written"""
+        return {result['name']: result['entry'] for result in self.imported
+                if result['entry'] is not None}
+    
+    def summary(self):
+        """One line: counts and time taken"""
+        events = sum(result['events'] for result in self.imported)
+        return (f"{len(self.results)} files: {len(self.imported)} imported "
+                f"({len(self.repaired)} repaired, {events:,} events), "
+                f"{len(self.failed)} failed in {self.elapsed:.2f} s")
+    
+    def format(self, max_issues=5):
+        """Summary plus the problems found in each file"""
+        lines = [self.summary()]
+        for result in self.results:
+            filename = os.path.basename(result['file'])
+            if result['error'] is not None:
+                lines.append(f"FAILED   {filename}: {result['error']}")
+            elif result['issues']:
+                lines.append(f"REPAIRED {filename} -> {result['name']}")
+            else:
+                continue
+            issues = result['issues']
+            lines.extend(f"    {issue}" for issue in issues[:max_issues])
+            if len(issues) > max_issues:
+                lines.append(f"    ... {len(issues) - max_issues} more")
+        return '\n'.join(lines)
+
+
+def find_macro_files(directory):
+    """Return the sorted paths of the macro files directly in directory"""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(MACRO_EXTENSIONS)
+                  and os.path.isfile(os.path.join(directory, name)))
+
+
+def import_directory(directory, library=None, workers=None, dry_run=False,
+                     register=True, taken=()):
+    """Check every macro file in ``directory`` and add the good ones to library
+    
+    ``workers`` is the number of processes (default: one per CPU; 1 checks
+    the files in this process).  With ``dry_run`` or no library nothing is
+    written.  Macros are named after their files, with a numeric suffix
+    when the name is in the library or in ``taken`` (names in use that are
+    not saved yet, such as the GUI's unsaved recordings).  Without
+    ``register`` the event files are
+    written but the index is left for the caller to update with
+    ``library.add_entries(report.entries())``, e.g. from the GUI thread.
+    Returns an ImportReport.
+    """
+    start = time.perf_counter()
+    files = find_macro_files(directory)
+    target = None if dry_run or library is None else library.directory
+    if target is not None:
+        os.makedirs(target, exist_ok=True)
+    
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) <= 1:
+        results = [check_file(filename, target) for filename in files]
+    else:
+        # spawn: the GUI calls this from a thread, and forking a threaded
+        # Tk process is not safe
+        with concurrent.futures.ProcessPoolExecutor(
+                min(workers, len(files)),
+                mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(check_file, files, [target] * len(files),
+                                    chunksize=CHUNK_SIZE))
+    
+    taken = set(taken)
+    if library is not None:
+        taken.update(library.entries)
+    for result in results:
+        if result['error'] is not None:
+            continue
+        name = unique_name(os.path.splitext(os.path.basename(result['file']))[0],
+                           taken)
+        taken.add(name)
+        result['name'] = name
+    
+    report = ImportReport(results, time.perf_counter() - start)
+    if register and report.entries():
+        library.add_entries(report.entries())
+    return report
+
+
+def unique_name(name, taken):
+    """Return name, or name_1, name_2... if it is already taken"""
+    candidate = name
+    counter = 1
+    while candidate in taken:
+        candidate = f"{name}_{counter}"
+        counter += 1
+    return candidate
+
+
+def check_file(filename, library_dir=None):
+    """Load, check and repair one macro file (runs in a worker process)
+    
+    With ``library_dir`` a clean or repaired macro is written there as a
+    new event file.  Returns a result dict as described in ImportReport.
+    """
+    result = {'file': filename, 'name': None, 'events': 0, 'issues': [],
+              'error': None, 'entry': None}
+    try:
+        if macro_format.file_kind(filename) == 'json':
+            store, issues = parse_json(filename)
+        else:
+            loaded = macro_format.load_events(filename)
+            try:
+                store = EventStore.from_events(loaded)
+            finally:
+                loaded.close()
+            issues = []
+        store, repairs = repair(store)
+        issues.extend(repairs)
+        if not store:
+            raise ValueError("no usable events")
+        
+        if library_dir is not None:
+            entry = {'file': new_event_file(), 'hotkey': '', 'speed': 1.0}
+            atomic_write(os.path.join(library_dir, entry['file']),
+                         lambda tmp: macro_format.save_binary(store, tmp))
+            result['entry'] = entry
+        result['events'] = len(store)
+        result['issues'] = issues
+    except Exception as e:
+        # Whatever is wrong with one file must not stop the others
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+
+def parse_json(filename):
+    """Read a JSON macro file, dropping malformed events
+    
+    Returns ``(store, issues)``; raises ValueError if the file is not a
+    JSON list.
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        events = json.load(f)
+    if not isinstance(events, list):
+        raise ValueError("expected a JSON list of events")
+    
+    store = EventStore()
+    intern = store.intern
+    rows = []
+    issues = []
+    for number, event in enumerate(events):
+        try:
+            rows.append(_event_row(event, intern))
+        except ValueError as e:
+            issues.append(f"event {number}: {e}, dropped")
+    
+    if rows:
+        for name, typecode, values in zip(COLUMNS, COLUMN_TYPES, zip(*rows)):
+            setattr(store, name, array(typecode, values))
+    return store, issues
+
+
+def _number(value, field):
+    """Return value as a finite int or float, else raise ValueError"""
+    # value - value is nan for inf and nan, 0 for every finite number
+    if type(value) not in (int, float) or value - value != 0:
+        raise ValueError(f"bad {field} {value!r}")
+    return value
+
+
+def _event_row(event, intern):
+    """Return the column values of one JSON event, in COLUMNS order"""
+    try:
+        type_code = TYPE_CODES[event['type']]
+    except (KeyError, TypeError):
+        raise ValueError("unknown or missing type") from None
+    try:
+        timestamp = _number(event['timestamp'], 'timestamp')
+        data = event['data']
+    except KeyError as e:
+        raise ValueError(f"missing {e.args[0]}") from None
+    if timestamp < 0:
+        raise ValueError(f"negative timestamp {timestamp!r}")
+    if not isinstance(data, dict):
+        raise ValueError("missing data")
+    
+    if type_code >= KEY_PRESS:
+        key = data.get('key')
+        if not isinstance(key, str) or not key:
+            raise ValueError("missing key")
+        return timestamp, type_code, 0, 0, 0, 0, intern(key), 0
+    
+    x = int(_number(data.get('x'), 'x'))
+    y = int(_number(data.get('y'), 'y'))
+    if type_code == MOUSE_CLICK:
+        button = data.get('button')
+        pressed = data.get('pressed')
+        if not isinstance(button, str) or type(pressed) is not bool:
+            raise ValueError("missing button or pressed")
+        return timestamp, type_code, x, y, 0, 0, intern(button), int(pressed)
+    if type_code == MOUSE_SCROLL:
+        return (timestamp, type_code, x, y, int(_number(data.get('dx'), 'dx')),
+                int(_number(data.get('dy'), 'dy')), 0, 0)
+    return timestamp, type_code, x, y, 0, 0, 0, 0
+
+
+def repair(store):
+    """Sort, normalize and pair up the events of a store
+    
+    Returns ``(store, issues)``: a new store (or the same one if nothing
+    needed changing) and a description of every change made.
+    """
+    issues = []
+    timestamps = store.timestamps
+    types = store.types
+    name_ids = store.name_ids
+    order = range(len(store))
+    if any(map(gt, timestamps, islice(timestamps, 1, None))):
+        order = sorted(order, key=timestamps.__getitem__)
+        issues.append("events were out of order, sorted by timestamp")
+    
+    # Only clicks and key events carry names or need pairing
+    actions = [i for i in order if types[i] == MOUSE_CLICK or types[i] >= KEY_PRESS]
+    
+    # Canonical name per name id; None drops the event
+    key_ids = {name_ids[i] for i in actions if types[i] >= KEY_PRESS}
+    button_ids = {name_ids[i] for i in actions if types[i] == MOUSE_CLICK}
+    names = list(store.name_table)
+    for name_id in sorted(key_ids):
+        name = names[name_id]
+        canonical = normalize_key_name(name)
+        if canonical is None:
+            issues.append(f"unknown key {name!r}, its events dropped")
+        elif canonical != name:
+            issues.append(f"key {name!r} renamed to {canonical!r}")
+        names[name_id] = canonical
+    for name_id in sorted(button_ids):
+        if names[name_id] not in BUTTONS:
+            issues.append(f"unknown button {names[name_id]!r}, played as 'left'")
+            names[name_id] = 'left'
+    
+    drop = set()
+    held = {}  # (is_key, name) -> True while pressed
+    orphans = 0
+    for i in actions:
+        type_code = types[i]
+        name = names[name_ids[i]]
+        if name is None:
+            drop.add(i)
+            continue
+        is_key = type_code >= KEY_PRESS
+        pressed = type_code == KEY_PRESS if is_key else store.pressed[i]
+        if pressed:
+            held[(is_key, name)] = True
+        elif held.pop((is_key, name), None) is None:
+            drop.add(i)
+            orphans += 1
+    if orphans:
+        issues.append(f"{orphans} release(s) without a press dropped")
+    if not issues and not held:
+        return store, issues
+    
+    fixed = EventStore()
+    remap = [fixed.intern(name) if name is not None else 0 for name in names]
+    keep = [i for i in order if i not in drop] if drop else list(order)
+    for name, typecode in zip(COLUMNS, COLUMN_TYPES):
+        column = getattr(store, name)
+        if name == 'name_ids':
+            values = [remap[column[i]] for i in keep]
+        else:
+            values = [column[i] for i in keep]
+        setattr(fixed, name, array(typecode, values))
+    
+    if held:
+        end = fixed.duration
+        last_x = last_y = 0
+        for i in range(len(fixed) - 1, -1, -1):
+            if fixed.types[i] < KEY_PRESS:
+                last_x, last_y = fixed.xs[i], fixed.ys[i]
+                break
+        for is_key, name in held:
+            if is_key:
+                fixed.append(end, KEY_RELEASE, name=name)
+            else:
+                fixed.append(end, MOUSE_CLICK, last_x, last_y, name=name,
+                             pressed=False)
+        issues.append("released at the end: "
+                      + ', '.join(name for _, name in held))
+    return fixed, issues
@@ -0,0 +1,84 @@
+"""
+Game Macro Recorder - Ring buffer between input listener callbacks and storage
+"""
+import itertools
+
+
+class RingBuffer:
+    """Preallocated ring of raw input samples with one consumer
+    
+    Producers (the pynput listener threads) only take a sequence number from
+    an ``itertools.count`` - atomic under the GIL - and store one tuple in
+    the slot it maps to, so pushing never blocks or locks.  When producers
+    lap the consumer the oldest samples are overwritten; the consumer spots
+    this from the sequence numbers and counts them in ``overflowed``.
+    """
+    
+    def __init__(self, capacity=65536):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.overflowed = 0
+        self._mask = capacity - 1
+        self._slots = [None] * capacity
+        self._sequence = itertools.count()
+        self._read = 0
+    
+    def push(self, stamp_ns, type_code, a=None, b=None, c=None, d=None):
+        """Store one sample; safe to call from several threads"""
+        seq = next(self._sequence)
+        self._slots[seq & self._mask] = (seq, stamp_ns, type_code, a, b, c, d)
+    
+    def drain(self, handle):
+        """Pass every sample ready so far to handle, in sequence order
+        
+        ``handle`` receives ``(seq, stamp_ns, type_code, a, b, c, d)``.
+        Returns the number of samples handled.
+        """
+        slots = self._slots
+        mask = self._mask
+        read = self._read
+        handled = 0
+        while True:
+            item = slots[read & mask]
+            if item is None or item[0] < read:
+                break
+            if item[0] > read:
+                # Lapped: everything up to this slot's previous turn is gone
+                lost = item[0] - self.capacity + 1 - read
+                self.overflowed += lost
+                read += lost
+                continue
+            handle(item)
+            read += 1
+            handled += 1
+        self._read = read
+        return handled
+
+
+class CallbackTimer:
+    """Count, total and worst-case time spent in one listener's callbacks
+    
+    Each listener calls back from its own thread, so one timer per listener
+    is only ever updated by a single thread.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+    
+    def add(self, elapsed_ns):
+        """Record one callback duration"""
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+    
+    def summary(self):
+        """Return count, mean and max callback latency in microseconds"""
+        return {
+            'callbacks': self.count,
+            'mean_us': (self.total_ns / self.count / 1000) if self.count else 0.0,
+            'max_us': self.max_ns / 1000
+        }
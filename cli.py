@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Game Macro Recorder - Command line interface
+
+    python cli.py                       start the GUI (same as main.py)
+    python cli.py play FILE [options]   play a macro file
+    python cli.py record FILE [options] record until Ctrl+C or --duration
+    python cli.py convert SRC DST       convert between .json, .gmac and .gmz
+    python cli.py inspect FILE          print a macro's statistics
+    python cli.py import DIR [options]  check and add a folder of macros
+    python cli.py bench [playback|startup|fidelity] [options]
+
+Only this module's own imports run at startup.  tkinter, pynput and
+keyboard are imported by the subcommands that need them, so inspect and
+convert work on a headless box and start in a few tens of milliseconds
+(``python cli.py bench startup`` measures it).
+"""
+import argparse
+import os
+import sys
+
+
+def cmd_gui(args):
+    from macro_gui import main
+    main()
+
+
+def cmd_play(args):
+    import time
+    import macro_format
+    from macro_recorder import MacroRecorder
+    
+    events = macro_format.load_events(args.file)
+    if args.start_event is not None and args.start_event > len(events):
+        args.parser.error(f"--start-event: {args.file} has only "
+                          f"{len(events)} events")
+    recorder = MacroRecorder()
+    backend = None
+    if args.dry_run:
+        from input_backend import RecordingBackend
+        backend = RecordingBackend(record=False)
+    
+    if args.delay:
+        print(f"Starting in {args.delay:g} s...")
+        time.sleep(args.delay)
+    try:
+        stats = recorder.playback(events, args.speed, precise=args.precise,
+                                  backend=backend, repeat=args.repeat,
+                                  gap=args.gap, start=args.start,
+                                  start_event=args.start_event,
+                                  mouse_rate=args.mouse_rate,
+                                  smoothing='spline' if args.smooth else 'linear')
+    except KeyboardInterrupt:
+        print("Playback stopped")
+        return 1
+    print(f"Played {args.file}: {stats}")
+    return 0
+
+
+def cmd_record(args):
+    import time
+    import macro_format
+    from macro_recorder import MacroRecorder
+    
+    recorder = MacroRecorder()
+    recorder.start_recording(coalesce_ms=args.coalesce_ms,
+                             coalesce_px=args.coalesce_px,
+                             journal=args.journal)
+    print("Recording... press Ctrl+C to stop"
+          + (f" (or wait {args.duration:g} s)" if args.duration else ""))
+    try:
+        if args.duration:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    
+    events = recorder.stop_recording()
+    if (isinstance(events, macro_format.BinaryMacro)
+            and args.file.lower().endswith(macro_format.BINARY_EXTENSION)):
+        # Journal mode already wrote a .gmac; copy it rather than load it
+        import shutil
+        shutil.copyfile(events.filename, args.file)
+    else:
+        macro_format.save_events(events, args.file)
+    counters = recorder.capture_counters()
+    report = recorder.capture_report
+    print(f"Saved {len(events)} events to {args.file} "
+          f"({report['before']} samples captured, "
+          f"{counters['overflowed'] + counters['dropped']} lost)")
+    return 0
+
+
+def cmd_convert(args):
+    import macro_format
+    
+    count = macro_format.convert(args.src, args.dst, args.codec)
+    src_size = os.path.getsize(args.src)
+    dst_size = os.path.getsize(args.dst)
+    print(f"Converted {count} events: {args.src} -> {args.dst} "
+          f"({src_size:,} -> {dst_size:,} bytes)")
+    return 0
+
+
+def cmd_inspect(args):
+    import macro_format
+    from event_store import EVENT_TYPES
+    
+    macro = macro_format.load_events(args.file)
+    counts = [0] * len(EVENT_TYPES)
+    names = macro.name_table
+    used = set()
+    for _ts, type_code, _x, _y, _dx, _dy, name_id, _pressed in macro.rows():
+        counts[type_code] += 1
+        used.add(name_id)
+    
+    kind = macro_format.file_kind(args.file)
+    print(f"{args.file}: {kind}, {os.path.getsize(args.file):,} bytes")
+    print(f"  events    {len(macro):,}")
+    print(f"  duration  {macro.duration:.3f} s")
+    for type_name, count in zip(EVENT_TYPES, counts):
+        if count:
+            print(f"  {type_name:<12} {count:,}")
+    keys = sorted(names[name_id] for name_id in used if name_id)
+    if keys:
+        print(f"  keys/buttons  {', '.join(keys)}")
+    
+    for _, event in zip(range(args.events), macro):
+        print(f"  {event}")
+    if hasattr(macro, 'close'):
+        macro.close()
+    return 0
+
+
+def cmd_import(args):
+    from bulk_import import import_directory
+    from macro_library import MacroLibrary
+    
+    library = MacroLibrary(args.library)
+    library.load_index()
+    report = import_directory(args.directory, library, workers=args.workers,
+                              dry_run=args.dry_run)
+    print(report.format(max_issues=args.issues))
+    return 1 if report.failed and not report.imported else 0
+
+
+def cmd_bench(args):
+    bench_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'benchmarks')
+    sys.path.insert(0, bench_dir)
+    if args.which == 'startup':
+        import bench_startup as bench
+    elif args.which == 'fidelity':
+        import check_fidelity as bench
+    else:
+        import bench_playback as bench
+    return bench.main(args.bench_args)
+
+
+def non_negative(convert):
+    """argparse type: ``convert`` the value and reject negative numbers"""
+    def parse(text):
+        value = convert(text)
+        if value < 0:
+            raise argparse.ArgumentTypeError(f"must not be negative: {text}")
+        return value
+    parse.__name__ = convert.__name__
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='cli.py', description="Game Macro Recorder command line")
+    commands = parser.add_subparsers(dest='command')
+    
+    commands.add_parser('gui', help="start the graphical interface")
+    
+    play = commands.add_parser('play', help="play a macro file")
+    play.add_argument('file')
+    play.add_argument('--speed', type=float, default=1.0)
+    play.add_argument('--repeat', type=int, default=1,
+                      help="number of runs, 0 = until Ctrl+C")
+    play.add_argument('--gap', type=float, default=0.0,
+                      help="seconds between runs")
+    play.add_argument('--precise', action='store_true',
+                      help="sleep + spin-wait scheduling")
+    play.add_argument('--start', type=non_negative(float), default=0.0,
+                      help="skip to this many seconds into the macro")
+    play.add_argument('--start-event', type=non_negative(int),
+                      help="skip to this event number")
+    play.add_argument('--mouse-rate', type=int, default=0, metavar='HZ',
+                      help="resample mouse moves to HZ (e.g. 125, 250, 500)")
+    play.add_argument('--smooth', action='store_true',
+                      help="spline instead of linear resampling")
+    play.add_argument('--delay', type=float, default=0.0,
+                      help="seconds to wait before starting")
+    play.add_argument('--dry-run', action='store_true',
+                      help="inject nothing, only report timing")
+    play.set_defaults(parser=play)
+    
+    record = commands.add_parser('record', help="record a macro file")
+    record.add_argument('file', help=".json, .gmac or .gmz output file")
+    record.add_argument('--duration', type=float, default=0.0)
+    record.add_argument('--coalesce-ms', type=float, default=0)
+    record.add_argument('--coalesce-px', type=float, default=0)
+    record.add_argument('--journal', help="stream to this journal file")
+    
+    convert = commands.add_parser('convert',
+                                  help="convert between .json, .gmac and .gmz")
+    convert.add_argument('src')
+    convert.add_argument('dst')
+    convert.add_argument('--codec', choices=('zlib', 'lzma', 'none'),
+                         default='zlib', help="compressor for .gmz files")
+    
+    inspect = commands.add_parser('inspect', help="print macro statistics")
+    inspect.add_argument('file')
+    inspect.add_argument('--events', type=int, default=0,
+                         help="also print the first N events")
+    
+    bulk = commands.add_parser('import', help="check and import a folder of macros")
+    bulk.add_argument('directory')
+    bulk.add_argument('--library', default='macro_library',
+                      help="library directory (default: macro_library)")
+    bulk.add_argument('--workers', type=int, default=0,
+                      help="worker processes (default: one per CPU)")
+    bulk.add_argument('--dry-run', action='store_true',
+                      help="only check the files and print the report")
+    bulk.add_argument('--issues', type=int, default=5,
+                      help="problems listed per file")
+    
+    bench = commands.add_parser('bench', help="run a benchmark")
+    bench.add_argument('which', nargs='?',
+                       choices=('playback', 'startup', 'fidelity'),
+                       default='playback')
+    bench.add_argument('bench_args', nargs=argparse.REMAINDER,
+                       help="options passed to the benchmark")
+    return parser
+
+
+COMMANDS = {
+    None: cmd_gui,
+    'gui': cmd_gui,
+    'play': cmd_play,
+    'record': cmd_record,
+    'convert': cmd_convert,
+    'inspect': cmd_inspect,
+    'import': cmd_import,
+    'bench': cmd_bench,
+}
+
+
+def main(argv=None):
+    """Entry point; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    try:
+        return COMMANDS[args.command](args) or 0
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
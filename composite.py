@@ -0,0 +1,212 @@
+"""
+Game Macro Recorder - Composite macros built from references to other macros
+
+A composite macro stores no events of its own, only a list of segments:
+
+    {'macro': 'Jump', 'offset': 0.0, 'repeat': 3, 'gap': 0.1}
+
+meaning "play Jump three times, 0.1 s apart, starting 0.0 s into the
+composite".  Segments may overlap and may name other composites.  Playback
+merges the segments' compiled plans step by step as a generator, so shared
+building blocks are stored and compiled once however many composites use
+them.
+"""
+import heapq
+from operator import itemgetter
+import re
+
+from event_store import EventStore
+
+
+def make_segment(macro, offset=0.0, repeat=1, gap=0.0):
+    """Return a segment dict, checking its fields"""
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    if offset < 0 or gap < 0:
+        raise ValueError("offset and gap cannot be negative")
+    return {'macro': macro, 'offset': float(offset), 'repeat': int(repeat),
+            'gap': float(gap)}
+
+
+# Characters that end an unquoted macro name in a segment list
+SEGMENT_SPECIALS = ',@*+"'
+_SUFFIX = re.compile(r'(?:@([^@*+]*))?(?:\*([^@*+]*))?(?:\+([^@*+]*))?$')
+
+
+def quote_name(name):
+    """Return a macro name as written in a segment list
+    
+    Names containing a comma, '@', '*', '+' or '"', or starting or ending
+    with a space, are put in double quotes, with '"' and '\\' escaped by a
+    backslash; any other name is written as it is.
+    """
+    if (name and name == name.strip()
+            and not any(char in SEGMENT_SPECIALS for char in name)):
+        return name
+    return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def parse_segments(text):
+    """Parse 'name@offset*repeat+gap, ...' into segment dicts
+    
+    Only the name is required: ``Jump``, ``Jump@1.5``, ``Jump*3``,
+    ``Jump@1.5*3+0.2``.  Names with special characters are quoted as
+    quote_name writes them:
+    
+    >>> parse_segments('"Combo + Dash"@1*2, Jump')[0]
+    {'macro': 'Combo + Dash', 'offset': 1.0, 'repeat': 2, 'gap': 0.0}
+    >>> parse_segments(format_segments([make_segment('a,b@c*d"e')]))[0]['macro']
+    'a,b@c*d"e'
+    >>> parse_segments('Jump@1*x')
+    Traceback (most recent call last):
+    ValueError: invalid literal for int() with base 10: 'x'
+    """
+    segments = []
+    pos = 0
+    while pos < len(text):
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        quoted = text.startswith('"', pos)
+        if quoted:
+            name, pos = _read_quoted(text, pos)
+        else:
+            start = pos
+            while pos < len(text) and text[pos] not in SEGMENT_SPECIALS:
+                pos += 1
+            name = text[start:pos].strip()
+        
+        end = text.find(',', pos)
+        if end < 0:
+            end = len(text)
+        suffix = ''.join(text[pos:end].split())
+        pos = end + 1
+        if not (name or quoted or suffix):
+            continue
+        
+        match = _SUFFIX.match(suffix)
+        if match is None:
+            raise ValueError(f"cannot parse {suffix!r} after macro name {name!r}")
+        offset, repeat, gap = match.groups()
+        segments.append(make_segment(name, float(offset or 0.0),
+                                     int(repeat or 1), float(gap or 0.0)))
+    return segments
+
+
+def _read_quoted(text, pos):
+    """Read the quoted name starting at text[pos]; returns (name, end)"""
+    chars = []
+    pos += 1
+    while pos < len(text):
+        char = text[pos]
+        if char == '\\' and pos + 1 < len(text):
+            chars.append(text[pos + 1])
+            pos += 2
+            continue
+        if char == '"':
+            return ''.join(chars), pos + 1
+        chars.append(char)
+        pos += 1
+    raise ValueError("unterminated quoted macro name")
+
+
+def format_segments(segments):
+    """Inverse of parse_segments"""
+    parts = []
+    for segment in segments:
+        part = quote_name(segment['macro'])
+        if segment.get('offset'):
+            part += f"@{segment['offset']:g}"
+        if segment.get('repeat', 1) != 1 or segment.get('gap'):
+            part += f"*{segment.get('repeat', 1)}"
+        if segment.get('gap'):
+            part += f"+{segment['gap']:g}"
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class CompositePlan:
+    """Plan-like view over the segments of a composite macro
+    
+    ``compile(name, speed)`` returns the PlaybackPlan of a referenced
+    macro; ``composites`` maps the names of composite macros to their
+    segments, which are nested as CompositePlans.  References are resolved
+    up front, so missing macros and cycles are reported before playback
+    starts; steps are only generated while playing.
+    """
+    
+    def __init__(self, segments, compile, speed=1.0, composites=None,
+                 _parents=()):
+        composites = composites or {}
+        scale = 1e9 / speed
+        self.speed = speed
+        self.parts = []
+        for segment in segments:
+            name = segment['macro']
+            if name in _parents:
+                raise ValueError(f"Composite macro refers to itself via '{name}'")
+            if name in composites:
+                plan = CompositePlan(composites[name], compile, speed, composites,
+                                     _parents + (name,))
+            else:
+                plan = compile(name, speed)
+            self.parts.append((int(segment.get('offset', 0.0) * scale),
+                               segment.get('repeat', 1),
+                               int(segment.get('gap', 0.0) * scale), plan))
+    
+    def steps(self):
+        """Iterate over (offset_ns, op, arg) of all segments in time order"""
+        return heapq.merge(*(segment_steps(*part) for part in self.parts),
+                           key=itemgetter(0))
+    
+    @property
+    def duration_ns(self):
+        """Deadline of the last step in nanoseconds"""
+        return max((offset_ns + (repeat - 1) * (plan.duration_ns + gap_ns)
+                    + plan.duration_ns
+                    for offset_ns, repeat, gap_ns, plan in self.parts),
+                   default=0)
+    
+    def __len__(self):
+        return sum(repeat * len(plan) for _, repeat, _, plan in self.parts)
+
+
+def segment_steps(offset_ns, repeat, gap_ns, plan):
+    """Generate one segment's steps, shifted to its place in the composite"""
+    period_ns = plan.duration_ns + gap_ns
+    for k in range(repeat):
+        base_ns = offset_ns + k * period_ns
+        for step_offset, op, arg in plan.steps():
+            yield base_ns + step_offset, op, arg
+
+
+def flatten(segments, get_events, composites=None, _parents=()):
+    """Expand a composite into a plain EventStore, e.g. for export
+    
+    ``get_events(name)`` returns a referenced macro's events and
+    ``composites`` is as for CompositePlan.
+    """
+    composites = composites or {}
+    parts = []
+    for segment in segments:
+        name = segment['macro']
+        if name in _parents:
+            raise ValueError(f"Composite macro refers to itself via '{name}'")
+        if name in composites:
+            store = flatten(composites[name], get_events, composites,
+                            _parents + (name,))
+        else:
+            store = EventStore.from_events(get_events(name))
+        period = store.duration + segment.get('gap', 0.0)
+        for k in range(segment.get('repeat', 1)):
+            parts.append((segment.get('offset', 0.0) + k * period, store))
+    
+    def shifted(base, store):
+        names = store.name_table
+        for row in store.rows():
+            yield (base + row[0],) + row[1:6] + (names[row[6]], row[7])
+    
+    flat = EventStore()
+    for row in heapq.merge(*(shifted(base, store) for base, store in parts),
+                           key=itemgetter(0)):
+        flat.append(*row)
+    return flat
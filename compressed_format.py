@@ -0,0 +1,423 @@
+"""
+Game Macro Recorder - Compressed macro files (.gmz)
+
+Mouse paths are very redundant: timestamps grow steadily and positions move
+a few pixels per sample.  This format stores each value as the difference
+from the previous one of its kind, zigzag/varint packed so small
+differences take one byte, and runs the result through zlib or lzma.
+
+Layout (little-endian):
+
+    header   magic b'GMCZ', version u16, codec u8, reserved u8,
+             event count u64, duration f64
+    stream   compressed with the header's codec:
+               name table  varint count, then (varint length, UTF-8 bytes)
+               blocks      varint byte length, then the block (see below)
+               end         a zero-length block
+
+Each block holds up to BLOCK_EVENTS events as columns: a byte per event
+(type code | pressed << 3), timestamp deltas in whole microseconds, x/y
+deltas for mouse events (from the previous mouse event, across blocks),
+name ids for clicks and keys, and dx/dy for scrolls.  Every delta column
+is zigzag-varint coded.  Files are decoded block by block, so playback can
+stream a large macro with memory bounded by one block.
+
+Timestamps are rounded to the microsecond; everything else round-trips
+exactly.
+"""
+from itertools import accumulate
+import lzma
+import struct
+import zlib
+
+from event_store import (EventStore, event_dict, MOUSE_MOVE, MOUSE_CLICK,
+                         MOUSE_SCROLL, KEY_PRESS)
+
+
+MAGIC = b'GMCZ'
+VERSION = 1
+COMPRESSED_EXTENSION = '.gmz'
+
+HEADER = struct.Struct('<4sHBBQd')
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA}
+
+BLOCK_EVENTS = 4096
+READ_SIZE = 65536
+
+
+def is_compressed_file(filename):
+    """Check the magic bytes of a compressed macro file"""
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_compressed(events, filename, codec='zlib'):
+    """Write events (an EventStore or list of dicts) as a compressed macro
+    
+    ``codec`` is 'zlib' (fast to decode), 'lzma' (smallest) or 'none'.
+    Returns the number of bytes written.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec {codec!r}, expected one of "
+                         f"{', '.join(CODECS)}")
+    store = EventStore.from_events(events)
+    compressor = _compressor(CODECS[codec])
+    
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, CODECS[codec], 0, len(store),
+                            store.duration))
+        written = HEADER.size
+        
+        table = bytearray()
+        _put_varint(table, len(store.name_table))
+        for name in store.name_table:
+            encoded = name.encode('utf-8')
+            _put_varint(table, len(encoded))
+            table += encoded
+        written += f.write(compressor.compress(bytes(table)))
+        
+        state = [0, 0, 0]  # Previous timestamp (us), x and y
+        for start in range(0, len(store), BLOCK_EVENTS):
+            block = _encode_block(store, start,
+                                  min(start + BLOCK_EVENTS, len(store)), state)
+            framed = bytearray()
+            _put_varint(framed, len(block))
+            written += f.write(compressor.compress(bytes(framed + block)))
+        written += f.write(compressor.compress(b'\x00'))
+        written += f.write(compressor.flush())
+    return written
+
+
+class CompressedMacro:
+    """Streaming reader for a compressed macro file
+    
+    Offers the sequential part of EventStore's read interface (``rows``,
+    ``name_table``, ``duration``, ``len`` and iteration as dicts), which is
+    all playback needs; each pass decompresses the file again block by
+    block.  Use ``to_store`` for random access.
+    """
+    
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{filename}: truncated header")
+        
+        magic, version, self.codec, _reserved, self.count, self.duration = \
+            HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{filename}: not a compressed macro file")
+        if version != VERSION:
+            raise ValueError(f"{filename}: unsupported format version {version}")
+        if self.codec not in CODECS.values():
+            raise ValueError(f"{filename}: unknown codec {self.codec}")
+        
+        stream = self._open_stream()
+        try:
+            self.name_table = stream.names
+        finally:
+            stream.close()
+    
+    def _open_stream(self):
+        stream = _BlockStream(self.filename, self.codec)
+        try:
+            stream.read_names()
+        except Exception:
+            stream.close()
+            raise
+        return stream
+    
+    def columns(self):
+        """Iterate over decoded blocks as tuples of column lists
+        
+        The columns are in EventStore.rows() order: timestamps, types, xs,
+        ys, dxs, dys, name_ids, pressed.
+        """
+        stream = self._open_stream()
+        try:
+            state = [0, 0, 0]
+            decoded = 0
+            for block in stream.blocks():
+                columns = _decode_block(block, state)
+                decoded += len(columns[0])
+                yield columns
+            if decoded != self.count:
+                raise ValueError(f"{self.filename}: expected {self.count} "
+                                 f"events, found {decoded}")
+        finally:
+            stream.close()
+    
+    def rows(self):
+        """Iterate over events as tuples in EventStore.rows() order"""
+        for columns in self.columns():
+            yield from zip(*columns)
+    
+    def to_store(self):
+        """Decode every block into an in-memory EventStore"""
+        store = EventStore()
+        for name in self.name_table:
+            store.intern(name)
+        targets = (store.timestamps, store.types, store.xs, store.ys,
+                   store.dxs, store.dys, store.name_ids, store.pressed)
+        for columns in self.columns():
+            for target, values in zip(targets, columns):
+                target.extend(values)
+        return store
+    
+    def to_list(self):
+        """Return all events as a list of dicts (the JSON format)"""
+        return list(self)
+    
+    def close(self):
+        """Nothing to release; files are only open while being read"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __len__(self):
+        return self.count
+    
+    def __bool__(self):
+        return self.count > 0
+    
+    def __iter__(self):
+        names = self.name_table
+        for timestamp, type_code, x, y, dx, dy, name_id, pressed in self.rows():
+            yield event_dict(timestamp, type_code, x, y, dx, dy,
+                             names[name_id], pressed)
+
+
+class _BlockStream:
+    """Decompresses a file incrementally and hands out framed blocks"""
+    
+    def __init__(self, filename, codec):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._file.seek(HEADER.size)
+        self._decompressor = _decompressor(codec)
+        self._buffer = bytearray()
+        self._pos = 0
+        self._eof = False
+        self.names = []
+    
+    def close(self):
+        self._file.close()
+    
+    def _fill(self, needed):
+        """Make at least ``needed`` unread bytes available"""
+        while len(self._buffer) - self._pos < needed:
+            if self._eof:
+                raise ValueError(f"{self.filename}: truncated data")
+            del self._buffer[:self._pos]
+            self._pos = 0
+            data = self._file.read(READ_SIZE)
+            if data:
+                self._buffer += self._decompressor.decompress(data)
+            else:
+                self._eof = True
+                if hasattr(self._decompressor, 'flush'):
+                    self._buffer += self._decompressor.flush()
+    
+    def read_varint(self):
+        value = 0
+        shift = 0
+        while True:
+            self._fill(1)
+            byte = self._buffer[self._pos]
+            self._pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+    
+    def read(self, size):
+        self._fill(size)
+        data = bytes(self._buffer[self._pos:self._pos + size])
+        self._pos += size
+        return data
+    
+    def read_names(self):
+        self.names = [self.read(self.read_varint()).decode('utf-8')
+                      for _ in range(self.read_varint())]
+    
+    def blocks(self):
+        """Yield each block's bytes up to the end marker"""
+        while True:
+            size = self.read_varint()
+            if not size:
+                return
+            yield self.read(size)
+
+
+class _RawCodec:
+    """Stand-in (de)compressor for uncompressed files"""
+    
+    def compress(self, data):
+        return data
+    
+    def decompress(self, data):
+        return data
+    
+    def flush(self):
+        return b''
+
+
+def _compressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(9)
+    if codec == CODEC_LZMA:
+        return lzma.LZMACompressor(preset=6)
+    return _RawCodec()
+
+
+def _decompressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_LZMA:
+        return lzma.LZMADecompressor()
+    return _RawCodec()
+
+
+def _put_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _put_signed(out, value):
+    """Append a zigzag-coded signed varint (0, -1, 1, -2... -> 0, 1, 2, 3...)"""
+    _put_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _read_varints(data, pos, count):
+    """Decode ``count`` unsigned varints from data[pos:]; returns (values, pos)"""
+    values = []
+    append = values.append
+    for _ in range(count):
+        byte = data[pos]
+        pos += 1
+        if byte < 0x80:
+            append(byte)
+            continue
+        value = byte & 0x7F
+        shift = 7
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        append(value)
+    return values, pos
+
+
+def _read_signed(data, pos, count):
+    values, pos = _read_varints(data, pos, count)
+    return [(value >> 1) ^ -(value & 1) for value in values], pos
+
+
+def _encode_block(store, start, end, state):
+    """Encode events start..end-1; ``state`` carries deltas between blocks"""
+    previous_us, previous_x, previous_y = state
+    heads = bytearray()
+    times = bytearray()
+    coords = bytearray()
+    names = bytearray()
+    scrolls = bytearray()
+    
+    columns = zip(store.timestamps[start:end], store.types[start:end],
+                  store.xs[start:end], store.ys[start:end],
+                  store.dxs[start:end], store.dys[start:end],
+                  store.name_ids[start:end], store.pressed[start:end])
+    for timestamp, type_code, x, y, dx, dy, name_id, pressed in columns:
+        heads.append(type_code | (pressed << 3))
+        micros = round(timestamp * 1e6)
+        _put_signed(times, micros - previous_us)
+        previous_us = micros
+        
+        if type_code < KEY_PRESS:
+            _put_signed(coords, x - previous_x)
+            _put_signed(coords, y - previous_y)
+            previous_x, previous_y = x, y
+            if type_code == MOUSE_CLICK:
+                _put_varint(names, name_id)
+            elif type_code == MOUSE_SCROLL:
+                _put_signed(scrolls, dx)
+                _put_signed(scrolls, dy)
+        else:
+            _put_varint(names, name_id)
+    
+    state[:] = previous_us, previous_x, previous_y
+    block = bytearray()
+    _put_varint(block, end - start)
+    return block + heads + times + coords + names + scrolls
+
+
+def _decode_block(data, state):
+    """Decode one block into column lists; ``state`` as for _encode_block"""
+    try:
+        count, pos = _read_varints(data, 0, 1)
+        count = count[0]
+        heads = data[pos:pos + count]
+        pos += count
+        if len(heads) != count:
+            raise ValueError("corrupt block: truncated event types")
+        
+        # The pressed bit may be set on any event type, so count on the type
+        types = [head & 7 for head in heads]
+        pressed = [head >> 3 for head in heads]
+        clicks = types.count(MOUSE_CLICK)
+        scroll_count = types.count(MOUSE_SCROLL)
+        mouse = types.count(MOUSE_MOVE) + clicks + scroll_count
+        keys = count - mouse
+        
+        deltas, pos = _read_signed(data, pos, count)
+        coords, pos = _read_signed(data, pos, 2 * mouse)
+        name_ids, pos = _read_varints(data, pos, clicks + keys)
+        scrolls, pos = _read_signed(data, pos, 2 * scroll_count)
+    except IndexError:
+        raise ValueError("corrupt block: truncated columns") from None
+    if pos != len(data):
+        raise ValueError("corrupt block")
+    
+    previous_us, x, y = state
+    micros = list(accumulate(deltas, initial=previous_us))
+    timestamps = [value / 1e6 for value in micros[1:]]
+    xs = [0] * count
+    ys = [0] * count
+    dxs = [0] * count
+    dys = [0] * count
+    names = [0] * count
+    
+    coord = name = scroll = 0
+    for i, type_code in enumerate(types):
+        if type_code < KEY_PRESS:
+            x += coords[coord]
+            y += coords[coord + 1]
+            coord += 2
+            xs[i] = x
+            ys[i] = y
+            if type_code == MOUSE_CLICK:
+                names[i] = name_ids[name]
+                name += 1
+            elif type_code == MOUSE_SCROLL:
+                dxs[i] = scrolls[scroll]
+                dys[i] = scrolls[scroll + 1]
+                scroll += 2
+        else:
+            names[i] = name_ids[name]
+            name += 1
+    
+    state[:] = micros[-1], x, y
+    return timestamps, types, xs, ys, dxs, dys, names, pressed
@@ -0,0 +1,187 @@
+"""
+Game Macro Recorder - Compact column-oriented event storage
+"""
+from array import array
+
+
+# Event type codes, in the order of EVENT_TYPES
+MOUSE_MOVE = 0
+MOUSE_CLICK = 1
+MOUSE_SCROLL = 2
+KEY_PRESS = 3
+KEY_RELEASE = 4
+
+EVENT_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll',
+               'key_press', 'key_release')
+TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+
+def event_dict(timestamp, type_code, x, y, dx, dy, name, pressed):
+    """Build an event in the dict format used by JSON files"""
+    if type_code == MOUSE_MOVE:
+        data = {'x': x, 'y': y}
+    elif type_code == MOUSE_CLICK:
+        data = {
+            'x': x,
+            'y': y,
+            'button': name,
+            'pressed': bool(pressed)
+        }
+    elif type_code == MOUSE_SCROLL:
+        data = {
+            'x': x,
+            'y': y,
+            'dx': dx,
+            'dy': dy
+        }
+    else:
+        data = {'key': name}
+    
+    return {
+        'timestamp': timestamp,
+        'type': EVENT_TYPES[type_code],
+        'data': data
+    }
+
+
+class EventStore:
+    """Stores recorded events in typed columns instead of one dict per event
+    
+    Each event costs a few dozen bytes spread over parallel arrays.  Key and
+    button names are interned into ``name_table`` and referenced by id.  The
+    store still behaves like the old list of event dicts: indexing and
+    iteration yield ``{'timestamp', 'type', 'data'}`` dicts built on demand.
+    """
+    
+    def __init__(self):
+        self.timestamps = array('d')
+        self.types = array('B')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.dxs = array('i')
+        self.dys = array('i')
+        self.name_ids = array('H')
+        self.pressed = array('B')
+        self.name_table = ['']
+        self._name_index = {'': 0}
+    
+    def intern(self, name):
+        """Return the id of a key or button name, adding it if needed"""
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = len(self.name_table)
+            self.name_table.append(name)
+            self._name_index[name] = name_id
+        return name_id
+    
+    def append(self, timestamp, type_code, x=0, y=0, dx=0, dy=0,
+               name='', pressed=False):
+        """Append one event given as column values"""
+        self.timestamps.append(timestamp)
+        self.types.append(type_code)
+        self.xs.append(int(x))
+        self.ys.append(int(y))
+        self.dxs.append(int(dx))
+        self.dys.append(int(dy))
+        self.name_ids.append(self.intern(name))
+        self.pressed.append(1 if pressed else 0)
+    
+    def update_last(self, timestamp, x, y):
+        """Overwrite the time and position of the last event in place"""
+        self.timestamps[-1] = timestamp
+        self.xs[-1] = int(x)
+        self.ys[-1] = int(y)
+    
+    def append_event(self, event):
+        """Append one event given in the dict format"""
+        data = event['data']
+        type_code = TYPE_CODES[event['type']]
+        if type_code == MOUSE_CLICK:
+            name = data['button']
+        elif type_code in (KEY_PRESS, KEY_RELEASE):
+            name = data['key']
+        else:
+            name = ''
+        self.append(event['timestamp'], type_code,
+                    data.get('x', 0), data.get('y', 0),
+                    data.get('dx', 0), data.get('dy', 0),
+                    name, data.get('pressed', False))
+    
+    @classmethod
+    def from_events(cls, events):
+        """Build a store from a list of event dicts (or another store)"""
+        if isinstance(events, cls):
+            return events
+        if hasattr(events, 'to_store'):
+            return events.to_store()
+        store = cls()
+        for event in events:
+            store.append_event(event)
+        return store
+    
+    def copy(self, start=0, end=None):
+        """Return a new store holding events start..end-1 (all by default)
+        
+        Columns are copied with array slicing, so this is cheap even for
+        millions of events.
+        """
+        end = len(self) if end is None else end
+        store = EventStore()
+        store.timestamps = self.timestamps[start:end]
+        store.types = self.types[start:end]
+        store.xs = self.xs[start:end]
+        store.ys = self.ys[start:end]
+        store.dxs = self.dxs[start:end]
+        store.dys = self.dys[start:end]
+        store.name_ids = self.name_ids[start:end]
+        store.pressed = self.pressed[start:end]
+        store.name_table = list(self.name_table)
+        store._name_index = dict(self._name_index)
+        return store
+    
+    def rows(self):
+        """Iterate over events as tuples of raw column values"""
+        return zip(self.timestamps, self.types, self.xs, self.ys,
+                   self.dxs, self.dys, self.name_ids, self.pressed)
+    
+    def event(self, index):
+        """Build the dict view of a single event"""
+        return event_dict(self.timestamps[index], self.types[index],
+                          self.xs[index], self.ys[index],
+                          self.dxs[index], self.dys[index],
+                          self.name_table[self.name_ids[index]],
+                          self.pressed[index])
+    
+    def to_list(self):
+        """Return all events as a list of dicts (the JSON format)"""
+        return [self.event(i) for i in range(len(self))]
+    
+    @property
+    def duration(self):
+        """Timestamp of the last event in seconds"""
+        return self.timestamps[-1] if self.timestamps else 0.0
+    
+    def nbytes(self):
+        """Approximate memory used by the event columns"""
+        columns = (self.timestamps, self.types, self.xs, self.ys,
+                   self.dxs, self.dys, self.name_ids, self.pressed)
+        return sum(len(col) * col.itemsize for col in columns)
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    def __bool__(self):
+        return len(self.timestamps) > 0
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.event(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('event index out of range')
+        return self.event(index)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.event(i)
@@ -0,0 +1,104 @@
+"""
+Game Macro Recorder - Virtualized event table for browsing large macros
+
+The table owns a fixed number of Treeview rows and refills them from the
+event columns whenever it scrolls, so showing a 500k-event macro costs the
+same as showing a 20-event one: no widget or list entry per event.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+from event_store import EventStore, EVENT_TYPES, MOUSE_CLICK, MOUSE_SCROLL, KEY_PRESS
+
+
+COLUMNS = (('index', '#', 70), ('time', 'Time (s)', 90), ('type', 'Type', 100),
+           ('x', 'X', 60), ('y', 'Y', 60), ('delta', 'Scroll', 70),
+           ('name', 'Key / Button', 110), ('pressed', 'Pressed', 70))
+
+
+class EventTable(ttk.Frame):
+    """Scrollable table of an EventStore that renders only visible rows"""
+    
+    def __init__(self, parent, visible_rows=20):
+        super().__init__(parent)
+        self.visible_rows = visible_rows
+        self.store = EventStore()
+        self.first = 0
+        
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in COLUMNS],
+                                 show='headings', height=visible_rows,
+                                 selectmode='none')
+        for column, heading, width in COLUMNS:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor=tk.E)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL,
+                                       command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.rows = [self.tree.insert('', tk.END, values=())
+                     for _ in range(visible_rows)]
+        
+        for widget in (self.tree, self.scrollbar):
+            widget.bind('<MouseWheel>', self.on_wheel)
+            widget.bind('<Button-4>', lambda e: self.scroll_to(self.first - 3))
+            widget.bind('<Button-5>', lambda e: self.scroll_to(self.first + 3))
+        self.tree.bind('<Prior>', lambda e: self.scroll_to(self.first - visible_rows))
+        self.tree.bind('<Next>', lambda e: self.scroll_to(self.first + visible_rows))
+        self.tree.bind('<Home>', lambda e: self.scroll_to(0))
+        self.tree.bind('<End>', lambda e: self.scroll_to(len(self.store)))
+    
+    def set_events(self, events):
+        """Show a macro's events, scrolled to the top"""
+        self.store = EventStore.from_events(events)
+        self.scroll_to(0)
+    
+    def scroll_to(self, first):
+        """Make event ``first`` the top visible row"""
+        count = len(self.store)
+        self.first = max(0, min(first, count - self.visible_rows))
+        self.render()
+        if count:
+            self.scrollbar.set(self.first / count,
+                               min(1.0, (self.first + self.visible_rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def render(self):
+        """Fill the visible rows from the event columns"""
+        store = self.store
+        names = store.name_table
+        count = len(store)
+        for offset, row in enumerate(self.rows):
+            i = self.first + offset
+            if i >= count:
+                self.tree.item(row, values=())
+                continue
+            type_code = store.types[i]
+            values = [i, f"{store.timestamps[i]:.3f}", EVENT_TYPES[type_code],
+                      '', '', '', names[store.name_ids[i]], '']
+            if type_code < KEY_PRESS:
+                values[3] = store.xs[i]
+                values[4] = store.ys[i]
+            if type_code == MOUSE_SCROLL:
+                values[5] = f"{store.dxs[i]}, {store.dys[i]}"
+            elif type_code == MOUSE_CLICK:
+                values[7] = 'yes' if store.pressed[i] else 'no'
+            self.tree.item(row, values=values)
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, units|pages)"""
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.store)))
+        elif unit == 'pages':
+            self.scroll_to(self.first + int(amount) * self.visible_rows)
+        else:
+            self.scroll_to(self.first + int(amount))
+    
+    def on_wheel(self, event):
+        """Scroll three rows per wheel notch"""
+        self.scroll_to(self.first - int(event.delta / 120) * 3)
+        return 'break'
@@ -0,0 +1,202 @@
+"""
+Game Macro Recorder - Timing fidelity check of playback against the source
+
+Plays a macro through MacroRecorder.playback into null_input's logging
+controllers (no display or pynput needed), then lines every injected action
+up with the source event it should reproduce and measures:
+
+  * timing error per action type: how far each action landed from the
+    source timeline scaled by the speed, taking the earliest action
+    (relative to its scheduled time) as the zero point, since playback never
+    injects early
+  * drift: how much the error grew from the start of the macro to its end
+    (median of the last tenth of actions minus median of the first tenth,
+    so a single late action does not count), which catches error
+    accumulating with length
+  * dropped, duplicated and reordered actions
+
+FidelityReport.failures() compares the results with Tolerances.
+"""
+from collections import defaultdict, deque
+from statistics import median
+import time
+
+from event_store import EventStore, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL, KEY_PRESS
+from null_input import null_controllers, ACTION_NAMES, MOVE, BUTTON_PRESS, \
+    BUTTON_RELEASE, SCROLL, KEY_PRESS as ACTION_KEY_PRESS, \
+    KEY_RELEASE as ACTION_KEY_RELEASE
+from scheduler import LatenessStats
+
+
+class Tolerances:
+    """Limits a playback run must stay within; error limits are in microseconds"""
+    
+    def __init__(self, p99_us=5000.0, max_us=50000.0, drift_us=2000.0,
+                 dropped=0, duplicated=0, reordered=0):
+        self.p99_us = p99_us
+        self.max_us = max_us
+        self.drift_us = drift_us
+        self.dropped = dropped
+        self.duplicated = duplicated
+        self.reordered = reordered
+
+
+class FidelityReport:
+    """Alignment of one playback run with its source timeline"""
+    
+    def __init__(self, speed, expected, matched, dropped, duplicated, reordered,
+                 by_type, drift_us, start_latency_us):
+        self.speed = speed
+        self.expected = expected
+        self.matched = matched
+        self.dropped = dropped
+        self.duplicated = duplicated
+        self.reordered = reordered
+        self.by_type = by_type  # action name -> LatenessStats of errors
+        self.drift_us = drift_us
+        self.start_latency_us = start_latency_us
+    
+    def failures(self, tolerances=None):
+        """Return a description of every tolerance exceeded (empty if none)"""
+        limits = tolerances or Tolerances()
+        problems = []
+        for name, value, limit in (('dropped', self.dropped, limits.dropped),
+                                   ('duplicated', self.duplicated, limits.duplicated),
+                                   ('reordered', self.reordered, limits.reordered)):
+            if value > limit:
+                problems.append(f"{value} {name} (limit {limit})")
+        for action, stats in self.by_type.items():
+            summary = stats.summary()
+            if summary['p99_us'] > limits.p99_us:
+                problems.append(f"{action} p99 error {summary['p99_us']:.0f}us "
+                                f"(limit {limits.p99_us:.0f}us)")
+            if summary['max_us'] > limits.max_us:
+                problems.append(f"{action} max error {summary['max_us']:.0f}us "
+                                f"(limit {limits.max_us:.0f}us)")
+        if abs(self.drift_us) > limits.drift_us:
+            problems.append(f"drift {self.drift_us:.0f}us over the macro "
+                            f"(limit {limits.drift_us:.0f}us)")
+        return problems
+    
+    def format(self):
+        """Multi-line summary: counts, then error percentiles per action type"""
+        lines = [f"speed {self.speed:g}: {self.matched}/{self.expected} actions "
+                 f"matched, {self.dropped} dropped, {self.duplicated} duplicated, "
+                 f"{self.reordered} reordered, drift {self.drift_us:.0f}us, "
+                 f"start {self.start_latency_us:.0f}us"]
+        for action, stats in self.by_type.items():
+            summary = stats.summary()
+            lines.append(f"  {action:<15} {summary['events']:>8}  p50 "
+                         f"{summary['p50_us']:>6.0f}us  p99 {summary['p99_us']:>6.0f}us"
+                         f"  max {summary['max_us']:>7.0f}us")
+        return '\n'.join(lines)
+
+
+def expected_actions(events, speed, resolve_key, resolve_button):
+    """Return ``(offsets_ns, actions)`` the source events should produce
+    
+    ``actions`` holds ``(action code, argument)`` pairs as logged by the
+    null_input controllers.  Computed from the events directly rather than
+    from a playback plan, so mistakes in plan compilation show up too.
+    """
+    store = EventStore.from_events(events)
+    names = store.name_table
+    scale = 1e9 / speed
+    offsets = []
+    actions = []
+    for timestamp, type_code, x, y, dx, dy, name_id, pressed in store.rows():
+        if type_code == MOUSE_MOVE:
+            action = (MOVE, (x, y))
+        elif type_code == MOUSE_CLICK:
+            action = (BUTTON_PRESS if pressed else BUTTON_RELEASE,
+                      resolve_button(names[name_id]))
+        elif type_code == MOUSE_SCROLL:
+            action = (SCROLL, (dx, dy))
+        else:
+            key = resolve_key(names[name_id])
+            if not key:
+                continue  # Playback skips keys it cannot resolve
+            action = (ACTION_KEY_PRESS if type_code == KEY_PRESS
+                      else ACTION_KEY_RELEASE, key)
+        offsets.append(int(timestamp * scale))
+        actions.append(action)
+    return offsets, actions
+
+
+def align(expected, actual):
+    """Pair each actual action with an expected one of the same kind
+    
+    Identical actions are paired first-come first-served.  Returns
+    ``(pairs, dropped, duplicated)``: (expected index, actual index) pairs
+    in actual order, unmatched expected indexes and unmatched actual
+    indexes.
+    """
+    pending = defaultdict(deque)
+    for i, action in enumerate(expected):
+        pending[action].append(i)
+    
+    pairs = []
+    duplicated = []
+    for j, action in enumerate(actual):
+        queue = pending.get(action)
+        if queue:
+            pairs.append((queue.popleft(), j))
+        else:
+            duplicated.append(j)
+    dropped = sorted(i for queue in pending.values() for i in queue)
+    return pairs, dropped, duplicated
+
+
+def check_fidelity(events, speed=1.0, precise=False, recorder=None):
+    """Play events at ``speed`` into logging controllers; return a FidelityReport"""
+    if recorder is None:
+        from macro_recorder import MacroRecorder
+        recorder = MacroRecorder()
+    offsets, expected = expected_actions(events, speed, recorder._get_key,
+                                         recorder._get_button)
+    
+    mouse_ctrl, keyboard_ctrl, log = null_controllers()
+    plan = recorder.compile(events, speed, mouse_rate=0)
+    called_ns = time.perf_counter_ns()
+    recorder.playback(plan, mouse_ctrl=mouse_ctrl, keyboard_ctrl=keyboard_ctrl,
+                      precise=precise)
+    
+    actual = list(zip(log.actions, log.args))
+    times = log.times_ns
+    pairs, dropped, duplicated = align(expected, actual)
+    
+    reordered = 0
+    latest = -1
+    for i, _j in pairs:
+        if i < latest:
+            reordered += 1
+        latest = max(latest, i)
+    
+    by_type = {}
+    drift_us = 0.0
+    start_latency_us = 0.0
+    if pairs:
+        lags = [times[j] - offsets[i] for i, j in pairs]
+        origin = min(lags)
+        start_latency_us = (origin - called_ns) / 1000
+        errors = [lag - origin for lag in lags]
+        for (i, _j), error in zip(pairs, errors):
+            name = ACTION_NAMES[expected[i][0]]
+            stats = by_type.get(name)
+            if stats is None:
+                stats = by_type[name] = LatenessStats()
+            stats.add(error)
+        drift_us = _drift([offsets[i] for i, _j in pairs], errors) / 1000
+    
+    return FidelityReport(speed, len(expected), len(pairs), len(dropped),
+                          len(duplicated), reordered, dict(sorted(by_type.items())),
+                          drift_us, start_latency_us)
+
+
+def _drift(offsets, errors):
+    """Median error (ns) of the last tenth of actions minus the first tenth"""
+    if len(errors) < 2:
+        return 0.0
+    by_time = [error for _, error in sorted(zip(offsets, errors))]
+    window = max(1, len(by_time) // 10)
+    return median(by_time[-window:]) - median(by_time[:window])
@@ -0,0 +1,168 @@
+"""
+Game Macro Recorder - Input injection backends used by playback
+"""
+from array import array
+
+from playback_plan import handler_table, OP_MOVE
+from null_input import InputLog
+
+
+class InputBackend:
+    """Base class for the objects playback injects input through
+    
+    A backend exposes one method per plan opcode.  Backends with
+    ``batching`` set also get every group of steps that share a deadline in
+    a single ``submit`` call, followed by ``flush``.
+    """
+    
+    batching = False
+    
+    def move(self, position):
+        raise NotImplementedError
+    
+    def press_button(self, button):
+        raise NotImplementedError
+    
+    def release_button(self, button):
+        raise NotImplementedError
+    
+    def scroll(self, delta):
+        raise NotImplementedError
+    
+    def press_key(self, key):
+        raise NotImplementedError
+    
+    def release_key(self, key):
+        raise NotImplementedError
+    
+    def handlers(self):
+        """Return the opcode-indexed tuple of injection callables"""
+        return handler_table(self.move, self.press_button, self.release_button,
+                             self.scroll, self.press_key, self.release_key)
+    
+    def submit(self, ops, args, start, end):
+        """Inject plan steps start..end-1, all due at the same deadline"""
+        handlers = self.handlers()
+        for i in range(start, end):
+            handlers[ops[i]](args[i])
+        self.flush()
+    
+    def warm(self):
+        """Do any slow first-use setup now rather than on the first event"""
+    
+    def flush(self):
+        """Push out anything the backend buffered (no-op by default)"""
+    
+    def close(self):
+        """Release the backend's resources (no-op by default)"""
+
+
+class PynputBackend(InputBackend):
+    """Injects through pynput controllers, one call per event
+    
+    Any objects with the pynput controller interface can be passed in, e.g.
+    the stand-ins from null_input.
+    """
+    
+    def __init__(self, mouse_ctrl=None, keyboard_ctrl=None):
+        if mouse_ctrl is None or keyboard_ctrl is None:
+            from pynput.mouse import Controller as MouseController
+            from pynput.keyboard import Controller as KeyboardController
+            mouse_ctrl = mouse_ctrl or MouseController()
+            keyboard_ctrl = keyboard_ctrl or KeyboardController()
+        self.mouse_ctrl = mouse_ctrl
+        self.keyboard_ctrl = keyboard_ctrl
+        
+        # Bind the controller methods directly to skip a wrapper call
+        self.press_button = mouse_ctrl.press
+        self.release_button = mouse_ctrl.release
+        self.press_key = keyboard_ctrl.press
+        self.release_key = keyboard_ctrl.release
+    
+    def move(self, position):
+        self.mouse_ctrl.position = position
+    
+    def scroll(self, delta):
+        self.mouse_ctrl.scroll(*delta)
+    
+    def warm(self):
+        # pynput connects to the display server on first use; reading the
+        # cursor position makes that happen before the first macro plays
+        try:
+            self.mouse_ctrl.position
+        except Exception as e:
+            print(f"Error warming up input controllers: {e}")
+
+
+class BatchingBackend(InputBackend):
+    """Submits same-deadline steps to another backend as one batch
+    
+    pynput has no call that injects several events at once, so batching
+    does the next best thing: a move immediately followed by another move
+    in the same batch is dropped, since only the final position can be
+    observed, and the inner backend is flushed once per batch rather than
+    once per event.
+    """
+    
+    batching = True
+    
+    def __init__(self, inner=None):
+        self.inner = inner if inner is not None else PynputBackend()
+        self.batches = 0
+        self.collapsed = 0
+        self._handlers = self.inner.handlers()
+    
+    def handlers(self):
+        return self._handlers
+    
+    def submit(self, ops, args, start, end):
+        handlers = self._handlers
+        last = end - 1
+        for i in range(start, end):
+            op = ops[i]
+            if op == OP_MOVE and i < last and ops[i + 1] == OP_MOVE:
+                self.collapsed += 1
+                continue
+            handlers[op](args[i])
+        self.batches += 1
+        self.inner.flush()
+    
+    def warm(self):
+        self.inner.warm()
+    
+    def close(self):
+        self.inner.close()
+
+
+class RecordingBackend(InputBackend):
+    """Injects nothing; logs each step with its perf_counter_ns time
+    
+    ``log`` is a null_input.InputLog whose action codes are the plan
+    opcodes.  With ``record=False`` it only counts, which makes it a no-op
+    backend for benchmarks.  ``batch_sizes`` holds the size of every batch
+    submitted when ``batching`` is enabled.
+    """
+    
+    def __init__(self, record=True, batching=False):
+        self.batching = batching
+        self.log = InputLog(record)
+        self.batch_sizes = array('I')
+        add = self.log.add
+        self._handlers = tuple(
+            (lambda arg, op=op: add(op, arg)) for op in range(6))
+    
+    def handlers(self):
+        return self._handlers
+    
+    def submit(self, ops, args, start, end):
+        add = self.log.add
+        for i in range(start, end):
+            add(ops[i], args[i])
+        self.batch_sizes.append(end - start)
+    
+    def entries(self):
+        """Iterate over (time_ns, action name, argument) tuples"""
+        return self.log.entries()
+    
+    def __len__(self):
+        return len(self.log)
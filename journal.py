@@ -0,0 +1,237 @@
+"""
+Game Macro Recorder - Append-only recording journal for long sessions
+
+Journal layout (little-endian):
+
+    header   magic b'GMJL', version u16
+    chunks   repeated: magic b'CHNK', new name count u32, record count u32,
+             CRC-32 of the payload u32, then the payload: the new names as
+             (length u16, UTF-8 bytes) followed by fixed-size records in the
+             binary macro record layout
+
+Names are numbered in the order they first appear across chunks.  A chunk
+only counts once its whole payload is on disk with a matching CRC, so a
+journal cut short by a crash recovers up to its last complete chunk.
+"""
+import os
+import struct
+import sys
+import time
+import zlib
+
+from event_store import EventStore
+from macro_format import (RECORD, NAME_LENGTH, HEADER as BINARY_HEADER,
+                          MAGIC as BINARY_MAGIC, VERSION as BINARY_VERSION,
+                          BINARY_EXTENSION, save_events)
+
+
+MAGIC = b'GMJL'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sIII')
+
+
+class JournalWriter:
+    """Appends chunks of events to a journal file
+    
+    ``fsync`` controls durability: ``'chunk'`` syncs after every chunk,
+    ``'never'`` leaves it to the OS, and a number syncs at most once per
+    that many seconds.
+    """
+    
+    def __init__(self, filename, fsync='chunk'):
+        if fsync not in ('chunk', 'never') and not isinstance(fsync, (int, float)):
+            raise ValueError(f"invalid fsync policy: {fsync!r}")
+        self.filename = filename
+        self.fsync = fsync
+        self.count = 0
+        self._names = {}
+        self._last_sync = time.monotonic()
+        self._file = open(filename, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._sync(force=True)
+    
+    def write_chunk(self, store):
+        """Append every event of store as one chunk"""
+        if not store:
+            return
+        
+        payload = bytearray()
+        new_names = 0
+        remap = []
+        for name in store.name_table:
+            name_id = self._names.get(name)
+            if name_id is None:
+                name_id = self._names[name] = len(self._names)
+                encoded = name.encode('utf-8')
+                payload += NAME_LENGTH.pack(len(encoded))
+                payload += encoded
+                new_names += 1
+            remap.append(name_id)
+        
+        records_start = len(payload)
+        payload += bytes(RECORD.size * len(store))
+        pack_into = RECORD.pack_into
+        offset = records_start
+        for timestamp, type_code, x, y, dx, dy, name_id, pressed in store.rows():
+            pack_into(payload, offset, timestamp, x, y, dx, dy,
+                      remap[name_id], type_code, pressed)
+            offset += RECORD.size
+        
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, new_names, len(store),
+                                           zlib.crc32(payload)))
+        self._file.write(payload)
+        self.count += len(store)
+        self._sync()
+    
+    def _sync(self, force=False):
+        """Flush and fsync according to the policy"""
+        self._file.flush()
+        if self.fsync == 'never' and not force:
+            return
+        if self.fsync != 'chunk' and not force:
+            now = time.monotonic()
+            if now - self._last_sync < self.fsync:
+                return
+            self._last_sync = now
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        """Flush, sync and close the journal"""
+        if not self._file.closed:
+            self._sync(force=True)
+            self._file.close()
+
+
+def iter_chunks(f, filename):
+    """Yield ``(names, records, end)`` for every complete chunk of a journal
+    
+    ``f`` is the journal opened for binary reading.  Chunks are read one at
+    a time, so memory use is bounded by the chunk size.  ``names`` are the
+    chunk's new names as UTF-8 bytes, ``records`` its record bytes and
+    ``end`` the file offset just past it.  Stops at the first chunk that is
+    cut short or fails its CRC.
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{filename}: not a recording journal")
+    magic, version = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{filename}: not a recording journal")
+    if version != VERSION:
+        raise ValueError(f"{filename}: unsupported journal version {version}")
+    
+    end = HEADER.size
+    while True:
+        chunk_header = f.read(CHUNK_HEADER.size)
+        if len(chunk_header) < CHUNK_HEADER.size:
+            return
+        chunk_magic, new_names, count, crc = CHUNK_HEADER.unpack(chunk_header)
+        if chunk_magic != CHUNK_MAGIC:
+            return
+        
+        payload = bytearray()
+        names = []
+        for _ in range(new_names):
+            length_bytes = f.read(NAME_LENGTH.size)
+            if len(length_bytes) < NAME_LENGTH.size:
+                return
+            (length,) = NAME_LENGTH.unpack(length_bytes)
+            name = f.read(length)
+            if len(name) < length:
+                return
+            payload += length_bytes
+            payload += name
+            names.append(name)
+        records = f.read(count * RECORD.size)
+        if len(records) < count * RECORD.size:
+            return
+        payload += records
+        if zlib.crc32(payload) != crc:
+            return
+        end += CHUNK_HEADER.size + len(payload)
+        yield names, records, end
+
+
+def read_journal(filename):
+    """Load every complete chunk of a journal into an EventStore
+    
+    Returns ``(store, complete)`` where ``complete`` is False if trailing
+    data was ignored because the last chunk was cut short or corrupted.
+    """
+    store = EventStore()
+    names = []
+    end = HEADER.size
+    with open(filename, 'rb') as f:
+        for chunk_names, records, end in iter_chunks(f, filename):
+            names.extend(name.decode('utf-8') for name in chunk_names)
+            for (timestamp, x, y, dx, dy, name_id, type_code,
+                 pressed) in RECORD.iter_unpack(records):
+                store.append(timestamp, type_code, x, y, dx, dy,
+                             names[name_id], pressed)
+        complete = end == os.fstat(f.fileno()).st_size
+    return store, complete
+
+
+def journal_to_binary(filename, dst):
+    """Write the complete chunks of a journal to a binary macro file
+    
+    Streams chunk by chunk in two passes over the journal (names and counts
+    first, since the binary header and name table come before the
+    records), so even a multi-hour journal is converted in bounded memory.
+    Journal records already use the binary record layout and the final
+    name numbering, so they are copied unchanged.  Returns
+    ``(count, complete)`` as in read_journal.
+    """
+    names = []
+    count = 0
+    duration = 0.0
+    end = HEADER.size
+    with open(filename, 'rb') as f:
+        for chunk_names, records, end in iter_chunks(f, filename):
+            names.extend(chunk_names)
+            if records:
+                count += len(records) // RECORD.size
+                duration = RECORD.unpack_from(records, len(records) - RECORD.size)[0]
+        complete = end == os.fstat(f.fileno()).st_size
+    
+    table = bytearray()
+    for name in names:
+        table += NAME_LENGTH.pack(len(name))
+        table += name
+    with open(filename, 'rb') as f, open(dst, 'wb') as out:
+        out.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, count,
+                                     duration, len(names),
+                                     BINARY_HEADER.size + len(table)))
+        out.write(table)
+        written = 0
+        for _names, records, _end in iter_chunks(f, filename):
+            if written >= count:
+                break
+            out.write(records)
+            written += len(records) // RECORD.size
+    return count, complete
+
+
+def recover(journal, dst):
+    """Turn a (possibly partial) journal into a normal macro file"""
+    if dst.lower().endswith(BINARY_EXTENSION):
+        return journal_to_binary(journal, dst)
+    store, complete = read_journal(journal)
+    save_events(store, dst)
+    return len(store), complete
+
+
+def main():
+    """Command line recovery: python journal.py JOURNAL OUT"""
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} JOURNAL OUT  (OUT may be .json or .gmac)")
+        sys.exit(2)
+    count, complete = recover(sys.argv[1], sys.argv[2])
+    note = "" if complete else " (incomplete final chunk discarded)"
+    print(f"Recovered {count} events{note}: {sys.argv[1]} -> {sys.argv[2]}")
+
+
+if __name__ == '__main__':
+    main()
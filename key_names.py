@@ -0,0 +1,45 @@
+"""
+Game Macro Recorder - Canonical key names
+
+Recordings store special keys by their pynput name ('shift', 'f5') and
+everything else as the typed character.  Hand-edited or shared macros also
+use the 'Key.shift' spelling.  normalize_key_name applies the rules that
+MacroRecorder._get_key uses at playback time, without needing pynput, so
+files can be checked on any machine.
+"""
+try:
+    from pynput.keyboard import Key
+except ImportError:
+    # No pynput or no display; fall back to the names pynput defines on
+    # every platform
+    Key = None
+
+
+if Key is not None:
+    SPECIAL_KEYS = frozenset(Key.__members__)
+else:
+    SPECIAL_KEYS = frozenset(
+        ['alt', 'alt_l', 'alt_r', 'alt_gr', 'backspace', 'caps_lock', 'cmd',
+         'cmd_l', 'cmd_r', 'ctrl', 'ctrl_l', 'ctrl_r', 'delete', 'down', 'end',
+         'enter', 'esc', 'home', 'left', 'page_down', 'page_up', 'right',
+         'shift', 'shift_l', 'shift_r', 'space', 'tab', 'up', 'insert', 'menu',
+         'num_lock', 'pause', 'print_screen', 'scroll_lock',
+         'media_play_pause', 'media_volume_mute', 'media_volume_down',
+         'media_volume_up', 'media_previous', 'media_next']
+        + [f'f{number}' for number in range(1, 21)])
+
+
+def normalize_key_name(name):
+    """Return the canonical form of a stored key name, or None if unknown
+    
+    Special keys come back without a 'Key.' prefix and single characters
+    unchanged; anything else, including a name that is not a string at
+    all, cannot be typed and yields None.
+    """
+    if not isinstance(name, str):
+        return None
+    if name in SPECIAL_KEYS or len(name) == 1:
+        return name
+    if name.startswith('Key.') and name[4:] in SPECIAL_KEYS:
+        return name[4:]
+    return None
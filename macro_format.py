@@ -0,0 +1,255 @@
+"""
+Game Macro Recorder - Macro file formats (JSON, binary, compressed) and conversion
+
+Binary layout (all little-endian, version 1):
+
+    header        magic b'GMAC', version u16, flags u16, event count u64,
+                  duration f64, name count u32, records offset u32
+    string table  name count entries of (length u16, UTF-8 bytes)
+    records       event count fixed-size records of
+                  (timestamp f64, x i32, y i32, dx i32, dy i32,
+                   name id u16, type code u8, pressed u8)
+
+Compressed files (.gmz) are described in compressed_format.
+"""
+import json
+import mmap
+import struct
+import sys
+
+from event_store import EventStore, event_dict
+from compressed_format import (CompressedMacro, save_compressed,
+                               COMPRESSED_EXTENSION, MAGIC as COMPRESSED_MAGIC)
+
+
+MAGIC = b'GMAC'
+VERSION = 1
+BINARY_EXTENSION = '.gmac'
+
+HEADER = struct.Struct('<4sHHQdII')
+NAME_LENGTH = struct.Struct('<H')
+RECORD = struct.Struct('<diiiiHBB')
+
+
+def is_binary_file(filename):
+    """Check the magic bytes to tell a binary macro from a JSON one"""
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_binary(events, filename):
+    """Write events (an EventStore or list of dicts) in the binary format"""
+    store = EventStore.from_events(events)
+    
+    table = bytearray()
+    for name in store.name_table:
+        encoded = name.encode('utf-8')
+        table += NAME_LENGTH.pack(len(encoded))
+        table += encoded
+    
+    records_offset = HEADER.size + len(table)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(store), store.duration,
+                         len(store.name_table), records_offset)
+    
+    records = bytearray(RECORD.size * len(store))
+    pack_into = RECORD.pack_into
+    offset = 0
+    for timestamp, type_code, x, y, dx, dy, name_id, pressed in store.rows():
+        pack_into(records, offset, timestamp, x, y, dx, dy,
+                  name_id, type_code, pressed)
+        offset += RECORD.size
+    
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(table)
+        f.write(records)
+
+
+class BinaryMacro:
+    """Memory-mapped view of a binary macro file
+    
+    Records are decoded lazily from the mapping, so playback can stream
+    through a large file without building the event list first.  It offers
+    the same read interface as EventStore (``rows``, ``name_table``,
+    ``duration``, ``len``, indexing and iteration as dicts).
+    """
+    
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{filename}: file is empty")
+        
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+    
+    def _read_header(self):
+        """Parse the header and string table"""
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{self.filename}: truncated header")
+        
+        (magic, version, _flags, self.count, self.duration,
+         name_count, self._records_offset) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.filename}: not a binary macro file")
+        if version != VERSION:
+            raise ValueError(f"{self.filename}: unsupported format version {version}")
+        
+        self.name_table = []
+        offset = HEADER.size
+        for _ in range(name_count):
+            (length,) = NAME_LENGTH.unpack_from(self._mmap, offset)
+            offset += NAME_LENGTH.size
+            self.name_table.append(
+                self._mmap[offset:offset + length].decode('utf-8'))
+            offset += length
+        
+        end = self._records_offset + self.count * RECORD.size
+        if end > len(self._mmap):
+            raise ValueError(f"{self.filename}: truncated event records")
+    
+    def rows(self):
+        """Iterate over events as tuples in EventStore.rows() order"""
+        start = self._records_offset
+        view = memoryview(self._mmap)[start:start + self.count * RECORD.size]
+        try:
+            for (timestamp, x, y, dx, dy, name_id, type_code,
+                 pressed) in RECORD.iter_unpack(view):
+                yield timestamp, type_code, x, y, dx, dy, name_id, pressed
+        finally:
+            view.release()
+    
+    def event(self, index):
+        """Build the dict view of a single event"""
+        (timestamp, x, y, dx, dy, name_id, type_code,
+         pressed) = RECORD.unpack_from(
+            self._mmap, self._records_offset + index * RECORD.size)
+        return event_dict(timestamp, type_code, x, y, dx, dy,
+                          self.name_table[name_id], pressed)
+    
+    def to_store(self):
+        """Load every record into an in-memory EventStore"""
+        store = EventStore()
+        for name in self.name_table:
+            store.intern(name)
+        for timestamp, type_code, x, y, dx, dy, name_id, pressed in self.rows():
+            store.append(timestamp, type_code, x, y, dx, dy,
+                         self.name_table[name_id], pressed)
+        return store
+    
+    def to_list(self):
+        """Return all events as a list of dicts (the JSON format)"""
+        return [self.event(i) for i in range(self.count)]
+    
+    def close(self):
+        """Release the mapping and the file handle"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __len__(self):
+        return self.count
+    
+    def __bool__(self):
+        return self.count > 0
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('event index out of range')
+        return self.event(index)
+    
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.event(i)
+
+
+def save_json(events, filename):
+    """Write events as an indented JSON list of event dicts"""
+    with open(filename, 'w') as f:
+        json.dump(EventStore.from_events(events).to_list(), f, indent=2)
+
+
+def load_json(filename):
+    """Read a JSON macro file into an EventStore"""
+    with open(filename, 'r') as f:
+        return EventStore.from_events(json.load(f))
+
+
+def file_kind(filename):
+    """Return 'binary', 'compressed' or 'json' from a file's magic bytes"""
+    with open(filename, 'rb') as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return 'binary'
+    if magic == COMPRESSED_MAGIC:
+        return 'compressed'
+    return 'json'
+
+
+def save_events(events, filename, codec='zlib'):
+    """Save events, choosing the format from the file extension
+    
+    ``codec`` applies to compressed (.gmz) files only.
+    """
+    lower = filename.lower()
+    if lower.endswith(BINARY_EXTENSION):
+        save_binary(events, filename)
+    elif lower.endswith(COMPRESSED_EXTENSION):
+        save_compressed(events, filename, codec)
+    else:
+        save_json(events, filename)
+
+
+def load_events(filename):
+    """Load a macro file of any format
+    
+    Binary files come back as a memory-mapped BinaryMacro, compressed files
+    as a streaming CompressedMacro, JSON files as an EventStore.
+    """
+    kind = file_kind(filename)
+    if kind == 'binary':
+        return BinaryMacro(filename)
+    if kind == 'compressed':
+        return CompressedMacro(filename)
+    return load_json(filename)
+
+
+def convert(src, dst, codec='zlib'):
+    """Convert a macro file between the JSON, binary and compressed formats"""
+    events = load_events(src)
+    try:
+        save_events(events, dst, codec)
+    finally:
+        if hasattr(events, 'close'):
+            events.close()
+    return len(events)
+
+
+def main():
+    """Command line converter: python macro_format.py SRC DST"""
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} SRC DST  (use {BINARY_EXTENSION} for binary, "
+              f"{COMPRESSED_EXTENSION} for compressed)")
+        sys.exit(2)
+    count = convert(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} events: {sys.argv[1]} -> {sys.argv[2]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,30 @@
 Game Macro Recorder - Graphical User Interface
 """
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import keyboard
-import threading
-import json
 import os
+import threading
+import time
 from macro_recorder import MacroRecorder
+from event_store import EventStore
+import macro_format
+from path_simplify import simplify_paths
+from path_resample import RATES
+from bulk_import import import_directory, unique_name
+from playback_engine import PlaybackEngine
+from macro_library import MacroLibrary, EventCache
+from composite import CompositePlan, parse_segments, format_segments, flatten
+from ui_queue import UIUpdateQueue
+from event_table import EventTable
+
+
+# Instant replay keeps this many seconds of input
+REPLAY_SECONDS = 30.0
+
+# Input from this long before "Save Replay" was pressed on is left out of
+# the snapshot, so the click on the button itself is not part of the macro
+REPLAY_CLICK_MARGIN_NS = 50_000_000
 
 
 class MacroGUI:
@@ -22,10 +40,26 @@ class MacroGUI:
         self.macros = {}  # Dictionary to store multiple macros
         self.current_macro = None
         self.is_recording = False
-        self.playback_thread = None
+        self.engine = PlaybackEngine()
+        self.library = MacroLibrary()
+        self.events = EventCache(self.library)  # Loaded on first use
+        self.unsaved_events = set()  # Macros whose events are not on disk yet
+        self.last_tracer = None
+        self.ui = UIUpdateQueue(self.window)
+        self.event_window = None
+        self.replay_pressed_ns = None
         
         self.setup_ui()
         self.load_config()
+        self.ui.add_ticker(self.update_progress)
+        self.ui.start()
+        
+        # Start the scheduler thread and warm the input controllers now, so
+        # the first hotkey press does not pay for either
+        try:
+            self.engine.start()
+        except Exception as e:
+            print(f"Error starting playback engine: {e}")
         
     def setup_ui(self):
         """Set up the user interface"""
@@ -88,11 +122,43 @@ class MacroGUI:
         self.speed_label = ttk.Label(speed_frame, text="1.0x")
         self.speed_label.pack(side=tk.LEFT, padx=5)
         self.speed_var.trace('w', self.update_speed_label)
+        self.precise_var = tk.BooleanVar(value=False)
+        self.precise_var.trace('w', self.update_precise)
+        ttk.Checkbutton(speed_frame, text="Precise timing",
+                        variable=self.precise_var).pack(side=tk.LEFT, padx=5)
+        
+        # Repeat
+        ttk.Label(details_frame, text="Repeat:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        repeat_frame = ttk.Frame(details_frame)
+        repeat_frame.grid(row=3, column=1, sticky=tk.W, pady=5, padx=5)
+        self.repeat_var = tk.StringVar(value="1")
+        ttk.Spinbox(repeat_frame, from_=0, to=100000, width=7,
+                    textvariable=self.repeat_var).pack(side=tk.LEFT)
+        ttk.Label(repeat_frame, text="times (0 = until stopped)   Gap:").pack(side=tk.LEFT, padx=5)
+        self.gap_var = tk.StringVar(value="0.0")
+        ttk.Spinbox(repeat_frame, from_=0.0, to=3600.0, increment=0.1, width=7,
+                    textvariable=self.gap_var).pack(side=tk.LEFT)
+        ttk.Label(repeat_frame, text="s").pack(side=tk.LEFT, padx=5)
+        
+        # Mouse resampling
+        ttk.Label(details_frame, text="Mouse Rate:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        mouse_frame = ttk.Frame(details_frame)
+        mouse_frame.grid(row=4, column=1, sticky=tk.W, pady=5, padx=5)
+        self.mouse_rate_var = tk.StringVar(value="Recorded")
+        ttk.Combobox(mouse_frame, textvariable=self.mouse_rate_var, width=10,
+                     state='readonly',
+                     values=["Recorded"] + [f"{rate} Hz" for rate in RATES]
+                     ).pack(side=tk.LEFT)
+        self.smooth_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(mouse_frame, text="Smooth (spline)",
+                        variable=self.smooth_var).pack(side=tk.LEFT, padx=5)
+        self.mouse_rate_var.trace('w', self.update_mouse_rate)
+        self.smooth_var.trace('w', self.update_mouse_rate)
         
         # Event count
-        ttk.Label(details_frame, text="Events:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Label(details_frame, text="Events:").grid(row=5, column=0, sticky=tk.W, pady=5)
         self.events_label = ttk.Label(details_frame, text="0")
-        self.events_label.grid(row=3, column=1, sticky=tk.W, pady=5, padx=5)
+        self.events_label.grid(row=5, column=1, sticky=tk.W, pady=5, padx=5)
         
         # Control buttons
         button_frame = ttk.Frame(main_frame)
@@ -102,6 +168,19 @@ class MacroGUI:
                                      command=self.toggle_recording, width=15)
         self.record_btn.grid(row=0, column=0, padx=5)
         
+        # Mouse moves closer together than this are merged while recording
+        coalesce_frame = ttk.Frame(button_frame)
+        coalesce_frame.grid(row=1, column=0, padx=5, pady=5)
+        ttk.Label(coalesce_frame, text="Merge moves <").pack(side=tk.LEFT)
+        self.coalesce_ms_var = tk.StringVar(value="0")
+        ttk.Spinbox(coalesce_frame, from_=0, to=1000, width=4,
+                    textvariable=self.coalesce_ms_var).pack(side=tk.LEFT, padx=2)
+        ttk.Label(coalesce_frame, text="ms or").pack(side=tk.LEFT)
+        self.coalesce_px_var = tk.StringVar(value="0")
+        ttk.Spinbox(coalesce_frame, from_=0, to=1000, width=4,
+                    textvariable=self.coalesce_px_var).pack(side=tk.LEFT, padx=2)
+        ttk.Label(coalesce_frame, text="px").pack(side=tk.LEFT)
+        
         self.play_btn = ttk.Button(button_frame, text="Play Macro", 
                                    command=self.play_macro, width=15)
         self.play_btn.grid(row=0, column=1, padx=5)
@@ -114,6 +193,14 @@ class MacroGUI:
                                      command=self.delete_macro, width=15)
         self.delete_btn.grid(row=0, column=3, padx=5)
         
+        self.stop_btn = ttk.Button(button_frame, text="Stop Playback",
+                                   command=self.stop_playback, width=15)
+        self.stop_btn.grid(row=1, column=1, padx=5, pady=5)
+        
+        self.pause_btn = ttk.Button(button_frame, text="Pause",
+                                    command=self.toggle_pause, width=15)
+        self.pause_btn.grid(row=1, column=2, padx=5, pady=5)
+        
         # File operations
         file_frame = ttk.Frame(main_frame)
         file_frame.grid(row=5, column=0, columnspan=3, pady=10)
@@ -122,21 +209,101 @@ class MacroGUI:
                   command=self.import_macro, width=15).grid(row=0, column=0, padx=5)
         ttk.Button(file_frame, text="Export Macro", 
                   command=self.export_macro, width=15).grid(row=0, column=1, padx=5)
+        ttk.Button(file_frame, text="Simplify Paths",
+                  command=self.simplify_macro, width=15).grid(row=0, column=2, padx=5)
+        ttk.Button(file_frame, text="Compose Macro",
+                  command=self.compose_macro, width=15).grid(row=1, column=0, padx=5, pady=5)
+        ttk.Button(file_frame, text="View Events",
+                  command=self.view_events, width=15).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Button(file_frame, text="Export Latency",
+                  command=self.export_latency, width=15).grid(row=0, column=3, padx=5)
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(file_frame, text="Record trace", variable=self.trace_var,
+                        command=self.toggle_tracing).grid(row=1, column=2, padx=5, pady=5)
+        ttk.Button(file_frame, text="Export Trace",
+                  command=self.export_trace, width=15).grid(row=1, column=3, padx=5, pady=5)
+        ttk.Button(file_frame, text="Import Folder",
+                  command=self.import_folder, width=15).grid(row=2, column=0, padx=5)
+        self.replay_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(file_frame, text="Instant replay", variable=self.replay_var,
+                        command=self.toggle_instant_replay).grid(row=2, column=1, padx=5)
+        replay_btn = ttk.Button(file_frame, text="Save Replay",
+                                command=self.save_replay, width=15)
+        replay_btn.grid(row=2, column=2, padx=5)
+        replay_btn.bind('<ButtonPress-1>', self.remember_replay_press, add='+')
         
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
                               relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        status_bar.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        self.progress = ttk.Progressbar(main_frame, length=150, maximum=1.0)
+        self.progress.grid(row=6, column=2, sticky=tk.E, padx=5, pady=5)
         
         # Configure grid weights for resizing
         main_frame.rowconfigure(2, weight=1)
         
+    def set_status(self, text):
+        """Show text in the status bar; safe to call from any thread"""
+        self.ui.post('status', self.status_var.set, text)
+    
+    def update_progress(self):
+        """Show how far the most recently started playback has got"""
+        active = self.engine.active()
+        if active:
+            latest = max(active, key=lambda instance: instance.id)
+            self.progress['value'] = latest.progress()
+        elif self.progress['value']:
+            self.progress['value'] = 0
+    
     def update_speed_label(self, *args):
         """Update speed label when scale changes"""
         speed = self.speed_var.get()
         self.speed_label.config(text=f"{speed:.1f}x")
     
+    def update_precise(self, *args):
+        """Apply the precise timing checkbox to the playback engine
+        
+        Kept in sync here so hotkey callbacks never touch Tk variables.
+        """
+        self.engine.precise = self.precise_var.get()
+    
+    def update_mouse_rate(self, *args):
+        """Apply the mouse rate and smoothing choices to plan compilation
+        
+        Plans are cached per setting, so switching back and forth does not
+        recompile.
+        """
+        rate = self.mouse_rate_var.get()
+        self.recorder.mouse_rate = int(rate.split()[0]) if rate[0].isdigit() else 0
+        self.recorder.smoothing = 'spline' if self.smooth_var.get() else 'linear'
+    
+    def macro_settings(self):
+        """Return the speed, repeat and gap fields as macro dict entries
+        
+        Saved with each macro like its hotkey; an unreadable repeat or gap
+        falls back to a single run without a gap.
+        """
+        try:
+            repeat = max(0, int(self.repeat_var.get()))
+        except ValueError:
+            repeat = 1
+        try:
+            gap = max(0.0, float(self.gap_var.get()))
+        except ValueError:
+            gap = 0.0
+        return {'speed': self.speed_var.get(), 'repeat': repeat, 'gap': gap}
+    
+    def coalesce_settings(self):
+        """Return the recording's (coalesce_ms, coalesce_px); unreadable means off"""
+        values = []
+        for var in (self.coalesce_ms_var, self.coalesce_px_var):
+            try:
+                values.append(max(0.0, float(var.get())))
+            except ValueError:
+                values.append(0.0)
+        return tuple(values)
+    
     def on_macro_select(self, event):
         """Handle macro selection from list"""
         selection = self.macro_listbox.curselection()
@@ -158,9 +325,51 @@ class MacroGUI:
             self.hotkey_entry.insert(0, macro.get('hotkey', ''))
             
             self.speed_var.set(macro.get('speed', 1.0))
+            self.repeat_var.set(str(macro.get('repeat', 1)))
+            self.gap_var.set(str(macro.get('gap', 0.0)))
             
-            events = macro.get('events', [])
-            self.events_label.config(text=str(len(events)))
+            if macro.get('segments') is not None:
+                try:
+                    count = str(len(self.compile_macro(macro_name)))
+                except (KeyError, ValueError) as e:
+                    count = f"error: {e}"
+                self.events_label.config(
+                    text=f"{count} (composite: {format_segments(macro['segments'])})")
+            else:
+                events = self.macro_events(macro_name)
+                self.events_label.config(text=str(len(events)))
+    
+    def macro_events(self, macro_name):
+        """Return a macro's events, loading them from the library on first use"""
+        try:
+            return self.events.get(macro_name)
+        except KeyError:
+            return EventStore()  # Not recorded or saved yet
+    
+    def composites(self):
+        """Return {name: segments} of every composite macro"""
+        return {name: macro['segments'] for name, macro in self.macros.items()
+                if macro.get('segments') is not None}
+    
+    def compile_macro(self, macro_name):
+        """Return the playback plan of a plain or composite macro"""
+        macro = self.macros[macro_name]
+        speed = macro.get('speed', 1.0)
+        if macro.get('segments') is None:
+            return self.recorder.compile(self.macro_events(macro_name), speed)
+        
+        def compile_part(name, part_speed):
+            if name not in self.macros:
+                raise KeyError(f"macro '{name}' does not exist")
+            return self.recorder.compile(self.macro_events(name), part_speed)
+        
+        return CompositePlan(macro['segments'], compile_part, speed,
+                             self.composites(), (macro_name,))
+    
+    def set_events(self, macro_name, events):
+        """Replace a macro's events in memory until it is next saved"""
+        self.events.put(macro_name, events, pinned=True)
+        self.unsaved_events.add(macro_name)
     
     def toggle_recording(self):
         """Start or stop recording"""
@@ -168,19 +377,29 @@ class MacroGUI:
             # Start recording
             self.is_recording = True
             self.record_btn.config(text="Stop Recording")
-            self.status_var.set("Recording... Press 'Stop Recording' to finish")
+            self.set_status("Recording... Press 'Stop Recording' to finish")
             
             # Disable other buttons during recording
             self.play_btn.config(state=tk.DISABLED)
             self.save_btn.config(state=tk.DISABLED)
             
-            self.recorder.start_recording()
+            coalesce_ms, coalesce_px = self.coalesce_settings()
+            self.recorder.start_recording(coalesce_ms=coalesce_ms,
+                                          coalesce_px=coalesce_px)
         else:
             # Stop recording
             events = self.recorder.stop_recording()
             self.is_recording = False
             self.record_btn.config(text="Start Recording")
-            self.status_var.set(f"Recording stopped. Captured {len(events)} events")
+            counters = self.recorder.capture_counters()
+            lost = counters['overflowed'] + counters['dropped']
+            status = f"Recording stopped. Captured {len(events)} events"
+            report = self.recorder.capture_report
+            if report['before'] != report['after']:
+                status += f" (merged from {report['before']} samples)"
+            if lost:
+                status += f" ({lost} lost to buffer overflow or errors)"
+            self.set_status(status)
             
             # Re-enable buttons
             self.play_btn.config(state=tk.NORMAL)
@@ -189,13 +408,12 @@ class MacroGUI:
             # Store events temporarily
             name = self.name_entry.get() or f"Macro_{len(self.macros) + 1}"
             hotkey = self.hotkey_entry.get()
-            speed = self.speed_var.get()
             
             self.macros[name] = {
-                'events': events,
                 'hotkey': hotkey,
-                'speed': speed
+                **self.macro_settings()
             }
+            self.set_events(name, events)
             
             self.current_macro = name
             self.refresh_macro_list()
@@ -207,27 +425,63 @@ class MacroGUI:
             messagebox.showwarning("Warning", "Please select a macro to play")
             return
         
-        macro = self.macros[self.current_macro]
-        events = macro.get('events', [])
-        speed = macro.get('speed', 1.0)
+        name = self.current_macro
+        try:
+            plan = self.compile_macro(name)
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot play {name}: {e}")
+            return
         
-        if not events:
+        if not len(plan):
             messagebox.showwarning("Warning", "Macro has no events")
             return
         
-        self.status_var.set(f"Playing macro: {self.current_macro}")
+        def finished(instance):
+            if instance.cancelled:
+                self.set_status(f"Stopped: {name}")
+            else:
+                self.set_status(f"Finished playing: {name} ({instance.stats})")
         
-        # Play in separate thread to avoid blocking UI
-        def play_thread():
+        # The engine's scheduler thread plays it without blocking the UI
+        if self.start_playback(name, on_finish=finished, plan=plan):
+            self.set_status(f"Playing macro: {name}")
+        else:
+            self.set_status(f"{name} is already playing")
+    
+    def start_playback(self, macro_name, on_finish=None, triggered_ns=None,
+                       plan=None):
+        """Hand a macro's compiled plan to the playback engine"""
+        if macro_name not in self.macros:
+            return None
+        if plan is None:
             try:
-                self.recorder.playback(events, speed)
-                self.status_var.set(f"Finished playing: {self.current_macro}")
-            except Exception as e:
-                self.status_var.set(f"Error playing macro: {e}")
+                plan = self.compile_macro(macro_name)
+            except (KeyError, ValueError) as e:
+                self.set_status(f"Cannot play {macro_name}: {e}")
+                return None
         
-        self.playback_thread = threading.Thread(target=play_thread)
-        self.playback_thread.daemon = True
-        self.playback_thread.start()
+        macro = self.macros[macro_name]
+        return self.engine.play(macro_name, plan, on_finish=on_finish,
+                                triggered_ns=triggered_ns,
+                                repeat=macro.get('repeat', 1),
+                                gap_ns=int(macro.get('gap', 0.0) * 1e9))
+    
+    def stop_playback(self):
+        """Cancel every running macro"""
+        self.engine.cancel()
+        self.pause_btn.config(text="Pause")
+        self.set_status("Playback stopped")
+    
+    def toggle_pause(self):
+        """Pause or resume every running macro"""
+        if self.pause_btn.cget('text') == "Pause":
+            self.engine.pause()
+            self.pause_btn.config(text="Resume")
+            self.set_status("Playback paused")
+        else:
+            self.engine.resume()
+            self.pause_btn.config(text="Pause")
+            self.set_status("Playback resumed")
     
     def save_macro(self):
         """Save current macro"""
@@ -236,34 +490,121 @@ class MacroGUI:
             messagebox.showwarning("Warning", "Please enter a macro name")
             return
         
-        # Update or create macro
-        if self.current_macro and self.current_macro in self.macros:
-            events = self.macros[self.current_macro].get('events', [])
-        else:
-            events = []
+        # A macro that was never recorded starts out empty
+        if not (self.current_macro and self.current_macro in self.macros):
+            self.set_events(name, EventStore())
         
         hotkey = self.hotkey_entry.get()
-        speed = self.speed_var.get()
+        
+        segments = None
+        if self.current_macro in self.macros:
+            segments = self.macros[self.current_macro].get('segments')
         
         # Remove old name if renamed
         if self.current_macro and self.current_macro != name and self.current_macro in self.macros:
             del self.macros[self.current_macro]
+            self.rename_references(self.current_macro, name)
+            try:
+                self.library.rename(self.current_macro, name)
+            except Exception as e:
+                print(f"Error saving config: {e}")
+            self.events.rename(self.current_macro, name)
+            if self.current_macro in self.unsaved_events:
+                self.unsaved_events.discard(self.current_macro)
+                self.unsaved_events.add(name)
         
         self.macros[name] = {
-            'events': events,
             'hotkey': hotkey,
-            'speed': speed
+            **self.macro_settings()
         }
+        if segments is not None:
+            self.macros[name]['segments'] = segments
         
         self.current_macro = name
         self.refresh_macro_list()
-        self.save_config()
+        self.save_config(name)
         
         # Register hotkey if specified
         if hotkey:
             self.register_hotkey(name, hotkey)
         
-        self.status_var.set(f"Saved macro: {name}")
+        self.set_status(f"Saved macro: {name}")
+    
+    def rename_references(self, old_name, new_name):
+        """Point composite segments that use old_name at new_name"""
+        for name, segments in self.composites().items():
+            changed = False
+            for segment in segments:
+                if segment['macro'] == old_name:
+                    segment['macro'] = new_name
+                    changed = True
+            if changed and name != old_name:
+                self.save_config(name)
+    
+    def compose_macro(self):
+        """Create or edit a composite macro made of references to others
+        
+        Segments are entered as ``name@offset*repeat+gap``, comma separated;
+        only the name is required.
+        """
+        name = self.name_entry.get()
+        if not name:
+            messagebox.showwarning("Warning", "Please enter a name for the composite macro")
+            return
+        
+        existing = self.macros.get(name, {})
+        if name in self.macros and existing.get('segments') is None:
+            # Composing over a recording would throw its events away
+            if not messagebox.askyesno(
+                    "Replace Macro",
+                    f"'{name}' is a recorded macro. Replace it with a composite "
+                    f"macro? Its recording will be deleted.\n\n"
+                    f"Choose No and change the name to create a new composite."):
+                return
+        text = simpledialog.askstring(
+            "Compose Macro",
+            "Segments as name@offset*repeat+gap, comma separated\n"
+            "(e.g. Jump, Shoot@0.5*3+0.2; quote names that contain\n"
+            "any of , @ * + \", e.g. \"Jump + Dash\"@1):",
+            initialvalue=format_segments(existing.get('segments') or []),
+            parent=self.window)
+        if not text:
+            return
+        
+        try:
+            segments = parse_segments(text)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid segments: {e}")
+            return
+        
+        previous = self.macros.get(name)
+        self.macros[name] = {
+            'hotkey': self.hotkey_entry.get(),
+            **self.macro_settings(),
+            'segments': segments
+        }
+        try:
+            plan = self.compile_macro(name)
+        except (KeyError, ValueError) as e:
+            if previous is None:
+                del self.macros[name]
+            else:
+                self.macros[name] = previous
+            messagebox.showerror("Error", f"Invalid composite macro: {e}")
+            return
+        
+        self.events.discard(name)
+        self.unsaved_events.discard(name)
+        if previous is not None and previous.get('segments') is None:
+            # Confirmed above: drop the recording it replaces
+            self.library.delete(name)
+        self.current_macro = name
+        self.refresh_macro_list()
+        self.save_config(name)
+        if self.macros[name]['hotkey']:
+            self.register_hotkey(name, self.macros[name]['hotkey'])
+        self.events_label.config(text=f"{len(plan)} (composite: {format_segments(segments)})")
+        self.set_status(f"Saved composite macro: {name}")
     
     def delete_macro(self):
         """Delete selected macro"""
@@ -273,6 +614,8 @@ class MacroGUI:
         
         if messagebox.askyesno("Confirm Delete", 
                                f"Delete macro '{self.current_macro}'?"):
+            self.engine.cancel(self.current_macro)
+            
             # Unregister hotkey
             macro = self.macros[self.current_macro]
             if macro.get('hotkey'):
@@ -282,30 +625,39 @@ class MacroGUI:
                     pass
             
             del self.macros[self.current_macro]
+            self.events.discard(self.current_macro)
+            self.unsaved_events.discard(self.current_macro)
+            try:
+                self.library.delete(self.current_macro)
+            except Exception as e:
+                print(f"Error saving config: {e}")
             self.current_macro = None
             self.refresh_macro_list()
-            self.save_config()
             
             # Clear UI
             self.name_entry.delete(0, tk.END)
             self.hotkey_entry.delete(0, tk.END)
             self.events_label.config(text="0")
             
-            self.status_var.set("Macro deleted")
+            self.set_status("Macro deleted")
     
     def import_macro(self):
         """Import macro from file"""
         filename = filedialog.askopenfilename(
             title="Import Macro",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[("Macro files", "*.json *.gmac *.gmz"), ("JSON files", "*.json"),
+                       ("Binary macros", "*.gmac"), ("Compressed macros", "*.gmz"),
+                       ("All files", "*.*")]
         )
         
         if not filename:
             return
         
         try:
-            with open(filename, 'r') as f:
-                data = json.load(f)
+            loaded = macro_format.load_events(filename)
+            events = EventStore.from_events(loaded)
+            if loaded is not events:
+                loaded.close()
             
             name = os.path.splitext(os.path.basename(filename))[0]
             name = f"Imported_{name}"
@@ -318,20 +670,75 @@ class MacroGUI:
                 counter += 1
             
             self.macros[name] = {
-                'events': data,
                 'hotkey': '',
                 'speed': 1.0
             }
+            self.set_events(name, events)
             
             self.current_macro = name
             self.refresh_macro_list()
-            self.save_config()
+            self.save_config(name, write_events=True)
             
-            self.status_var.set(f"Imported macro: {name}")
+            self.set_status(f"Imported macro: {name}")
             messagebox.showinfo("Success", f"Macro imported as '{name}'")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to import macro: {e}")
     
+    def import_folder(self):
+        """Import every macro file in a folder, checked in worker processes
+        
+        The files are parsed, validated and written to the library in the
+        background; the new macros are added on the Tk thread when done.
+        """
+        directory = filedialog.askdirectory(title="Import Macro Folder")
+        if not directory:
+            return
+        self.set_status(f"Importing macros from {directory}...")
+        taken = set(self.macros)
+        
+        def run():
+            try:
+                report = import_directory(directory, self.library, register=False,
+                                          taken=taken)
+            except Exception as e:
+                self.ui.post('import_folder', messagebox.showerror, "Error",
+                             f"Failed to import folder: {e}")
+                return
+            self.ui.post('import_folder', self.finish_import_folder, report)
+        
+        threading.Thread(target=run, name="BulkImport", daemon=True).start()
+    
+    def finish_import_folder(self, report):
+        """Add the macros of a finished bulk import and show its report"""
+        # Macros created while the import ran may have taken a name since
+        for result in report.imported:
+            if result['entry'] is not None and result['name'] in self.macros:
+                result['name'] = unique_name(result['name'], set(self.macros)
+                                             | set(report.entries()))
+        entries = report.entries()
+        if entries:
+            self.library.add_entries(entries)
+        for name in entries:
+            self.macros[name] = {'hotkey': '', 'speed': 1.0}
+            self.events.discard(name)
+            self.unsaved_events.discard(name)
+        self.refresh_macro_list()
+        self.set_status(report.summary())
+        
+        if not report.repaired and not report.failed:
+            messagebox.showinfo("Import Folder", report.summary())
+            return
+        window = tk.Toplevel(self.window)
+        window.title("Import Folder Report")
+        window.geometry("640x400")
+        text = tk.Text(window, wrap=tk.NONE)
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(fill=tk.BOTH, expand=True)
+        text.insert('1.0', report.format())
+        text.configure(state=tk.DISABLED)
+    
     def export_macro(self):
         """Export selected macro to file"""
         if not self.current_macro or self.current_macro not in self.macros:
@@ -341,7 +748,8 @@ class MacroGUI:
         filename = filedialog.asksaveasfilename(
             title="Export Macro",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[("JSON files", "*.json"), ("Binary macros", "*.gmac"),
+                       ("Compressed macros", "*.gmz"), ("All files", "*.*")],
             initialfile=f"{self.current_macro}.json"
         )
         
@@ -350,16 +758,179 @@ class MacroGUI:
         
         try:
             macro = self.macros[self.current_macro]
-            events = macro.get('events', [])
+            if macro.get('segments') is not None:
+                events = flatten(macro['segments'], self.macro_events,
+                                 self.composites(), (self.current_macro,))
+            else:
+                events = self.macro_events(self.current_macro)
             
-            with open(filename, 'w') as f:
-                json.dump(events, f, indent=2)
+            macro_format.save_events(events, filename)
             
-            self.status_var.set(f"Exported macro: {self.current_macro}")
+            self.set_status(f"Exported macro: {self.current_macro}")
             messagebox.showinfo("Success", "Macro exported successfully")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export macro: {e}")
     
+    def simplify_macro(self):
+        """Reduce the selected macro's mouse paths within a pixel tolerance"""
+        if not self.current_macro or self.current_macro not in self.macros:
+            messagebox.showwarning("Warning", "Please select a macro to simplify")
+            return
+        
+        if self.macros[self.current_macro].get('segments') is not None:
+            messagebox.showwarning("Warning", "Simplify the macros a composite is made of instead")
+            return
+        
+        tolerance = simpledialog.askfloat(
+            "Simplify Paths", "Maximum path deviation (pixels):",
+            initialvalue=2.0, minvalue=0.0, parent=self.window)
+        if tolerance is None:
+            return
+        
+        events, report = simplify_paths(self.macro_events(self.current_macro),
+                                        tolerance)
+        self.set_events(self.current_macro, events)
+        self.events_label.config(text=str(len(events)))
+        self.save_config(self.current_macro, write_events=True)
+        
+        self.set_status(f"Simplified {self.current_macro}: "
+                            f"{report['before']} -> {report['after']} events")
+    
+    def export_latency(self):
+        """Save the hotkey-to-first-input latency log as CSV"""
+        if not len(self.engine.trigger_latency):
+            messagebox.showwarning("Warning", "No hotkey playbacks measured yet")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export Hotkey Latency",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            initialfile="hotkey_latency.csv"
+        )
+        
+        if not filename:
+            return
+        
+        try:
+            rows = self.engine.export_trigger_latency(filename)
+            self.set_status(f"Exported {rows} hotkey latency samples")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export latency: {e}")
+    
+    def toggle_tracing(self):
+        """Start or stop recording timing spans for recording and playback"""
+        if self.trace_var.get():
+            self.engine.tracer = self.recorder.enable_tracing()
+            self.set_status("Tracing enabled")
+        else:
+            self.engine.tracer = None
+            self.last_tracer = self.recorder.disable_tracing()
+            self.set_status("Tracing disabled")
+    
+    def export_trace(self):
+        """Save the recorded spans as Chrome trace-event JSON"""
+        tracer = self.recorder.tracer or self.last_tracer
+        if tracer is None:
+            messagebox.showwarning("Warning", "Enable 'Record trace' first")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export Trace",
+            defaultextension=".json",
+            filetypes=[("Trace files", "*.json"), ("All files", "*.*")],
+            initialfile="macro_trace.json"
+        )
+        
+        if not filename:
+            return
+        
+        try:
+            count = self.recorder.export_trace(filename, tracer)
+            self.set_status(f"Exported {count} trace events "
+                                f"(open in chrome://tracing or Perfetto)")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export trace: {e}")
+    
+    def toggle_instant_replay(self):
+        """Start or stop keeping the last REPLAY_SECONDS of input in memory"""
+        if self.replay_var.get():
+            try:
+                self.recorder.start_instant_replay(REPLAY_SECONDS)
+            except RuntimeError as e:
+                self.replay_var.set(False)
+                messagebox.showerror("Error", f"Cannot start instant replay: {e}")
+                return
+            self.set_status(f"Instant replay on: keeping the last "
+                            f"{REPLAY_SECONDS:g} s of input")
+        else:
+            self.recorder.stop_instant_replay()
+            self.set_status("Instant replay off")
+    
+    def remember_replay_press(self, event):
+        """Note when "Save Replay" was pressed, to cut the click off the snapshot"""
+        self.replay_pressed_ns = time.perf_counter_ns()
+    
+    def save_replay(self):
+        """Save the instant replay buffer as a new macro"""
+        if self.recorder.replay is None:
+            messagebox.showwarning("Warning", "Turn on 'Instant replay' first")
+            return
+        
+        pressed_ns, self.replay_pressed_ns = self.replay_pressed_ns, None
+        until_ns = pressed_ns - REPLAY_CLICK_MARGIN_NS if pressed_ns else None
+        events = self.recorder.snapshot_replay(until_ns=until_ns)
+        if not events:
+            messagebox.showwarning("Warning", "No input captured yet")
+            return
+        
+        name = time.strftime("Replay_%H%M%S")
+        counter = 1
+        original_name = name
+        while name in self.macros:
+            name = f"{original_name}_{counter}"
+            counter += 1
+        
+        self.macros[name] = {
+            'hotkey': '',
+            'speed': 1.0
+        }
+        self.set_events(name, events)
+        self.current_macro = name
+        self.refresh_macro_list()
+        self.save_config(name, write_events=True)
+        
+        mouse_us = self.recorder.replay_counters()['mouse']['mean_us']
+        self.set_status(f"Saved the last {events.duration:.1f} s ({len(events)} "
+                        f"events) as {name}; capture costs {mouse_us:.1f} us "
+                        f"per event")
+    
+    def view_events(self):
+        """Open a window listing the selected macro's events"""
+        if not self.current_macro or self.current_macro not in self.macros:
+            messagebox.showwarning("Warning", "Please select a macro to view")
+            return
+        
+        macro = self.macros[self.current_macro]
+        try:
+            if macro.get('segments') is not None:
+                events = flatten(macro['segments'], self.macro_events,
+                                 self.composites(), (self.current_macro,))
+            else:
+                events = self.macro_events(self.current_macro)
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot show {self.current_macro}: {e}")
+            return
+        
+        if self.event_window is None or not self.event_window.winfo_exists():
+            self.event_window = tk.Toplevel(self.window)
+            self.event_window.geometry("700x480")
+            self.event_table = EventTable(self.event_window)
+            self.event_table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.event_window.title(f"Events - {self.current_macro} ({len(events)} events)")
+        self.event_table.set_events(events)
+        self.event_window.lift()
+    
     def refresh_macro_list(self):
         """Refresh the macro list display"""
         self.macro_listbox.delete(0, tk.END)
@@ -387,20 +958,31 @@ class MacroGUI:
                 pass
             
             # Register new hotkey
+            def finished(instance):
+                latency = instance.trigger_latency_ns
+                if latency is not None:
+                    p50 = self.engine.trigger_latency.percentile(50)
+                    self.set_status(
+                        f"Played {macro_name} by hotkey: first input "
+                        f"{latency / 1e6:.2f} ms after its scheduled time "
+                        f"(median {p50 / 1e6:.2f} ms)")
+            
             def play_callback():
-                if macro_name in self.macros:
-                    macro = self.macros[macro_name]
-                    events = macro.get('events', [])
-                    speed = macro.get('speed', 1.0)
-                    
-                    if events:
-                        threading.Thread(
-                            target=lambda: self.recorder.playback(events, speed),
-                            daemon=True
-                        ).start()
+                triggered_ns = time.perf_counter_ns()
+                self.start_playback(macro_name, finished, triggered_ns)
+                tracer = self.recorder.tracer
+                if tracer:
+                    tracer.span('hotkey', 'gui', triggered_ns, time.perf_counter_ns(),
+                                {'macro': macro_name})
             
             keyboard.add_hotkey(hotkey, play_callback)
-            self.status_var.set(f"Registered hotkey '{hotkey}' for {macro_name}")
+            
+            # Compile the plan now so the hotkey starts injecting immediately;
+            # macros not loaded yet are compiled by the startup prefetch
+            events = self.events.peek(macro_name)
+            if events:
+                self.recorder.compile(events, self.macros[macro_name].get('speed', 1.0))
+            self.set_status(f"Registered hotkey '{hotkey}' for {macro_name}")
         except Exception as e:
             messagebox.showerror("Hotkey Error", f"Failed to register hotkey: {e}")
     
@@ -411,30 +993,70 @@ class MacroGUI:
             if hotkey:
                 self.register_hotkey(name, hotkey)
     
-    def save_config(self):
-        """Save configuration to file"""
-        config = {
-            'macros': self.macros
-        }
+    def save_config(self, name, write_events=False):
+        """Save one macro to the library
         
+        Only that macro's event file (when its events changed) and the small
+        index are rewritten, so saving costs the same however big the
+        library is.
+        """
         try:
-            with open('macros_config.json', 'w') as f:
-                json.dump(config, f, indent=2)
+            write_events = write_events or name in self.unsaved_events
+            events = self.macro_events(name) if write_events else None
+            self.library.save(name, self.macros[name], events)
+            self.unsaved_events.discard(name)
+            self.events.unpin(name)
         except Exception as e:
             print(f"Error saving config: {e}")
     
     def load_config(self):
-        """Load configuration from file"""
+        """Load configuration from the macro library
+        
+        Only the index is read here; events are loaded when a macro is first
+        selected or played.  Macros with hotkeys are loaded and compiled by
+        a background prefetch so their first trigger does not wait on disk.
+        """
         try:
-            if os.path.exists('macros_config.json'):
-                with open('macros_config.json', 'r') as f:
-                    config = json.load(f)
-                
-                self.macros = config.get('macros', {})
-                self.refresh_macro_list()
-                self.register_all_hotkeys()
-                
-                self.status_var.set(f"Loaded {len(self.macros)} macros")
+            # One-time migration from the old single-file config
+            if not self.library.exists() and os.path.exists('macros_config.json'):
+                _imported, failed = self.library.import_legacy('macros_config.json')
+                if failed:
+                    messagebox.showwarning(
+                        "Warning", "Some macros could not be imported from "
+                        "macros_config.json:\n" + '\n'.join(
+                            f"{name}: {error}" for name, error in failed.items()))
+            
+            self.macros = {}
+            for name, entry in self.library.load_index().items():
+                self.macros[name] = {
+                    'hotkey': entry.get('hotkey', ''),
+                    'speed': entry.get('speed', 1.0),
+                    'repeat': entry.get('repeat', 1),
+                    'gap': entry.get('gap', 0.0)
+                }
+                if 'segments' in entry:
+                    self.macros[name]['segments'] = entry['segments']
+            self.refresh_macro_list()
+            self.register_all_hotkeys()
+            
+            # Composites are compiled on trigger; prefetch their parts
+            hotkeyed = []
+            for name, macro in self.macros.items():
+                if not macro.get('hotkey'):
+                    continue
+                if macro.get('segments') is None:
+                    hotkeyed.append(name)
+                else:
+                    hotkeyed.extend(segment['macro'] for segment in macro['segments']
+                                    if segment['macro'] in self.macros
+                                    and self.macros[segment['macro']].get('segments') is None)
+            
+            def warm(name, events):
+                self.recorder.compile(events, self.macros[name].get('speed', 1.0))
+            
+            self.events.prefetch(hotkeyed, warm)
+            
+            self.set_status(f"Loaded {len(self.macros)} macros")
         except Exception as e:
             print(f"Error loading config: {e}")
     
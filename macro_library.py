@@ -0,0 +1,307 @@
+"""
+Game Macro Recorder - On-disk macro library: a small index plus one file per macro
+
+Layout:
+
+    <directory>/index.json    names, hotkeys, speeds, repeats and event file names
+    <directory>/<id>.gmac     the events of one macro (binary format)
+
+Composite macros (see composite.py) have their segment list in the index
+instead of an event file.
+
+Saving a macro rewrites only that macro's event file (and only when its
+events changed) plus the index, each through a temporary file that is
+renamed over the old one, so a crash mid-save never leaves a torn file.
+"""
+from collections import OrderedDict
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+from event_store import EventStore
+from macro_format import BinaryMacro, save_binary, BINARY_EXTENSION
+
+
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+
+
+def atomic_write(path, write):
+    """Call write(tmp_path), fsync it, then rename it over path"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def new_event_file():
+    """Return a fresh, unique event file name"""
+    return uuid.uuid4().hex[:16] + BINARY_EXTENSION
+
+
+class MacroLibrary:
+    """Macro metadata index plus per-macro event files in one directory"""
+    
+    def __init__(self, directory='macro_library'):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.entries = {}
+    
+    def exists(self):
+        """Whether the library has been written before"""
+        return os.path.exists(self.index_path)
+    
+    def load_index(self):
+        """Read the index; returns {name: {'hotkey', 'speed', 'repeat', 'gap',
+        'file' or 'segments'}} (repeat and gap may be missing in old indexes)"""
+        if self.exists():
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            self.entries = index.get('macros', {})
+        else:
+            self.entries = {}
+        return self.entries
+    
+    def load_events(self, name):
+        """Read one macro's events into an EventStore"""
+        entry = self.entries[name]
+        with BinaryMacro(os.path.join(self.directory, entry['file'])) as macro:
+            return macro.to_store()
+    
+    def save(self, name, macro, events=None):
+        """Store a macro's settings, and its events if they are given
+        
+        ``macro`` is a GUI macro dict with 'hotkey', 'speed', 'repeat' and
+        'gap', and 'segments' for a composite macro.  A plain macro that is new to the
+        library always gets an event file, empty if no events are given.
+        A recorded macro is never turned into a composite here, since that
+        would delete its recording; ``delete`` it first.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self.entries.get(name)
+        if macro.get('segments') is not None:
+            if entry is not None and 'file' in entry:
+                raise ValueError(f"{name!r} is a recorded macro; delete it "
+                                 f"before saving a composite under its name")
+            entry = {'segments': macro['segments']}
+            events = None
+        elif entry is None or 'file' not in entry:
+            entry = {'file': new_event_file()}
+            if events is None:
+                events = EventStore()
+        
+        if events is not None:
+            events = EventStore.from_events(events)
+            path = os.path.join(self.directory, entry['file'])
+            atomic_write(path, lambda tmp: save_binary(events, tmp))
+        
+        entry['hotkey'] = macro.get('hotkey', '')
+        entry['speed'] = macro.get('speed', 1.0)
+        entry['repeat'] = macro.get('repeat', 1)
+        entry['gap'] = macro.get('gap', 0.0)
+        self.entries[name] = entry
+        self._write_index()
+    
+    def add_entries(self, entries):
+        """Register macros whose event files are already in the directory
+        
+        ``entries`` maps names to index entries.  The index is written once
+        for all of them, which keeps bulk imports fast.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.entries.update(entries)
+        self._write_index()
+    
+    def rename(self, old_name, new_name):
+        """Rename a macro; its event file keeps its name"""
+        if old_name not in self.entries:
+            return
+        if new_name in self.entries:
+            self._remove_file(self.entries[new_name])
+        self.entries[new_name] = self.entries.pop(old_name)
+        self._write_index()
+    
+    def delete(self, name):
+        """Remove a macro and its event file"""
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return
+        self._write_index()
+        self._remove_file(entry)
+    
+    def import_legacy(self, config_path):
+        """Convert a single-file macros_config.json into this library
+        
+        Each macro is converted on its own, so one that cannot be converted
+        is left out (its event file removed) and the rest are still
+        imported; the index is written for those either way, so the
+        migration is not retried on the next start.  Returns
+        ``(imported, failed)``: the number of macros imported and
+        {name: error message} for the ones left out.  The old file is left
+        alone.
+        """
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+        macros = config.get('macros', {})
+        
+        os.makedirs(self.directory, exist_ok=True)
+        imported = 0
+        failed = {}
+        for name, macro in macros.items():
+            entry = {'file': new_event_file()}
+            try:
+                entry['hotkey'] = macro.get('hotkey', '')
+                entry['speed'] = macro.get('speed', 1.0)
+                events = EventStore.from_events(macro.get('events', []))
+                path = os.path.join(self.directory, entry['file'])
+                atomic_write(path, lambda tmp: save_binary(events, tmp))
+            except Exception as e:
+                self._remove_file(entry)
+                failed[name] = str(e) or type(e).__name__
+                continue
+            self.entries[name] = entry
+            imported += 1
+        self._write_index()
+        return imported, failed
+    
+    def _write_index(self):
+        index = {'version': INDEX_VERSION, 'macros': self.entries}
+        
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(index, f, indent=2)
+        
+        atomic_write(self.index_path, write)
+    
+    def _remove_file(self, entry):
+        if 'file' not in entry:
+            return
+        try:
+            os.remove(os.path.join(self.directory, entry['file']))
+        except FileNotFoundError:
+            pass
+
+
+class EventCache:
+    """LRU cache of macro event stores with a memory ceiling
+    
+    Macros are loaded from the library on first use.  When the stores held
+    exceed ``max_bytes`` the least recently used ones are dropped; pinned
+    stores (events not saved to the library yet) are never dropped.
+    """
+    
+    def __init__(self, library, max_bytes=128 * 1024 * 1024):
+        self.library = library
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._stores = OrderedDict()
+        self._pinned = set()
+        self._bytes = 0
+        self._lock = threading.RLock()
+    
+    def get(self, name):
+        """Return a macro's events, loading them from the library if needed"""
+        with self._lock:
+            store = self._stores.get(name)
+            if store is not None:
+                self._stores.move_to_end(name)
+                self.hits += 1
+                return store
+        
+        # Load outside the lock so other lookups are not held up by the I/O
+        store = self.library.load_events(name)
+        with self._lock:
+            existing = self._stores.get(name)
+            if existing is not None:
+                return existing
+            self.misses += 1
+            self._insert(name, store)
+        return store
+    
+    def peek(self, name):
+        """Return a macro's events only if they are already in memory"""
+        with self._lock:
+            return self._stores.get(name)
+    
+    def put(self, name, store, pinned=False):
+        """Add or replace a macro's events"""
+        with self._lock:
+            self.discard(name)
+            if pinned:
+                self._pinned.add(name)
+            self._insert(name, store)
+    
+    def unpin(self, name):
+        """Allow a macro's events to be evicted again (e.g. once saved)"""
+        with self._lock:
+            self._pinned.discard(name)
+            self._evict()
+    
+    def rename(self, old_name, new_name):
+        """Move a cached entry to a new name"""
+        with self._lock:
+            store = self._stores.pop(old_name, None)
+            pinned = old_name in self._pinned
+            self._pinned.discard(old_name)
+            if store is not None:
+                self._bytes -= store.nbytes()
+                self.put(new_name, store, pinned)
+    
+    def discard(self, name):
+        """Forget a macro's events"""
+        with self._lock:
+            store = self._stores.pop(name, None)
+            self._pinned.discard(name)
+            if store is not None:
+                self._bytes -= store.nbytes()
+    
+    def prefetch(self, names, on_loaded=None):
+        """Load macros in a background thread while they fit in the ceiling
+        
+        ``on_loaded(name, store)`` runs for each one, e.g. to compile its
+        playback plan.  Returns the thread.
+        """
+        def run():
+            for name in names:
+                if self._bytes >= self.max_bytes:
+                    break
+                try:
+                    store = self.get(name)
+                    if on_loaded:
+                        on_loaded(name, store)
+                except Exception as e:
+                    print(f"Error prefetching macro {name}: {e}")
+        
+        thread = threading.Thread(target=run, daemon=True, name="MacroPrefetch")
+        thread.start()
+        return thread
+    
+    @property
+    def nbytes(self):
+        """Bytes held by cached event stores"""
+        return self._bytes
+    
+    def _insert(self, name, store):
+        self._stores[name] = store
+        self._bytes += store.nbytes()
+        self._evict()
+    
+    def _evict(self):
+        """Drop least recently used unpinned stores until under the ceiling"""
+        for name in list(self._stores):
+            if self._bytes <= self.max_bytes:
+                break
+            if name in self._pinned or len(self._stores) == 1:
+                continue
+            self._bytes -= self._stores.pop(name).nbytes()
@@ -1,28 +1,121 @@
 """
 Game Macro Recorder - Core recording and playback functionality
 """
+from bisect import bisect_left
+import math
+import threading
 import time
-import json
-from pynput import mouse, keyboard as pynput_keyboard
-from pynput.mouse import Button, Controller as MouseController
-from pynput.keyboard import Key, Controller as KeyboardController
+import weakref
+try:
+    from pynput import mouse, keyboard as pynput_keyboard
+    from pynput.mouse import Button, Controller as MouseController
+    from pynput.keyboard import Key, Controller as KeyboardController
+except ImportError:
+    # No pynput or no display (pynput fails to import on a headless X11
+    # box).  Playback still works against stand-in controllers such as
+    # those in null_input; keys and buttons then stay as names.
+    mouse = pynput_keyboard = None
+    Button = Key = MouseController = KeyboardController = None
+from event_store import (EventStore, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL,
+                         KEY_PRESS, KEY_RELEASE)
+import macro_format
+from playback_plan import PlanCache, OP_MOVE, OP_BUTTON_PRESS, OP_KEY_PRESS
+from input_backend import PynputBackend
+from scheduler import wait_until, LatenessStats, DEFAULT_SPIN_US
+from capture_buffer import RingBuffer, CallbackTimer
+from replay_buffer import ReplayBuffer
+from journal import JournalWriter, journal_to_binary
+from tracing import Tracer
+from null_input import ACTION_NAMES
+from timeline_index import TimelineIndex
+from key_names import normalize_key_name
 
 
 class MacroRecorder:
     """Records and plays back mouse and keyboard actions"""
     
+    BUTTON_MAP = {
+        'left': Button.left,
+        'right': Button.right,
+        'middle': Button.middle
+    } if Button else {}
+    
     def __init__(self):
-        self.events = []
+        self.events = EventStore()
         self.recording = False
         self.start_time = None
         self.mouse_listener = None
         self.keyboard_listener = None
+        self.plans = PlanCache(self._get_key, self._get_button)
+        self.mouse_rate = 0
+        self.smoothing = 'linear'
+        self._indexes = weakref.WeakKeyDictionary()
+        self.last_stats = None
+        self.tracer = None
+        self._playback_cancel = threading.Event()
+        self.coalesce_interval = 0.0
+        self.coalesce_distance = 0.0
+        self.capture_report = None
+        self.buffer_capacity = 65536
+        self._raw_event_count = 0
+        self._move_anchor = None
+        self._ring = None
+        self._start_ns = 0
+        self._drain_thread = None
+        self._drain_stop = threading.Event()
+        self._mouse_timer = CallbackTimer()
+        self._keyboard_timer = CallbackTimer()
+        self._dropped = 0
+        self._journal = None
+        self._chunk_size = 0
+        self.replay = None
+        self._replay_listeners = ()
+        self._replay_mouse_timer = CallbackTimer()
+        self._replay_keyboard_timer = CallbackTimer()
+    
+    def start_recording(self, coalesce_ms=0, coalesce_px=0, journal=None,
+                        chunk_size=4096, fsync='chunk'):
+        """Start recording mouse and keyboard events
         
-    def start_recording(self):
-        """Start recording mouse and keyboard events"""
-        self.events = []
-        self.recording = True
+        With ``coalesce_ms`` or ``coalesce_px`` set, a mouse move that comes
+        sooner than that after, or lands closer than that to, the last
+        stored move replaces that move instead of being appended, so the
+        final cursor position is always kept.
+        
+        Listener callbacks only timestamp the input and push it into a ring
+        buffer; a drain thread turns the samples into stored events.
+        
+        With ``journal`` set to a filename, events are streamed to that
+        append-only journal every ``chunk_size`` events (synced according to
+        ``fsync``, see JournalWriter), so memory stays bounded during long
+        sessions and a crash loses at most one chunk.  ``stop_recording``
+        then converts the journal to ``<journal>.gmac`` and returns it as a
+        memory-mapped BinaryMacro, so stopping does not load the session
+        into memory either.
+        """
+        if mouse is None:
+            raise RuntimeError("Recording needs pynput and a display")
+        
+        self.events = EventStore()
+        self.coalesce_interval = coalesce_ms / 1000.0
+        self.coalesce_distance = coalesce_px
+        self.capture_report = None
+        self._raw_event_count = 0
+        self._move_anchor = None
+        self._ring = RingBuffer(self.buffer_capacity)
+        self._mouse_timer = CallbackTimer()
+        self._keyboard_timer = CallbackTimer()
+        self._dropped = 0
+        self._journal = JournalWriter(journal, fsync) if journal else None
+        self._chunk_size = chunk_size
+        self._drain_stop.clear()
         self.start_time = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self.recording = True
+        
+        self._drain_thread = threading.Thread(target=self._drain_loop,
+                                              daemon=True)
+        self._drain_thread.start()
         
         # Start mouse listener
         self.mouse_listener = mouse.Listener(
@@ -41,150 +134,546 @@ class MacroRecorder:
         self.keyboard_listener.start()
         
     def stop_recording(self):
-        """Stop recording events"""
+        """Stop recording events; returns them (a BinaryMacro in journal mode)"""
         self.recording = False
         if self.mouse_listener:
             self.mouse_listener.stop()
         if self.keyboard_listener:
             self.keyboard_listener.stop()
+        
+        # Let the drain thread store whatever is still buffered
+        if self._drain_thread:
+            self._drain_stop.set()
+            self._drain_thread.join()
+            self._drain_thread = None
+        
+        # In journal mode the full recording is only on disk; convert it
+        # chunk by chunk and map the result rather than loading it
+        if self._journal:
+            self._journal.write_chunk(self.events)
+            self._journal.close()
+            binary = self._journal.filename + macro_format.BINARY_EXTENSION
+            journal_to_binary(self._journal.filename, binary)
+            self.events = macro_format.BinaryMacro(binary)
+            self._journal = None
+        
+        self.capture_report = {
+            'before': self._raw_event_count,
+            'after': len(self.events)
+        }
         return self.events
     
-    def _record_event(self, event_type, data):
-        """Record an event with timestamp"""
-        if not self.recording:
+    def capture_counters(self):
+        """Return callback latency and lost-event counters for the recording"""
+        return {
+            'mouse': self._mouse_timer.summary(),
+            'keyboard': self._keyboard_timer.summary(),
+            'overflowed': self._ring.overflowed if self._ring else 0,
+            'dropped': self._dropped
+        }
+    
+    def _drain_loop(self):
+        """Move samples from the ring buffer into the event store"""
+        drain = self._ring.drain
+        store = self._store_sample
+        while not self._drain_stop.wait(0.005):
+            drain(store)
+            if self._journal and len(self.events) >= self._chunk_size:
+                self._flush_chunk()
+        drain(store)
+    
+    def _flush_chunk(self):
+        """Append the buffered events to the journal and start a new chunk"""
+        try:
+            self._journal.write_chunk(self.events)
+        except OSError as e:
+            self._dropped += len(self.events)
+            print(f"Error writing journal: {e}")
+        self.events = EventStore()
+    
+    def _store_sample(self, item):
+        """Convert one raw ring buffer sample into a stored event"""
+        _seq, stamp_ns, type_code, a, b, c, d = item
+        timestamp = (stamp_ns - self._start_ns) / 1e9
+        self._raw_event_count += 1
+        try:
+            if type_code == MOUSE_MOVE:
+                self._store_move(timestamp, a, b)
+            elif type_code == MOUSE_CLICK:
+                button_name = c.name if hasattr(c, 'name') else str(c)
+                self.events.append(timestamp, MOUSE_CLICK, a, b,
+                                   name=button_name, pressed=d)
+            elif type_code == MOUSE_SCROLL:
+                self.events.append(timestamp, MOUSE_SCROLL, a, b, c, d)
+            else:
+                # Dead keys and some numpad keys have no char to store,
+                # and could not be played back; leave them out
+                name = self._key_name(a)
+                if name:
+                    self.events.append(timestamp, type_code, name=name)
+        except Exception as e:
+            self._dropped += 1
+            print(f"Error storing event: {e}")
+    
+    def _store_move(self, timestamp, x, y):
+        """Store a mouse move, coalescing it into the previous one if enabled"""
+        events = self.events
+        if not (self.coalesce_interval or self.coalesce_distance):
+            events.append(timestamp, MOUSE_MOVE, x, y)
             return
         
-        timestamp = time.time() - self.start_time
-        self.events.append({
-            'timestamp': timestamp,
-            'type': event_type,
-            'data': data
-        })
+        anchor = self._move_anchor
+        if anchor is not None and events.types and events.types[-1] == MOUSE_MOVE:
+            anchor_time, anchor_x, anchor_y = anchor
+            if (timestamp - anchor_time < self.coalesce_interval or
+                    math.hypot(x - anchor_x, y - anchor_y) < self.coalesce_distance):
+                events.update_last(timestamp, x, y)
+                return
+        
+        events.append(timestamp, MOUSE_MOVE, x, y)
+        self._move_anchor = (timestamp, x, y)
+    
+    def _key_name(self, key):
+        """Convert a pynput key to the name stored in events"""
+        try:
+            return key.char if hasattr(key, 'char') else key.name
+        except AttributeError:
+            return str(key)
     
     def _on_mouse_move(self, x, y):
         """Handle mouse move events"""
-        self._record_event('mouse_move', {'x': x, 'y': y})
+        if self.recording:
+            start = time.perf_counter_ns()
+            self._ring.push(start, MOUSE_MOVE, x, y)
+            end = time.perf_counter_ns()
+            self._mouse_timer.add(end - start)
+            if self.tracer:
+                self.tracer.span('mouse_move', 'listener', start, end)
     
     def _on_mouse_click(self, x, y, button, pressed):
         """Handle mouse click events"""
-        button_name = button.name if hasattr(button, 'name') else str(button)
-        self._record_event('mouse_click', {
-            'x': x,
-            'y': y,
-            'button': button_name,
-            'pressed': pressed
-        })
+        if self.recording:
+            start = time.perf_counter_ns()
+            self._ring.push(start, MOUSE_CLICK, x, y, button, pressed)
+            end = time.perf_counter_ns()
+            self._mouse_timer.add(end - start)
+            if self.tracer:
+                self.tracer.span('mouse_click', 'listener', start, end)
     
     def _on_mouse_scroll(self, x, y, dx, dy):
         """Handle mouse scroll events"""
-        self._record_event('mouse_scroll', {
-            'x': x,
-            'y': y,
-            'dx': dx,
-            'dy': dy
-        })
+        if self.recording:
+            start = time.perf_counter_ns()
+            self._ring.push(start, MOUSE_SCROLL, x, y, dx, dy)
+            end = time.perf_counter_ns()
+            self._mouse_timer.add(end - start)
+            if self.tracer:
+                self.tracer.span('mouse_scroll', 'listener', start, end)
     
     def _on_key_press(self, key):
         """Handle key press events"""
-        try:
-            key_char = key.char if hasattr(key, 'char') else key.name
-        except AttributeError:
-            key_char = str(key)
-        
-        self._record_event('key_press', {'key': key_char})
+        if self.recording:
+            start = time.perf_counter_ns()
+            self._ring.push(start, KEY_PRESS, key)
+            end = time.perf_counter_ns()
+            self._keyboard_timer.add(end - start)
+            if self.tracer:
+                self.tracer.span('key_press', 'listener', start, end)
     
     def _on_key_release(self, key):
         """Handle key release events"""
-        try:
-            key_char = key.char if hasattr(key, 'char') else key.name
-        except AttributeError:
-            key_char = str(key)
+        if self.recording:
+            start = time.perf_counter_ns()
+            self._ring.push(start, KEY_RELEASE, key)
+            end = time.perf_counter_ns()
+            self._keyboard_timer.add(end - start)
+            if self.tracer:
+                self.tracer.span('key_release', 'listener', start, end)
+    
+    def start_instant_replay(self, seconds=30.0, mouse_capacity=65536,
+                             keyboard_capacity=4096):
+        """Keep the last ``seconds`` of input in memory until stopped
+        
+        Runs its own listeners, independent of recording, whose callbacks
+        write each event in place into a fixed-size ReplayBuffer (see
+        replay_buffer), so memory stays constant however long it runs.
+        ``snapshot_replay`` turns what it holds into a macro.  Returns the
+        buffer.
+        """
+        if mouse is None:
+            raise RuntimeError("Instant replay needs pynput and a display")
+        
+        self.stop_instant_replay()
+        self._reset_replay(seconds, mouse_capacity, keyboard_capacity)
+        self._replay_listeners = (
+            mouse.Listener(on_move=self._replay_move,
+                           on_click=self._replay_click,
+                           on_scroll=self._replay_scroll),
+            pynput_keyboard.Listener(on_press=self._replay_key_press,
+                                     on_release=self._replay_key_release))
+        for listener in self._replay_listeners:
+            listener.start()
+        return self.replay
+    
+    def stop_instant_replay(self):
+        """Stop the instant replay listeners (the buffer is kept)"""
+        for listener in self._replay_listeners:
+            listener.stop()
+        self._replay_listeners = ()
+    
+    @property
+    def instant_replay(self):
+        """True while instant replay is capturing"""
+        return bool(self._replay_listeners)
+    
+    def snapshot_replay(self, seconds=None, until_ns=None):
+        """Return the last ``seconds`` of instant replay input as an EventStore
         
-        self._record_event('key_release', {'key': key_char})
+        ``until_ns`` (a perf_counter_ns reading) leaves out later events,
+        such as the click that asked for the snapshot.
+        """
+        if self.replay is None:
+            raise RuntimeError("Instant replay has not been started")
+        return self.replay.snapshot(time.perf_counter_ns(), seconds, until_ns)
+    
+    def replay_counters(self):
+        """Return callback latency, events seen and memory of instant replay"""
+        replay = self.replay
+        return {
+            'mouse': self._replay_mouse_timer.summary(),
+            'keyboard': self._replay_keyboard_timer.summary(),
+            'events': (replay.mouse.written + replay.keyboard.written
+                       if replay else 0),
+            'memory_bytes': replay.nbytes() if replay else 0
+        }
+    
+    def _reset_replay(self, seconds, mouse_capacity, keyboard_capacity):
+        """Start a new, empty instant replay buffer and counters"""
+        self.replay = ReplayBuffer(seconds, mouse_capacity, keyboard_capacity)
+        self._replay_mouse_timer = CallbackTimer()
+        self._replay_keyboard_timer = CallbackTimer()
+    
+    def _replay_move(self, x, y):
+        """Instant replay: store a mouse move"""
+        start = time.perf_counter_ns()
+        self.replay.mouse.put(start, MOUSE_MOVE, int(x), int(y), 0, 0, 0, 0)
+        self._replay_mouse_timer.add(time.perf_counter_ns() - start)
+    
+    def _replay_click(self, x, y, button, pressed):
+        """Instant replay: store a mouse button press or release"""
+        start = time.perf_counter_ns()
+        replay = self.replay
+        name = button.name if hasattr(button, 'name') else str(button)
+        replay.mouse.put(start, MOUSE_CLICK, int(x), int(y), 0, 0,
+                         replay.name_id(name), pressed)
+        self._replay_mouse_timer.add(time.perf_counter_ns() - start)
+    
+    def _replay_scroll(self, x, y, dx, dy):
+        """Instant replay: store a scroll"""
+        start = time.perf_counter_ns()
+        self.replay.mouse.put(start, MOUSE_SCROLL, int(x), int(y), int(dx),
+                              int(dy), 0, 0)
+        self._replay_mouse_timer.add(time.perf_counter_ns() - start)
+    
+    def _replay_key_press(self, key):
+        """Instant replay: store a key press"""
+        self._replay_key(KEY_PRESS, key)
+    
+    def _replay_key_release(self, key):
+        """Instant replay: store a key release"""
+        self._replay_key(KEY_RELEASE, key)
+    
+    def _replay_key(self, type_code, key):
+        start = time.perf_counter_ns()
+        name = self._key_name(key)
+        if name:
+            replay = self.replay
+            replay.keyboard.put(start, type_code, 0, 0, 0, 0,
+                                replay.name_id(name), 0)
+        self._replay_keyboard_timer.add(time.perf_counter_ns() - start)
     
-    def playback(self, events, speed=1.0):
-        """Play back recorded events"""
+    def enable_tracing(self, capacity=65536):
+        """Start recording timing spans; returns the Tracer
+        
+        Listener callbacks, playback waits and injection calls are traced
+        until ``disable_tracing``.  Only the last ``capacity`` spans are
+        kept.
+        """
+        if self.tracer is None:
+            self.tracer = Tracer(capacity)
+        return self.tracer
+    
+    def disable_tracing(self):
+        """Stop recording spans (those already recorded are kept)"""
+        tracer, self.tracer = self.tracer, None
+        return tracer
+    
+    def export_trace(self, filename, tracer=None):
+        """Write recorded spans as Chrome trace-event JSON; returns their count"""
+        tracer = tracer or self.tracer
+        if tracer is None:
+            raise RuntimeError("Tracing is not enabled")
+        return tracer.export(filename)
+    
+    def compile(self, events, speed=1.0, mouse_rate=None, smoothing=None):
+        """Return the (cached) playback plan for events at the given speed
+        
+        Compiling ahead of time, e.g. when a hotkey is registered, lets
+        playback start without resolving keys or buttons first.  Mouse moves
+        are resampled to ``mouse_rate`` Hz (0 keeps the recorded samples)
+        with ``smoothing`` interpolation; both default to the recorder's
+        ``mouse_rate`` and ``smoothing`` attributes.  File-backed macros get
+        an uncached StreamingPlan instead (see PlanCache).
+        """
+        if mouse_rate is None:
+            mouse_rate = self.mouse_rate
+        if smoothing is None:
+            smoothing = self.smoothing
+        return self.plans.get(events, speed, mouse_rate, smoothing)
+    
+    def timeline_index(self, events):
+        """Return the (cached) TimelineIndex used to start playback part-way"""
+        if isinstance(events, list):
+            return TimelineIndex(events)
+        cached = self._indexes.get(events)
+        if cached is None or len(cached) != len(events):
+            cached = self._indexes[events] = TimelineIndex(events)
+        return cached
+    
+    def playback(self, events, speed=1.0, precise=False,
+                 spin_us=DEFAULT_SPIN_US, mouse_ctrl=None, keyboard_ctrl=None,
+                 backend=None, repeat=1, gap=0.0, start=0.0, start_event=None,
+                 mouse_rate=None, smoothing=None):
+        """Play back recorded events
+        
+        Accepts an EventStore, a memory-mapped BinaryMacro or a
+        CompressedMacro (both compiled step by step while they play, see
+        StreamingPlan, so they are never loaded), a list of event dicts or
+        an already compiled plan.
+        Deadlines are kept on the monotonic perf_counter_ns clock.  With
+        ``precise`` each wait sleeps until ``spin_us`` before the deadline and
+        spin-waits the rest, trading CPU for accuracy.  Returns the run's
+        LatenessStats, also kept in ``last_stats``.
+        
+        Input goes through ``backend`` (see input_backend), by default a
+        PynputBackend over ``mouse_ctrl`` and ``keyboard_ctrl`` - new pynput
+        controllers unless given, e.g. null_input's stand-ins.  Batching
+        backends receive all steps sharing a deadline in one submit call.
+        
+        The macro is played ``repeat`` times (0 repeats until
+        ``cancel_playback`` is called), waiting ``gap`` seconds between
+        iterations.  Every iteration is scheduled on the same timeline, at
+        start + k * (duration + gap), so timing error does not accumulate
+        from one iteration to the next.
+        
+        ``start`` (seconds into the recording, not negative) or
+        ``start_event`` (an event number from 0 to the event count, which
+        wins if both are given; ValueError otherwise) skips the beginning
+        of the macro.  The keys and buttons held at that point are pressed
+        and the cursor moved to its recorded position first, so the rest
+        plays as it did in the full run.  Seeking uses the cached timeline_index and
+        costs O(log n) however far in the start point is.
+        
+        ``mouse_rate`` and ``smoothing`` resample mouse moves when the plan
+        is compiled (see compile).
+        """
         if not events:
-            return
+            return None
         
-        mouse_ctrl = MouseController()
-        keyboard_ctrl = KeyboardController()
+        plan = (events if hasattr(events, 'steps')
+                else self.compile(events, speed, mouse_rate, smoothing))
         
-        start_time = time.time()
+        first = 0
+        start_offset_ns = 0
+        state = None
+        if start or start_event is not None:
+            if plan is events or not hasattr(plan, 'step_of'):
+                raise ValueError("only a plain macro can be started part-way")
+            if start < 0:
+                raise ValueError(f"start must not be negative, got {start:g}")
+            if start_event is not None and not 0 <= start_event <= len(events):
+                raise ValueError(f"start_event must be between 0 and "
+                                 f"{len(events)}, got {start_event}")
+            index = self.timeline_index(events)
+            if start_event is None:
+                start_event = index.find(start)
+            else:
+                start = index.time_of(start_event)
+            state = index.state_at(start_event)
+            start_offset_ns = int(start * (1e9 / plan.speed))
+            first = (plan.step_at(start_offset_ns) if plan.mouse_rate
+                     else plan.step_of(start_event))
         
-        for event in events:
-            # Wait for the event timestamp
-            target_time = event['timestamp'] / speed
-            elapsed = time.time() - start_time
-            
-            if target_time > elapsed:
-                time.sleep(target_time - elapsed)
+        if backend is None:
+            if (mouse_ctrl is None or keyboard_ctrl is None) and MouseController is None:
+                raise RuntimeError("pynput is unavailable; pass a backend or "
+                                   "controllers to play back headless")
+            backend = PynputBackend(mouse_ctrl, keyboard_ctrl)
+        
+        spin_ns = int(spin_us * 1000) if precise else 0
+        period_ns = max(0, plan.duration_ns - start_offset_ns) + int(gap * 1e9)
+        stats = LatenessStats()
+        cancel = self._playback_cancel
+        cancel.clear()
+        clock = time.perf_counter_ns
+        
+        # Group the steps before the clock starts running (plans generated
+        # on the fly, such as composites, are played step by step)
+        batches = (plan.batches() if backend.batching and hasattr(plan, 'batches')
+                   else None)
+        if batches is not None and first:
+            batches = _batches_from(plan, batches, first)
+        
+        start_ns = clock()
+        iteration = 0
+        while not repeat or iteration < repeat:
+            base_ns = start_ns + iteration * period_ns - start_offset_ns
+            if state is not None:
+                self._restore_state(state, backend)
+            if batches is not None:
+                finished = self._playback_batches(plan, batches, backend, base_ns,
+                                                  spin_ns, stats, cancel)
+            else:
+                finished = self._playback_steps(plan, backend, base_ns, spin_ns,
+                                                stats, cancel, first)
+            if not finished:
+                break
+            iteration += 1
+        
+        self.last_stats = stats
+        return stats
+    
+    def cancel_playback(self):
+        """Stop a running playback (from another thread) at its next step"""
+        self._playback_cancel.set()
+    
+    def _restore_state(self, state, backend):
+        """Inject the cursor position and held buttons and keys of an InputState
+        
+        Each action is injected on its own, so one that fails does not stop
+        the rest; key names normalize_key_name rejects are skipped.
+        """
+        actions = []
+        if state.cursor is not None:
+            actions.append((OP_MOVE, state.cursor))
+        for name in state.buttons:
+            actions.append((OP_BUTTON_PRESS, self._get_button(name)))
+        for name in state.keys:
+            if normalize_key_name(name) is not None:
+                actions.append((OP_KEY_PRESS, self._get_key(name)))
+        handlers = backend.handlers()
+        for op, arg in actions:
+            try:
+                handlers[op](arg)
+            except Exception as e:
+                print(f"Error restoring input state ({ACTION_NAMES[op]} {arg}): {e}")
+    
+    def _playback_steps(self, plan, backend, start_ns, spin_ns, stats, cancel,
+                        first=0):
+        """Playback loop injecting one step at a time
+        
+        Returns False if cancelled before the end of the plan.
+        """
+        record_lateness = stats.add
+        clock = time.perf_counter_ns
+        cancelled = cancel.is_set
+        handlers = backend.handlers()
+        trace = self.tracer.span if self.tracer else None
+        
+        for offset_ns, op, arg in plan.steps(first) if first else plan.steps():
+            # Wait for the event deadline
+            deadline_ns = start_ns + offset_ns
+            now = clock()
+            if deadline_ns > now:
+                waited = now
+                now = wait_until(deadline_ns, spin_ns, cancel)
+                if trace:
+                    trace('wait', 'playback', waited, now)
+            if cancelled():
+                return False
+            record_lateness(now - deadline_ns)
             
             # Execute the event
-            event_type = event['type']
-            data = event['data']
-            
             try:
-                if event_type == 'mouse_move':
-                    mouse_ctrl.position = (data['x'], data['y'])
-                
-                elif event_type == 'mouse_click':
-                    button_map = {
-                        'left': Button.left,
-                        'right': Button.right,
-                        'middle': Button.middle
-                    }
-                    button = button_map.get(data['button'], Button.left)
-                    
-                    if data['pressed']:
-                        mouse_ctrl.press(button)
-                    else:
-                        mouse_ctrl.release(button)
-                
-                elif event_type == 'mouse_scroll':
-                    mouse_ctrl.scroll(data['dx'], data['dy'])
-                
-                elif event_type == 'key_press':
-                    key = self._get_key(data['key'])
-                    if key:
-                        keyboard_ctrl.press(key)
-                
-                elif event_type == 'key_release':
-                    key = self._get_key(data['key'])
-                    if key:
-                        keyboard_ctrl.release(key)
+                handlers[op](arg)
             except Exception as e:
                 print(f"Error playing back event: {e}")
+            if trace:
+                trace(ACTION_NAMES[op], 'inject', now, clock(),
+                      {'late_us': (now - deadline_ns) / 1000})
+        return True
     
-    def _get_key(self, key_str):
-        """Convert key string to Key object"""
-        # Try to get special key
-        try:
-            return getattr(Key, key_str)
-        except AttributeError:
-            pass
+    def _playback_batches(self, plan, batches, backend, start_ns, spin_ns,
+                          stats, cancel):
+        """Playback loop handing each group of same-deadline steps to backend
         
-        # Return as character
-        if len(key_str) == 1:
-            return key_str
+        Returns False if cancelled before the end of the plan.
+        """
+        record_lateness = stats.add
+        clock = time.perf_counter_ns
+        cancelled = cancel.is_set
+        submit = backend.submit
+        ops = plan.ops
+        args = plan.args
+        trace = self.tracer.span if self.tracer else None
         
-        # Handle Key. prefix
-        if key_str.startswith('Key.'):
-            key_name = key_str.replace('Key.', '')
+        for offset_ns, start, end in batches:
+            deadline_ns = start_ns + offset_ns
+            now = clock()
+            if deadline_ns > now:
+                waited = now
+                now = wait_until(deadline_ns, spin_ns, cancel)
+                if trace:
+                    trace('wait', 'playback', waited, now)
+            if cancelled():
+                return False
+            lateness = now - deadline_ns
+            for _ in range(end - start):
+                record_lateness(lateness)
+            
             try:
-                return getattr(Key, key_name)
-            except AttributeError:
-                pass
+                submit(ops, args, start, end)
+            except Exception as e:
+                print(f"Error playing back events: {e}")
+            if trace:
+                trace('batch', 'inject', now, clock(),
+                      {'events': end - start, 'late_us': lateness / 1000})
+        return True
+    
+    def _get_button(self, button_str):
+        """Convert button name to Button object"""
+        if Button is None:
+            return button_str
+        return self.BUTTON_MAP.get(button_str, Button.left)
+    
+    def _get_key(self, key_str):
+        """Convert key string to Key object; None if it is not a string"""
+        if not isinstance(key_str, str):
+            return None  # Skipped by playback, like any unresolved key
+        name = normalize_key_name(key_str)
+        if name is None:
+            return key_str
         
-        return key_str
+        # Special key (with or without the Key. prefix), or a character
+        if len(name) > 1 and Key is not None:
+            return Key[name]
+        return name
     
     def save_to_file(self, filename):
-        """Save recorded events to a file"""
-        with open(filename, 'w') as f:
-            json.dump(self.events, f, indent=2)
+        """Save recorded events to a file (binary if it ends in .gmac)"""
+        macro_format.save_events(self.events, filename)
     
     def load_from_file(self, filename):
-        """Load recorded events from a file"""
-        with open(filename, 'r') as f:
-            self.events = json.load(f)
+        """Load recorded events from a JSON or binary file"""
+        self.events = macro_format.load_events(filename)
         return self.events
+
+
+def _batches_from(plan, batches, first):
+    """Return the batches covering plan steps first.. (the first one cut short)"""
+    k = bisect_left(batches, (plan.offsets_ns[first],)) if first < len(plan) else len(batches)
+    rest = batches[k:]
+    if rest and rest[0][1] < first:
+        offset_ns, _start, end = rest[0]
+        rest[0] = (offset_ns, first, end)
+    return rest
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 """
 Game Macro Recorder - Main Entry Point
-Run this file to start the application
+Run this file to start the application; with arguments it is the command
+line interface (see cli.py), e.g. ``python main.py inspect macro.gmac``
 """
-from macro_gui import main
+import sys
+
+from cli import main
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
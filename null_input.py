@@ -0,0 +1,98 @@
+"""
+Game Macro Recorder - Stand-in input controllers for headless playback
+
+NullMouseController and NullKeyboardController implement the parts of the
+pynput controller interface that playback uses, but only log what they are
+asked to do, and when, into a shared InputLog.  They let playback run on a
+machine with no display and no pynput.
+"""
+from array import array
+import time
+
+
+# Action codes stored in InputLog.actions
+MOVE = 0
+BUTTON_PRESS = 1
+BUTTON_RELEASE = 2
+SCROLL = 3
+KEY_PRESS = 4
+KEY_RELEASE = 5
+
+ACTION_NAMES = ('move', 'button_press', 'button_release', 'scroll',
+                'key_press', 'key_release')
+
+
+class InputLog:
+    """Columns of injected actions: perf_counter_ns time, action code, argument
+    
+    With ``record=False`` only the count is kept, for runs where the log
+    itself would dominate memory.
+    """
+    
+    def __init__(self, record=True):
+        self.record = record
+        self.count = 0
+        self.times_ns = array('q')
+        self.actions = array('B')
+        self.args = []
+    
+    def add(self, action, arg):
+        """Log one injected action"""
+        self.count += 1
+        if self.record:
+            self.times_ns.append(time.perf_counter_ns())
+            self.actions.append(action)
+            self.args.append(arg)
+    
+    def entries(self):
+        """Iterate over (time_ns, action name, argument) tuples"""
+        for time_ns, action, arg in zip(self.times_ns, self.actions, self.args):
+            yield time_ns, ACTION_NAMES[action], arg
+    
+    def __len__(self):
+        return self.count
+
+
+class NullMouseController:
+    """Mouse controller that logs instead of moving the real pointer"""
+    
+    def __init__(self, log=None):
+        self.log = log if log is not None else InputLog()
+        self._position = (0, 0)
+    
+    @property
+    def position(self):
+        return self._position
+    
+    @position.setter
+    def position(self, position):
+        self._position = position
+        self.log.add(MOVE, position)
+    
+    def press(self, button):
+        self.log.add(BUTTON_PRESS, button)
+    
+    def release(self, button):
+        self.log.add(BUTTON_RELEASE, button)
+    
+    def scroll(self, dx, dy):
+        self.log.add(SCROLL, (dx, dy))
+
+
+class NullKeyboardController:
+    """Keyboard controller that logs instead of pressing real keys"""
+    
+    def __init__(self, log=None):
+        self.log = log if log is not None else InputLog()
+    
+    def press(self, key):
+        self.log.add(KEY_PRESS, key)
+    
+    def release(self, key):
+        self.log.add(KEY_RELEASE, key)
+
+
+def null_controllers(record=True):
+    """Return ``(mouse_ctrl, keyboard_ctrl, log)`` sharing one InputLog"""
+    log = InputLog(record)
+    return NullMouseController(log), NullKeyboardController(log), log
@@ -0,0 +1,158 @@
+"""
+Game Macro Recorder - Fixed-rate mouse path resampling
+"""
+from event_store import MOUSE_MOVE, KEY_PRESS
+
+
+RATES = (125, 250, 500)
+METHODS = ('linear', 'spline')
+
+# Pauses longer than this (seconds) between two moves are kept as pauses
+MAX_GAP = 0.1
+
+
+def resample_path(times, xs, ys, rate, method='linear', anchored=False):
+    """Resample one mouse path to ``rate`` samples per second
+    
+    ``times``, ``xs`` and ``ys`` are the recorded points.  With ``anchored``
+    the first point is where the cursor already is (the previous click, say)
+    and is not emitted again.  Samples fall every 1/rate seconds from the
+    first point, and the last recorded point is always emitted at its own
+    time, so the cursor is exactly where it was recorded when the next
+    click or key happens.  Samples that would not move the cursor are left
+    out.  ``method`` is 'linear' or 'spline' (a cubic Hermite curve through
+    the recorded points).  Returns lists ``(times, xs, ys)``.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown interpolation {method!r}, expected "
+                         f"{' or '.join(METHODS)}")
+    count = len(times)
+    end_time = times[-1]
+    interval = 1.0 / rate
+    out_times = []
+    out_xs = []
+    out_ys = []
+    last = (xs[0], ys[0]) if anchored else None
+    
+    if method == 'spline':
+        tangents_x = _tangents(times, xs)
+        tangents_y = _tangents(times, ys)
+    
+    k = 1 if anchored else 0
+    segment = 0
+    while True:
+        t = times[0] + k * interval
+        if t >= end_time:
+            break
+        while times[segment + 1] <= t:
+            segment += 1
+        t0 = times[segment]
+        t1 = times[segment + 1]
+        u = (t - t0) / (t1 - t0)
+        if method == 'linear':
+            x = xs[segment] + (xs[segment + 1] - xs[segment]) * u
+            y = ys[segment] + (ys[segment + 1] - ys[segment]) * u
+        else:
+            x = _hermite(xs, tangents_x, segment, t1 - t0, u)
+            y = _hermite(ys, tangents_y, segment, t1 - t0, u)
+        position = (round(x), round(y))
+        if position != last:
+            out_times.append(t)
+            out_xs.append(position[0])
+            out_ys.append(position[1])
+            last = position
+        k += 1
+    
+    if count > 1 or not anchored:
+        out_times.append(end_time)
+        out_xs.append(xs[-1])
+        out_ys.append(ys[-1])
+    return out_times, out_xs, out_ys
+
+
+def resampled_rows(rows, rate, method='linear'):
+    """Yield EventStore rows with each run of mouse moves resampled
+    
+    Runs are the moves between two clicks, scrolls or key events, split
+    further wherever the mouse rested for more than MAX_GAP seconds.  A run
+    starts from the last known cursor position, placed one average sample
+    interval of the run before its first move, so the cursor rests until
+    then instead of drifting through the pause.  Everything else passes
+    through unchanged.
+    """
+    times = []
+    xs = []
+    ys = []
+    cursor = None  # Cursor position before the current run
+    rest_time = 0.0  # Time of the event before the current run
+    
+    for row in rows:
+        timestamp, type_code, x, y = row[:4]
+        if type_code == MOUSE_MOVE:
+            if times and timestamp - times[-1] > MAX_GAP:
+                yield from _resample_run(times, xs, ys, cursor, rest_time,
+                                         rate, method)
+                cursor = (xs[-1], ys[-1])
+                rest_time = times[-1]
+                times, xs, ys = [], [], []
+            if times and timestamp <= times[-1]:
+                # Same-instant samples: only the latest position matters
+                times.pop()
+                xs.pop()
+                ys.pop()
+            times.append(timestamp)
+            xs.append(x)
+            ys.append(y)
+            continue
+        
+        if times:
+            yield from _resample_run(times, xs, ys, cursor, rest_time,
+                                     rate, method)
+            cursor = (xs[-1], ys[-1])
+            times, xs, ys = [], [], []
+        if type_code < KEY_PRESS:
+            cursor = (x, y)
+        rest_time = timestamp
+        yield row
+    
+    if times:
+        yield from _resample_run(times, xs, ys, cursor, rest_time, rate, method)
+
+
+def _resample_run(times, xs, ys, cursor, rest_time, rate, method):
+    """Yield the move rows of one resampled run"""
+    anchored = False
+    if cursor is not None and len(times) > 1:
+        lead = (times[-1] - times[0]) / (len(times) - 1)
+        start = max(times[0] - lead, rest_time)
+        if start < times[0]:
+            times = [start] + times
+            xs = [cursor[0]] + xs
+            ys = [cursor[1]] + ys
+            anchored = True
+    for timestamp, x, y in zip(*resample_path(times, xs, ys, rate, method,
+                                              anchored)):
+        yield timestamp, MOUSE_MOVE, x, y, 0, 0, 0, 0
+
+
+def _tangents(times, values):
+    """Finite-difference slopes (per second) for a Hermite spline"""
+    count = len(times)
+    if count < 2:
+        return [0.0] * count
+    slopes = [0.0] * count
+    slopes[0] = (values[1] - values[0]) / (times[1] - times[0])
+    slopes[-1] = (values[-1] - values[-2]) / (times[-1] - times[-2])
+    for i in range(1, count - 1):
+        slopes[i] = (values[i + 1] - values[i - 1]) / (times[i + 1] - times[i - 1])
+    return slopes
+
+
+def _hermite(values, slopes, i, span, u):
+    """Cubic Hermite interpolation between points i and i+1 at fraction u"""
+    u2 = u * u
+    u3 = u2 * u
+    return ((2 * u3 - 3 * u2 + 1) * values[i]
+            + (u3 - 2 * u2 + u) * span * slopes[i]
+            + (-2 * u3 + 3 * u2) * values[i + 1]
+            + (u3 - u2) * span * slopes[i + 1])
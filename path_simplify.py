@@ -0,0 +1,89 @@
+"""
+Game Macro Recorder - Mouse path simplification
+"""
+import math
+
+from event_store import EventStore, MOUSE_MOVE
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    """Distance from point P to the segment AB"""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = ((px - ax) * dx + (py - ay) * dy) / length_sq
+    t = max(0.0, min(1.0, t))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def rdp_keep(xs, ys, start, end, tolerance):
+    """Ramer-Douglas-Peucker over points start..end (inclusive)
+    
+    Returns the sorted indexes of the points to keep.  The end points are
+    always kept.  Iterative, so long paths cannot hit the recursion limit.
+    """
+    if end - start < 2:
+        return list(range(start, end + 1))
+    
+    keep = {start, end}
+    stack = [(start, end)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay, bx, by = xs[first], ys[first], xs[last], ys[last]
+        worst = -1.0
+        worst_index = first
+        for i in range(first + 1, last):
+            distance = _segment_distance(xs[i], ys[i], ax, ay, bx, by)
+            if distance > worst:
+                worst = distance
+                worst_index = i
+        if worst > tolerance:
+            keep.add(worst_index)
+            if worst_index - first > 1:
+                stack.append((first, worst_index))
+            if last - worst_index > 1:
+                stack.append((worst_index, last))
+    return sorted(keep)
+
+
+def simplify_paths(events, tolerance=1.0):
+    """Simplify every run of consecutive mouse moves with RDP
+    
+    ``tolerance`` is the largest allowed deviation from the recorded path in
+    pixels.  Clicks, scrolls and key events are copied untouched, and each
+    run keeps its first and last sample so the cursor is where it was
+    whenever something else happens.  Returns ``(store, report)`` where
+    report holds the ``before`` and ``after`` event counts.
+    """
+    source = EventStore.from_events(events)
+    types = source.types
+    xs = source.xs
+    ys = source.ys
+    count = len(source)
+    
+    keep = bytearray(b'\x01') * count
+    i = 0
+    while i < count:
+        if types[i] != MOUSE_MOVE:
+            i += 1
+            continue
+        run_end = i
+        while run_end + 1 < count and types[run_end + 1] == MOUSE_MOVE:
+            run_end += 1
+        if run_end - i >= 2:
+            keep[i:run_end + 1] = bytes(run_end - i + 1)
+            for index in rdp_keep(xs, ys, i, run_end, tolerance):
+                keep[index] = 1
+        i = run_end + 1
+    
+    result = EventStore()
+    names = source.name_table
+    for row, kept in zip(source.rows(), keep):
+        if kept:
+            timestamp, type_code, x, y, dx, dy, name_id, pressed = row
+            result.append(timestamp, type_code, x, y, dx, dy,
+                          names[name_id], pressed)
+    
+    return result, {'before': count, 'after': len(result)}
@@ -0,0 +1,332 @@
+"""
+Game Macro Recorder - Single-thread engine for concurrent macro playback
+"""
+from collections import deque
+import csv
+import heapq
+import itertools
+import threading
+import time
+
+from scheduler import wait_until, LatenessStats, DEFAULT_SPIN_US
+from null_input import ACTION_NAMES
+
+
+# Most recent triggers kept for export
+TRIGGER_LOG_SIZE = 10000
+
+
+class PlaybackInstance:
+    """One running playback of a compiled plan inside a PlaybackEngine
+    
+    Steps are pulled from ``plan.steps()`` one at a time, so plans that
+    generate their steps lazily (composite.CompositePlan) work as well.
+    """
+    
+    def __init__(self, instance_id, name, plan, on_finish=None, triggered_ns=None,
+                 repeat=1, gap_ns=0):
+        self.id = instance_id
+        self.name = name
+        self.plan = plan
+        self.on_finish = on_finish
+        self.triggered_ns = triggered_ns
+        self.first_input_ns = None
+        self.repeat = repeat
+        self.total_steps = len(plan)
+        self.period_ns = plan.duration_ns + gap_ns
+        self.start_ns = 0
+        self.iteration = 0
+        self.index = 0
+        self._steps = iter(plan.steps())
+        self.step = next(self._steps)
+        self.lead_in_ns = self.step[0]  # The macro's own delay before its first step
+        self.paused_at = None
+        self.scheduled = False  # In the heap, or its step is being injected
+        self.cancelled = False
+        self.stats = LatenessStats()
+        self.done = threading.Event()
+    
+    @property
+    def paused(self):
+        return self.paused_at is not None
+    
+    @property
+    def trigger_latency_ns(self):
+        """How long after its scheduled time the first step was injected
+        
+        The schedule is the trigger plus the macro's lead-in (the offset of
+        its first step), so a macro that starts with a pause is not counted
+        as slow to respond.
+        """
+        if self.triggered_ns is None or self.first_input_ns is None:
+            return None
+        return self.first_input_ns - self.triggered_ns - self.lead_in_ns
+    
+    def progress(self):
+        """Fraction of the playback done (of the current loop if endless)"""
+        done = self.index
+        total = self.total_steps
+        if self.repeat:
+            done += self.iteration * total
+            total *= self.repeat
+        return done / total if total else 1.0
+    
+    def next_deadline(self):
+        """Absolute deadline of the next step"""
+        return self.start_ns + self.iteration * self.period_ns + self.step[0]
+    
+    def advance(self):
+        """Move past the step just played; returns False once all are done"""
+        self.index += 1
+        step = next(self._steps, None)
+        if step is None:
+            self.iteration += 1
+            if self.repeat and self.iteration >= self.repeat:
+                return False
+            self.index = 0
+            self._steps = iter(self.plan.steps())
+            step = next(self._steps)
+        self.step = step
+        return True
+    
+    def wait(self, timeout=None):
+        """Block until the instance has finished or been cancelled"""
+        return self.done.wait(timeout)
+
+
+class PlaybackEngine:
+    """Plays any number of macros from one scheduler thread
+    
+    Every active instance has exactly one entry in a deadline heap keyed
+    on ``(deadline, instance id, step)``, so overlapping macros are merged
+    into a single timeline and steps due at the same time always run in
+    the order the instances were started.  Instances can be cancelled or
+    paused per macro name, and ``max_instances`` caps how many copies of
+    one macro may run at once (extra triggers are ignored).
+    
+    A play can repeat its plan a number of times, or until cancelled; each
+    iteration's deadlines are offsets from start + k * period, so repeats
+    never drift.
+    
+    Plays started with a ``triggered_ns`` timestamp (e.g. taken first thing
+    in a hotkey callback) have their trigger latency - first input minus
+    trigger minus the macro's lead-in - added to ``trigger_latency`` and
+    ``trigger_log``.
+    
+    Setting ``tracer`` to a tracing.Tracer records a span for every final
+    wait and injection.
+    """
+    
+    def __init__(self, backend=None, precise=False, spin_us=DEFAULT_SPIN_US,
+                 max_instances=1):
+        self.backend = backend
+        self.precise = precise
+        self.spin_us = spin_us
+        self.max_instances = max_instances
+        self._heap = []
+        self._instances = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.tracer = None
+        self.trigger_latency = LatenessStats()
+        self.trigger_log = deque(maxlen=TRIGGER_LOG_SIZE)
+    
+    @property
+    def spin_ns(self):
+        return int(self.spin_us * 1000) if self.precise else 0
+    
+    def start(self):
+        """Start the scheduler thread (done automatically by play)"""
+        with self._cond:
+            if self._running:
+                return
+            if self.backend is None:
+                from input_backend import PynputBackend
+                self.backend = PynputBackend()
+            self.backend.warm()
+            self._handlers = self.backend.handlers()
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="PlaybackEngine")
+            self._thread.start()
+    
+    def stop(self):
+        """Cancel everything and stop the scheduler thread"""
+        self.cancel()
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def play(self, name, plan, on_finish=None, max_instances=None,
+             triggered_ns=None, repeat=1, gap_ns=0):
+        """Schedule a compiled plan; returns its PlaybackInstance
+        
+        Returns None if the plan is empty or ``name`` already has the
+        maximum number of running instances.  ``on_finish`` is called from
+        the scheduler thread with the instance once it ends.
+        ``triggered_ns`` is the perf_counter_ns time of the trigger.
+        ``repeat`` is the number of iterations (0 for until cancelled) and
+        ``gap_ns`` the pause between them.
+        """
+        if not len(plan):
+            return None
+        self.start()
+        limit = max_instances if max_instances is not None else self.max_instances
+        
+        with self._cond:
+            if limit and len(self.active(name)) >= limit:
+                return None
+            instance = PlaybackInstance(next(self._ids), name, plan, on_finish,
+                                        triggered_ns, repeat, gap_ns)
+            self._instances[instance.id] = instance
+            instance.start_ns = time.perf_counter_ns()
+            self._push(instance)
+            self._cond.notify()
+        return instance
+    
+    def active(self, name=None):
+        """Running (or paused) instances, optionally only those of one macro"""
+        with self._cond:
+            return [instance for instance in self._instances.values()
+                    if name is None or instance.name == name]
+    
+    def cancel(self, name=None):
+        """Stop the instances of a macro, or all of them, immediately"""
+        with self._cond:
+            for instance in self.active(name):
+                instance.cancelled = True
+                self._finish(instance)
+            self._rebuild_heap()
+    
+    def pause(self, name=None):
+        """Suspend the instances of a macro, or all of them"""
+        with self._cond:
+            now = time.perf_counter_ns()
+            for instance in self.active(name):
+                if not instance.paused:
+                    instance.paused_at = now
+            self._rebuild_heap()
+    
+    def resume(self, name=None):
+        """Continue paused instances where they left off"""
+        with self._cond:
+            now = time.perf_counter_ns()
+            for instance in self.active(name):
+                if instance.paused:
+                    instance.start_ns += now - instance.paused_at
+                    instance.paused_at = None
+                    # One paused mid-step is pushed again by the scheduler
+                    if not instance.scheduled:
+                        self._push(instance)
+            self._cond.notify()
+    
+    def export_trigger_latency(self, filename):
+        """Write the trigger latency log as CSV; returns the row count
+        
+        ``scheduled_ns`` is when the first input was due (trigger plus the
+        macro's lead-in) and ``latency_us`` how late it actually came.
+        """
+        rows = list(self.trigger_log)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['macro', 'triggered_ns', 'scheduled_ns',
+                             'first_input_ns', 'latency_us'])
+            for name, triggered_ns, scheduled_ns, first_input_ns in rows:
+                writer.writerow([name, triggered_ns, scheduled_ns, first_input_ns,
+                                 f"{(first_input_ns - scheduled_ns) / 1000:.1f}"])
+        return len(rows)
+    
+    def _push(self, instance):
+        instance.scheduled = True
+        heapq.heappush(self._heap, (instance.next_deadline(), instance.id,
+                                    instance.index))
+    
+    def _rebuild_heap(self):
+        """Drop heap entries of cancelled or paused instances"""
+        heap = []
+        for entry in self._heap:
+            instance = self._instances.get(entry[1])
+            if instance is None:
+                continue
+            if instance.paused:
+                instance.scheduled = False
+            else:
+                heap.append(entry)
+        self._heap = heap
+        heapq.heapify(self._heap)
+        self._cond.notify()
+    
+    def _finish(self, instance):
+        """Retire an instance (called with the lock held)"""
+        self._instances.pop(instance.id, None)
+        instance.done.set()
+        if instance.on_finish:
+            try:
+                instance.on_finish(instance)
+            except Exception as e:
+                print(f"Error in playback finish callback: {e}")
+    
+    def _record_trigger(self, instance, now):
+        """Log a triggered instance's first injected step"""
+        instance.first_input_ns = now
+        self.trigger_latency.add(instance.trigger_latency_ns)
+        self.trigger_log.append((instance.name, instance.triggered_ns,
+                                 instance.triggered_ns + instance.lead_in_ns, now))
+    
+    def _run(self):
+        """Scheduler thread: run the earliest due step, forever"""
+        clock = time.perf_counter_ns
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                
+                deadline, instance_id, index = self._heap[0]
+                spin_ns = self.spin_ns
+                remaining = deadline - clock()
+                if remaining > spin_ns:
+                    # Woken early if something earlier is scheduled meanwhile
+                    self._cond.wait((remaining - spin_ns) / 1e9)
+                    continue
+                heapq.heappop(self._heap)
+                instance = self._instances[instance_id]
+            
+            tracer = self.tracer
+            if remaining > 0:
+                waited = clock()
+                now = wait_until(deadline, spin_ns)
+                if tracer:
+                    tracer.span('wait', 'playback', waited, now)
+            else:
+                now = clock()
+            if instance.cancelled:
+                continue
+            instance.stats.add(now - deadline)
+            _, op, arg = instance.step
+            try:
+                self._handlers[op](arg)
+            except Exception as e:
+                print(f"Error playing back event: {e}")
+            if tracer:
+                tracer.span(ACTION_NAMES[op], 'inject', now, clock(),
+                            {'macro': instance.name, 'step': index,
+                             'late_us': (now - deadline) / 1000})
+            if instance.first_input_ns is None and instance.triggered_ns is not None:
+                self._record_trigger(instance, clock())
+            
+            with self._cond:
+                if instance.cancelled:
+                    continue
+                if not instance.advance():
+                    self._finish(instance)
+                elif not instance.paused:
+                    self._push(instance)
+                else:
+                    instance.scheduled = False
@@ -0,0 +1,290 @@
+"""
+Game Macro Recorder - Precompiled playback plans
+"""
+from array import array
+from bisect import bisect_left
+from itertools import islice
+import weakref
+
+from event_store import (EventStore, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL,
+                         KEY_PRESS, KEY_RELEASE)
+from path_resample import resampled_rows
+
+
+# Dispatch opcodes, indexes into the handler table built by playback
+OP_MOVE = 0
+OP_BUTTON_PRESS = 1
+OP_BUTTON_RELEASE = 2
+OP_SCROLL = 3
+OP_KEY_PRESS = 4
+OP_KEY_RELEASE = 5
+
+
+def handler_table(move, press_button, release_button, scroll,
+                  press_key, release_key):
+    """Build the opcode-indexed tuple of callables used to dispatch steps"""
+    handlers = [None] * 6
+    handlers[OP_MOVE] = move
+    handlers[OP_BUTTON_PRESS] = press_button
+    handlers[OP_BUTTON_RELEASE] = release_button
+    handlers[OP_SCROLL] = scroll
+    handlers[OP_KEY_PRESS] = press_key
+    handlers[OP_KEY_RELEASE] = release_key
+    return tuple(handlers)
+
+
+class PlaybackPlan:
+    """A macro flattened into three parallel columns ready for injection
+    
+    ``offsets_ns`` holds each step's deadline relative to the start of
+    playback, already divided by the speed.  ``ops`` holds the dispatch
+    opcode and ``args`` the resolved argument: an ``(x, y)`` tuple for moves,
+    a Button for clicks, a ``(dx, dy)`` tuple for scrolls and a Key or
+    character for key events.  ``dropped`` lists the numbers of events that
+    produced no step, so event numbers can be mapped to steps; plans whose
+    mouse moves were resampled (``mouse_rate`` set) can only be mapped by
+    time, with ``step_at``.
+    """
+    
+    def __init__(self, speed=1.0, mouse_rate=0, smoothing='linear'):
+        self.speed = speed
+        self.mouse_rate = mouse_rate
+        self.smoothing = smoothing
+        self.offsets_ns = array('q')
+        self.ops = array('B')
+        self.args = []
+        self.dropped = array('q')
+        self._batches = None
+    
+    def add(self, offset_ns, op, arg):
+        """Append one step"""
+        self.offsets_ns.append(offset_ns)
+        self.ops.append(op)
+        self.args.append(arg)
+    
+    def steps(self, first=0):
+        """Iterate over (offset_ns, op, arg) tuples, from step ``first``"""
+        if not first:
+            return zip(self.offsets_ns, self.ops, self.args)
+        offsets, ops, args = self.offsets_ns, self.ops, self.args
+        return ((offsets[i], ops[i], args[i]) for i in range(first, len(ops)))
+    
+    def step_of(self, event_index):
+        """Return the number of the first step from event ``event_index`` on"""
+        return event_index - bisect_left(self.dropped, event_index)
+    
+    def step_at(self, offset_ns):
+        """Return the number of the first step due at or after ``offset_ns``"""
+        return bisect_left(self.offsets_ns, offset_ns)
+    
+    def batches(self):
+        """Return (offset_ns, start, end) for each run of steps sharing a deadline
+        
+        Computed once per plan, so batched playback does no grouping work.
+        """
+        if self._batches is None or (self._batches and
+                                     self._batches[-1][2] != len(self.ops)):
+            batches = []
+            offsets = self.offsets_ns
+            count = len(offsets)
+            start = 0
+            while start < count:
+                offset_ns = offsets[start]
+                end = start + 1
+                while end < count and offsets[end] == offset_ns:
+                    end += 1
+                batches.append((offset_ns, start, end))
+                start = end
+            self._batches = batches
+        return self._batches
+    
+    @property
+    def duration_ns(self):
+        """Deadline of the last step in nanoseconds"""
+        return self.offsets_ns[-1] if self.offsets_ns else 0
+    
+    def __len__(self):
+        return len(self.ops)
+
+
+def compile_plan(events, speed, resolve_key, resolve_button, mouse_rate=0,
+                 smoothing='linear'):
+    """Turn events into a PlaybackPlan
+    
+    ``resolve_key`` and ``resolve_button`` map recorded names to the objects
+    the controllers expect; key names that resolve to nothing are dropped,
+    as playback always did.  With ``mouse_rate`` (Hz of the recording's
+    timeline) mouse moves are resampled to that rate here, using
+    ``smoothing`` ('linear' or 'spline') interpolation, so playback injects
+    a predictable number of moves whatever rate they were captured at.
+    """
+    store = events if hasattr(events, 'rows') else EventStore.from_events(events)
+    plan = PlaybackPlan(speed, mouse_rate, smoothing)
+    add = plan.add
+    
+    # Equal positions share one tuple, which keeps long mouse paths small
+    positions = {}
+    for offset_ns, op, arg in plan_steps(store, speed, resolve_key,
+                                         resolve_button, mouse_rate, smoothing,
+                                         plan.dropped):
+        if op == OP_MOVE:
+            arg = positions.setdefault(arg, arg)
+        add(offset_ns, op, arg)
+    return plan
+
+
+def plan_steps(store, speed, resolve_key, resolve_button, mouse_rate=0,
+               smoothing='linear', dropped=None):
+    """Generate the (offset_ns, op, arg) steps of a macro one row at a time
+    
+    ``store`` is anything with ``rows()`` and ``name_table``; the other
+    arguments are as for compile_plan.  Key events that produce no step
+    have their event numbers appended to ``dropped`` if it is given.
+    """
+    names = store.name_table
+    scale = 1e9 / speed
+    rows = store.rows()
+    if mouse_rate:
+        rows = resampled_rows(rows, mouse_rate, smoothing)
+    
+    # Resolve each interned name once instead of once per event
+    keys = {}
+    buttons = {}
+    
+    for i, (timestamp, type_code, x, y, dx, dy, name_id, pressed) in enumerate(rows):
+        offset_ns = int(timestamp * scale)
+        
+        if type_code == MOUSE_MOVE:
+            yield offset_ns, OP_MOVE, (x, y)
+        
+        elif type_code == MOUSE_CLICK:
+            button = buttons.get(name_id)
+            if button is None:
+                button = buttons[name_id] = resolve_button(names[name_id])
+            yield (offset_ns, OP_BUTTON_PRESS if pressed else OP_BUTTON_RELEASE,
+                   button)
+        
+        elif type_code == MOUSE_SCROLL:
+            yield offset_ns, OP_SCROLL, (dx, dy)
+        
+        elif type_code in (KEY_PRESS, KEY_RELEASE):
+            if name_id not in keys:
+                keys[name_id] = resolve_key(names[name_id])
+            key = keys[name_id]
+            if key:
+                yield (offset_ns,
+                       OP_KEY_PRESS if type_code == KEY_PRESS else OP_KEY_RELEASE,
+                       key)
+            elif dropped is not None:
+                dropped.append(i)
+
+
+class StreamingPlan:
+    """Plan-like view that compiles a file-backed macro while it plays
+    
+    Used for macros that are not held in memory, a memory-mapped
+    BinaryMacro or a CompressedMacro: ``steps`` runs plan_steps over the
+    file again on every pass, so memory stays flat however long the macro
+    is.  The step count and duration take one extra pass on first use, and
+    ``step_of``/``step_at`` scan the steps before the point they look for.
+    """
+    
+    def __init__(self, source, speed, resolve_key, resolve_button, mouse_rate=0,
+                 smoothing='linear'):
+        self.source = source
+        self.speed = speed
+        self.mouse_rate = mouse_rate
+        self.smoothing = smoothing
+        self._resolve = (resolve_key, resolve_button)
+        self._measured = None
+    
+    def steps(self, first=0, dropped=None):
+        """Iterate over (offset_ns, op, arg) tuples, from step ``first``"""
+        steps = plan_steps(self.source, self.speed, *self._resolve,
+                           self.mouse_rate, self.smoothing, dropped)
+        return islice(steps, first, None) if first else steps
+    
+    def step_of(self, event_index):
+        """Return the number of the first step from event ``event_index`` on"""
+        dropped = []
+        count = 0
+        for _step in self.steps(dropped=dropped):
+            # Every event before this step produced a step or was dropped
+            if count + len(dropped) >= event_index:
+                break
+            count += 1
+        return count
+    
+    def step_at(self, offset_ns):
+        """Return the number of the first step due at or after ``offset_ns``"""
+        count = 0
+        for step_offset, _op, _arg in self.steps():
+            if step_offset >= offset_ns:
+                break
+            count += 1
+        return count
+    
+    def _measure(self):
+        if self._measured is None:
+            count = 0
+            last_ns = 0
+            for last_ns, _op, _arg in self.steps():
+                count += 1
+            self._measured = (count, last_ns)
+        return self._measured
+    
+    @property
+    def duration_ns(self):
+        """Deadline of the last step in nanoseconds"""
+        return self._measure()[1]
+    
+    def __len__(self):
+        return self._measure()[0]
+
+
+class PlanCache:
+    """Caches compiled plans per macro, speed and mouse resampling
+    
+    Plans are keyed weakly on the event store, so they go away with the
+    macro, and are recompiled if events were appended since.  Plain lists
+    of event dicts cannot be tracked and are compiled on every call.
+    File-backed macros (anything with ``rows`` that is not an EventStore)
+    get an uncached StreamingPlan, since a full plan would take several
+    times the memory of the events the file keeps out of memory.
+    """
+    
+    max_speeds = 4
+    
+    def __init__(self, resolve_key, resolve_button):
+        self.resolve_key = resolve_key
+        self.resolve_button = resolve_button
+        self._plans = weakref.WeakKeyDictionary()
+    
+    def get(self, events, speed=1.0, mouse_rate=0, smoothing='linear'):
+        """Return the plan for events at speed, compiling it if needed"""
+        if isinstance(events, list):
+            return compile_plan(events, speed, self.resolve_key,
+                                self.resolve_button, mouse_rate, smoothing)
+        if not isinstance(events, EventStore):
+            return StreamingPlan(events, speed, self.resolve_key,
+                                 self.resolve_button, mouse_rate, smoothing)
+        
+        plans = self._plans.get(events)
+        if plans is None:
+            plans = self._plans[events] = {}
+        
+        key = (speed, mouse_rate, smoothing if mouse_rate else None)
+        cached = plans.get(key)
+        if cached is not None and cached[0] == len(events):
+            return cached[1]
+        
+        plan = compile_plan(events, speed, self.resolve_key, self.resolve_button,
+                            mouse_rate, smoothing)
+        if len(plans) >= self.max_speeds:
+            plans.clear()
+        plans[key] = (len(events), plan)
+        return plan
+    
+    def clear(self):
+        """Drop every cached plan"""
+        self._plans.clear()
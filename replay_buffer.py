@@ -0,0 +1,183 @@
+"""
+Game Macro Recorder - Rolling capture of the most recent input ("instant replay")
+
+While instant replay is on, the listener callbacks pack every event into a
+preallocated fixed-size ring, one ring per listener thread, so memory stays
+constant however long it runs and a callback only writes a few bytes in
+place: nothing is appended, queued or handed to another thread.
+``ReplayBuffer.snapshot`` copies the last N seconds out into an EventStore
+that can be saved as a macro.
+"""
+from array import array
+import heapq
+from operator import itemgetter
+import struct
+import threading
+
+from event_store import EventStore
+
+
+# One event per ring slot: perf_counter_ns stamp, then the EventStore
+# columns after the timestamp, in rows() order
+ROW = struct.Struct('<qBiiiiHB')
+STAMP = struct.Struct('<q')
+COLUMNS = ('types', 'xs', 'ys', 'dxs', 'dys', 'name_ids', 'pressed')
+COLUMN_TYPES = ('B', 'i', 'i', 'i', 'i', 'H', 'B')
+
+
+class EventRing:
+    """Fixed-size ring of events written by a single thread
+    
+    Events are packed into one preallocated bytearray, so ``put`` is a
+    single ``pack_into`` call.  ``written`` counts every event ever put;
+    event number n lives in slot ``n % capacity`` until it is overwritten a
+    lap later.  Readers on other threads copy rows out and then discard any
+    whose slot the writer may have reused meanwhile, so no lock is needed
+    on either side.
+    """
+    
+    def __init__(self, capacity):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.written = 0
+        self._mask = capacity - 1
+        self._size = ROW.size
+        self._buffer = bytearray(ROW.size * capacity)
+        self._pack = ROW.pack_into
+    
+    def put(self, stamp_ns, type_code, x, y, dx, dy, name_id, pressed):
+        """Store one event in place of the oldest"""
+        self._pack(self._buffer, (self.written & self._mask) * self._size,
+                   stamp_ns, type_code, x, y, dx, dy, name_id, pressed)
+        self.written += 1
+    
+    def stamp(self, number):
+        """Stamp of event number ``number`` (valid while it is held)"""
+        return STAMP.unpack_from(self._buffer, (number & self._mask) * self._size)[0]
+    
+    def oldest_ns(self):
+        """Stamp of the oldest event still held, or None before the first lap"""
+        written = self.written
+        if written <= self.capacity:
+            return None
+        return self.stamp(written)
+    
+    def rows_since(self, since_ns, until_ns=None):
+        """Return the rows stamped in [since_ns, until_ns), oldest first"""
+        end = self.written
+        low = max(0, end - self.capacity)
+        high = end
+        # Stamps only grow, so bisect for the first one >= since_ns
+        while low < high:
+            middle = (low + high) // 2
+            if self.stamp(middle) < since_ns:
+                low = middle + 1
+            else:
+                high = middle
+        first = low
+        
+        buffer = self._buffer
+        start = (first & self._mask) * self._size
+        stop = start + (end - first) * self._size
+        if stop <= len(buffer):
+            data = buffer[start:stop]
+        else:
+            data = buffer[start:] + buffer[:stop - len(buffer)]
+        rows = list(ROW.iter_unpack(data))
+        
+        # The writer may have reused slots while they were copied: the one it
+        # is writing now and every one it finished since ``end`` was read
+        lost = self.written - self.capacity + 1 - first
+        if lost > 0:
+            del rows[:lost]
+        if until_ns is not None:
+            while rows and rows[-1][0] >= until_ns:
+                rows.pop()
+        return rows
+    
+    def nbytes(self):
+        """Memory used by the ring"""
+        return len(self._buffer)
+
+
+class ReplayBuffer:
+    """The last ``seconds`` of mouse and keyboard input, in constant memory
+    
+    ``mouse`` and ``keyboard`` are the rings of the two listener threads.
+    Their capacities bound the memory whatever the input rate; at 1000 Hz
+    mouse polling the default mouse ring holds about 65 seconds.
+    """
+    
+    def __init__(self, seconds=30.0, mouse_capacity=65536,
+                 keyboard_capacity=4096):
+        self.seconds = seconds
+        self.mouse = EventRing(mouse_capacity)
+        self.keyboard = EventRing(keyboard_capacity)
+        self.name_table = ['']
+        self._name_index = {'': 0}
+        self._lock = threading.Lock()
+    
+    def name_id(self, name):
+        """Return the id of a key or button name, adding it if needed
+        
+        Called from both listener threads; only a name seen for the first
+        time takes the lock.
+        """
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self._name_index.get(name)
+                if name_id is None:
+                    name_id = len(self.name_table)
+                    self.name_table.append(name)
+                    self._name_index[name] = name_id
+        return name_id
+    
+    def nbytes(self):
+        """Memory used by the rings (fixed when the buffer is created)"""
+        return self.mouse.nbytes() + self.keyboard.nbytes()
+    
+    def snapshot(self, now_ns, seconds=None, until_ns=None):
+        """Return the events of the ``seconds`` before ``now_ns`` as a macro
+        
+        ``now_ns`` and ``until_ns`` (events from then on are left out) are
+        perf_counter_ns readings.  The result is an EventStore starting at
+        0 and repaired like an imported file: releases whose press fell
+        before the window are dropped, and anything still held at the end
+        is released there.
+        """
+        from bulk_import import repair
+        
+        seconds = self.seconds if seconds is None else seconds
+        since_ns = now_ns - int(seconds * 1e9)
+        # A full ring has forgotten its older events; start where all
+        # rings still have everything, so no gap opens in one of them
+        for ring in (self.mouse, self.keyboard):
+            oldest_ns = ring.oldest_ns()
+            if oldest_ns is not None and oldest_ns > since_ns:
+                since_ns = oldest_ns + 1
+        until_ns = now_ns if until_ns is None else min(until_ns, now_ns)
+        rows = list(heapq.merge(self.mouse.rows_since(since_ns, until_ns),
+                                self.keyboard.rows_since(since_ns, until_ns),
+                                key=itemgetter(0)))
+        store = EventStore()
+        if not rows:
+            return store
+        
+        first_ns = rows[0][0]
+        store.timestamps = array('d', [(row[0] - first_ns) / 1e9 for row in rows])
+        for name, typecode, values in zip(COLUMNS, COLUMN_TYPES,
+                                          list(zip(*rows))[1:]):
+            setattr(store, name, array(typecode, values))
+        store.name_table = list(self.name_table)
+        store._name_index = {name: name_id
+                             for name_id, name in enumerate(store.name_table)}
+        store, _issues = repair(store)
+        
+        # Repairs may have dropped the first events
+        first = store.timestamps[0] if store else 0.0
+        if first:
+            store.timestamps = array('d', [timestamp - first
+                                           for timestamp in store.timestamps])
+        return store
@@ -0,0 +1,79 @@
+"""
+Game Macro Recorder - High-precision deadline waiting and lateness statistics
+"""
+from array import array
+import time
+
+
+# Spin window used by precise playback: sleep until this close to a deadline,
+# then busy-wait.  Larger values hit deadlines more reliably but burn CPU.
+DEFAULT_SPIN_US = 1000
+
+
+def wait_until(deadline_ns, spin_ns=0, cancel=None):
+    """Block until time.perf_counter_ns() reaches deadline_ns
+    
+    Sleeps coarsely until ``spin_ns`` before the deadline, then spins for at
+    most that long.  With ``spin_ns=0`` this is a plain sleep and inherits the
+    OS's oversleep.  If ``cancel`` (a threading.Event) is given, the sleep
+    ends as soon as it is set.  Returns the clock reading at wake-up.
+    """
+    clock = time.perf_counter_ns
+    now = clock()
+    while now < deadline_ns:
+        remaining = deadline_ns - now
+        if remaining > spin_ns:
+            if cancel is None:
+                time.sleep((remaining - spin_ns) / 1e9)
+            elif cancel.wait((remaining - spin_ns) / 1e9):
+                return clock()
+        now = clock()
+        if spin_ns and now < deadline_ns and deadline_ns - now <= spin_ns:
+            while now < deadline_ns:
+                now = clock()
+    return now
+
+
+class LatenessStats:
+    """Per-event lateness samples (actual minus scheduled time, in ns)"""
+    
+    def __init__(self):
+        self.samples = array('q')
+    
+    def add(self, lateness_ns):
+        """Record one sample"""
+        self.samples.append(lateness_ns)
+    
+    def percentile(self, p, ordered=None):
+        """Nearest-rank percentile in nanoseconds"""
+        ordered = ordered if ordered is not None else sorted(self.samples)
+        if not ordered:
+            return 0
+        rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+        return ordered[rank]
+    
+    def summary(self):
+        """Return count, p50/p99/max/mean lateness and drift in microseconds
+        
+        Drift is how much later the final event landed than the first, which
+        shows error accumulating over the run.
+        """
+        samples = self.samples
+        ordered = sorted(samples)
+        count = len(samples)
+        return {
+            'events': count,
+            'p50_us': self.percentile(50, ordered) / 1000,
+            'p99_us': self.percentile(99, ordered) / 1000,
+            'max_us': (ordered[-1] if ordered else 0) / 1000,
+            'mean_us': (sum(samples) / count if count else 0) / 1000,
+            'drift_us': (samples[-1] - samples[0] if count else 0) / 1000,
+        }
+    
+    def __len__(self):
+        return len(self.samples)
+    
+    def __str__(self):
+        s = self.summary()
+        return (f"{s['events']} events, lateness p50 {s['p50_us']:.0f}us "
+                f"p99 {s['p99_us']:.0f}us max {s['max_us']:.0f}us")
@@ -0,0 +1,176 @@
+"""
+Game Macro Recorder - Batch editing of a macro's timeline
+
+Every function takes events (EventStore, BinaryMacro or list of dicts) and
+returns a new EventStore that MacroRecorder.playback accepts directly; the
+input is never modified.  Work is done on whole array columns: rows are
+selected with bisect and array slicing, and per-event arithmetic runs in
+NumPy over the columns' buffers when it is installed (a million events take
+a few milliseconds), or in plain Python otherwise.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, count
+from operator import sub
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: everything works without it, just more slowly
+    np = None
+
+from event_store import EventStore, MOUSE_MOVE, KEY_PRESS
+
+
+def crop(events, start=0.0, end=None, rebase=True):
+    """Keep the events with start <= timestamp <= end
+    
+    With ``rebase`` the result starts counting from ``start`` rather than
+    from the original recording's start.
+    """
+    source = EventStore.from_events(events)
+    timestamps = source.timestamps
+    first = bisect_left(timestamps, start)
+    last = len(timestamps) if end is None else bisect_right(timestamps, end)
+    store = source.copy(first, last)
+    if rebase and start:
+        store.timestamps = _affine(store.timestamps, 1.0, -start)
+    return store
+
+
+def trim(events, trailing_moves=True):
+    """Remove dead time before the first event and after the last action
+    
+    The first event is moved to time zero.  With ``trailing_moves`` mouse
+    moves after the last click, scroll or key event (typically the cursor
+    travelling to the Stop button) are dropped as well.
+    """
+    source = EventStore.from_events(events)
+    end = len(source)
+    if trailing_moves:
+        types = source.types
+        while end and types[end - 1] == MOUSE_MOVE:
+            end -= 1
+        if not end:
+            end = len(source)
+    store = source.copy(0, end)
+    if store.timestamps and store.timestamps[0]:
+        store.timestamps = _affine(store.timestamps, 1.0, -store.timestamps[0])
+    return store
+
+
+def cap_gaps(events, max_gap):
+    """Shorten every pause between consecutive events to at most max_gap seconds"""
+    store = EventStore.from_events(events).copy()
+    timestamps = store.timestamps
+    if len(timestamps) < 2:
+        return store
+    
+    if np is not None:
+        times = np.frombuffer(timestamps, dtype=np.float64)
+        excess = np.maximum(np.diff(times) - max_gap, 0.0)
+        removed = np.concatenate(([0.0], np.cumsum(excess)))
+        store.timestamps = _to_array('d', times - removed)
+        return store
+    
+    gaps = array('d', map(sub, timestamps[1:], timestamps))
+    long_gaps = list(compress(count(1), map(float(max_gap).__lt__, gaps)))
+    if not long_gaps:
+        return store
+    
+    # Shift each stretch between two long gaps back by the time removed so far
+    capped = timestamps[:long_gaps[0]]
+    removed = 0.0
+    for i, first in enumerate(long_gaps):
+        last = long_gaps[i + 1] if i + 1 < len(long_gaps) else len(timestamps)
+        removed += gaps[first - 1] - max_gap
+        capped.extend(_affine(timestamps[first:last], 1.0, -removed))
+    store.timestamps = capped
+    return store
+
+
+def warp(events, segments):
+    """Apply per-segment speed factors
+    
+    ``segments`` is a list of ``(start, end, speed)`` in original seconds;
+    the time between start and end plays ``speed`` times faster (slower
+    below 1).  Time outside every segment is unchanged.  Segments must not
+    overlap, and each must end after it starts.
+    """
+    store = EventStore.from_events(events).copy()
+    timestamps = store.timestamps
+    
+    # Piecewise linear map: (from, to, speed) pieces covering all time
+    pieces = []
+    cursor = float('-inf')
+    for start, end, speed in sorted(segments):
+        if speed <= 0:
+            raise ValueError("speed factors must be positive")
+        if end <= start:
+            raise ValueError(f"warp segment ({start}, {end}) must end after it starts")
+        if start < cursor:
+            raise ValueError("warp segments overlap")
+        if start > cursor:
+            pieces.append((cursor, start, 1.0))
+        pieces.append((start, end, speed))
+        cursor = end
+    pieces.append((cursor, float('inf'), 1.0))
+    
+    warped = array('d')
+    offset = 0.0  # Output time minus input time at the start of the piece
+    for start, end, speed in pieces:
+        first = bisect_left(timestamps, start)
+        last = bisect_left(timestamps, end)
+        if speed == 1.0:
+            warped.extend(_affine(timestamps[first:last], 1.0, offset))
+        else:
+            scale = 1.0 / speed
+            warped.extend(_affine(timestamps[first:last], scale,
+                                  start + offset - start * scale))
+            offset += (end - start) * (scale - 1.0)
+    store.timestamps = warped
+    return store
+
+
+def transform_coords(events, dx=0, dy=0, scale_x=1.0, scale_y=1.0,
+                     origin=(0, 0)):
+    """Scale positions about ``origin`` and then shift them by (dx, dy)
+    
+    Applies to moves, clicks and scrolls (key events carry no position);
+    use it to replay a macro at another resolution or window position.
+    Scroll amounts are left alone.
+    """
+    store = EventStore.from_events(events).copy()
+    ox, oy = origin
+    store.xs = _transform_column(store.types, store.xs, ox, scale_x, ox + dx)
+    store.ys = _transform_column(store.types, store.ys, oy, scale_y, oy + dy)
+    return store
+
+
+def _to_array(typecode, values):
+    """Copy a NumPy array into a new array.array"""
+    column = array(typecode)
+    column.frombytes(values.tobytes())
+    return column
+
+
+def _affine(column, scale, offset):
+    """Return column * scale + offset as a new float column"""
+    if np is not None and column:
+        return _to_array('d', np.frombuffer(column, dtype=np.float64) * scale
+                         + offset)
+    return array('d', [value * scale + offset for value in column])
+
+
+def _transform_column(types, values, origin, scale, target):
+    """round(target + (value - origin) * scale) for events with a position"""
+    offset = target - origin * scale
+    if np is not None and values:
+        positions = np.frombuffer(values, dtype=np.int32)
+        moved = np.rint(positions * scale + offset).astype(np.int32)
+        keys = np.frombuffer(types, dtype=np.uint8) >= KEY_PRESS
+        return _to_array('i', np.where(keys, positions, moved))
+    
+    return array('i', [value if type_code >= KEY_PRESS
+                       else round(value * scale + offset)
+                       for type_code, value in zip(types, values)])
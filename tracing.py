@@ -0,0 +1,60 @@
+"""
+Game Macro Recorder - Opt-in timing spans exported as Chrome trace events
+
+Spans are kept in a capture_buffer.RingBuffer, so recording one costs a
+clock read and a tuple store, never blocks, and a long session keeps only
+the most recent ``capacity`` spans.  ``export`` writes the Trace Event
+Format JSON that chrome://tracing and Perfetto open.
+"""
+from collections import deque
+import json
+import os
+import threading
+
+from capture_buffer import RingBuffer
+
+
+class Tracer:
+    """Ring-buffered complete ("X") trace events from several threads"""
+    
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self._ring = RingBuffer(capacity)
+        self._retained = deque(maxlen=capacity)
+        self._thread_names = {}
+    
+    def span(self, name, category, start_ns, end_ns, args=None):
+        """Record a span between two perf_counter_ns readings"""
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._ring.push(start_ns, name, end_ns - start_ns, tid, category, args)
+    
+    @property
+    def overflowed(self):
+        """Spans overwritten before they were exported"""
+        return self._ring.overflowed
+    
+    def trace_events(self):
+        """Return every retained span as a Chrome trace event dict"""
+        self._ring.drain(self._retained.append)
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                   'args': {'name': thread_name}}
+                  for tid, thread_name in list(self._thread_names.items())]
+        
+        for _seq, start_ns, name, dur_ns, tid, category, args in self._retained:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid,
+                     'tid': tid, 'ts': start_ns / 1000, 'dur': dur_ns / 1000}
+            if args:
+                event['args'] = args
+            events.append(event)
+        return events
+    
+    def export(self, filename):
+        """Write the retained spans as trace-event JSON; returns their count"""
+        events = self.trace_events()
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ns',
+                       'otherData': {'overflowed': self.overflowed}}, f)
+        return len(events) - len(self._thread_names)
@@ -0,0 +1,61 @@
+"""
+Game Macro Recorder - Thread-safe, throttled updates for the Tk interface
+
+Tk may only be touched from the thread running mainloop.  Worker threads
+(playback, hotkeys, prefetch) post updates here instead; the Tk thread
+applies them from a ``window.after`` timer at most ``rate_hz`` times a
+second.  Updates are keyed and only the latest per key is applied, so a
+burst of status messages costs one widget update per tick.
+"""
+import threading
+
+
+class UIUpdateQueue:
+    """Latest-wins update slots drained on the Tk thread"""
+    
+    def __init__(self, window, rate_hz=20):
+        self.window = window
+        self.interval_ms = max(1, int(1000 / rate_hz))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._tickers = []
+        self._running = False
+    
+    def post(self, key, func, *args):
+        """Run func(*args) on the Tk thread; safe to call from any thread
+        
+        Replaces any update with the same key that has not run yet.
+        """
+        with self._lock:
+            self._pending[key] = (func, args)
+    
+    def add_ticker(self, func):
+        """Call func() on the Tk thread every tick (e.g. to poll progress)"""
+        self._tickers.append(func)
+    
+    def start(self):
+        """Start draining; call from the Tk thread"""
+        if not self._running:
+            self._running = True
+            self.window.after(self.interval_ms, self._drain)
+    
+    def stop(self):
+        """Stop draining after the current tick"""
+        self._running = False
+    
+    def _drain(self):
+        if not self._running:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for func, args in pending.values():
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error updating interface: {e}")
+        for func in self._tickers:
+            try:
+                func()
+            except Exception as e:
+                print(f"Error updating interface: {e}")
+        self.window.after(self.interval_ms, self._drain)